@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Benchmark the compiled ConText engine against the reference implementation.
+
+The reference implementation (run_individual_context) compiles and applies
+one trigger rule at a time, for every context category, sentence and target
+term. The Context class applies the same rules, in the same order and with
+the same side effects on the sentence, but compiles them once and only tries
+the rules whose words are in the sentence. This module runs the
+tests/test_context.py cases, the examples from context.py and a set of
+random sentences built from the trigger phrases through both, verifies that
+the results are identical and reports the time per call:
+
+        python3 ./benchmark_context.py
+        python3 ./benchmark_context.py --repeat 200 --random 10000 --seed 7
+
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+
+if __name__ == '__main__':
+
+    # interactive testing; add nlp dir to path to find logging class
+    match = re.search(r'nlp/', sys.path[0])
+    if match:
+        nlp_dir = sys.path[0][:match.end()]
+        sys.path.append(nlp_dir)
+    else:
+        print('\n*** benchmark_context.py: nlp dir not found ***\n')
+        sys.exit(0)
+
+    import context as ctx
+else:
+    from algorithms.context import context as ctx
+
+from claritynlp_logging import log, ERROR, DEBUG
+
+BENCHMARK_CASES = [
+    # tests/test_context.py
+    ("pass out", "She had definite   presyncope with lightheadedness and dizziness as if she was going to PASS OUT."),
+    ("coronary artery disease", "MEDICAL HISTORY:   Atrial fibrillation, hypertension, arthritis, CORONARY ARTERY "
+                                "DISEASE, GERD,   cataracts, and cancer of the left eyelid."),
+    ("pneumonia", "However, no evidence of pleural effusion or acute pneumonia. "),
+    ("heart attack", "FAMILY HISTORY: grandmother recently suffered heart attack"),
+    # context.py examples
+    ("hypertension", "Ms. **NAME[AAA] is a very pleasant **AGE[in 80s]-year-old female with a history of "
+                     "hypertension   who was transferred to **INSTITUTION from an outside hospital because of "
+                     "NECROTIZING   PANCREATITIS."),
+    ("PANCREATITIS", "Ms. **NAME[AAA] is a very pleasant **AGE[in 80s]-year-old female with a history of "
+                     "hypertension   who was transferred to **INSTITUTION from an outside hospital because of "
+                     "NECROTIZING   PANCREATITIS."),
+    ("gallops", "Heart - Regular rate and rhythm, no   MURMURS, gallops, or rubs."),
+    ("edema", "Extremities reveal no peripheral cyanosis or EDEMA"),
+    ("dementia", "The patient has no evidence of dementia, but has a history of diabetes"),
+    ("nausea", "He has had signs of nausea and vomiting for the past 2 weeks"),
+    ("heart attack", "Pt with three children and 1 grandaughter, pt voiced concerns over grandaughter and son (pt "
+                     "son 36 y/o had heart attack in FL)."),
+    ("fevers", "Patient condition: -fevers, - chills, - Weight Loss, alert"),
+    ("chills", "Patient condition: -fevers, - chills, - Weight Loss, alert"),
+    ("weight loss", "Patient condition: -fevers, - chills, - Weight Loss, alert"),
+    ("chills", "Instructions to patient: take Tylenol for chills."),
+    ("fever", "Should fever appear, take Tylenol as indicated."),
+    ("chills", "Take as prescribed; should there be chills or fever do as instructed."),
+    ("fever", "Take as prescribed; should there be chills or fever do as instructed."),
+    ("shortness of breath", "In case of severe shortness of breath do as instructed."),
+    ("problem", "If a problem arises, follow the instructions."),
+    ("problems", "In case of problems with the patient's breathing do as instructed."),
+    ("shortness of breath", "If the patient develops shortness of breath, do as instructed."),
+    # triggers the reference applies one after another, cutting the sentence down as it goes
+    ("fever", "Patient denies chest pain but if develops fever call."),
+    ("edema", "negative patient fever pneumonia for attack if develops pneumonia edema"),
+]
+
+
+# words and target phrases the random sentences are made of, besides the trigger phrases
+RANDOM_WORDS = ["patient", "pt", "chest", "pain", "fever", "pneumonia", "edema", "attack", "mother", "son", "was",
+                "with", "and", "the", "of", "for", "if", "call", "develops", "reports", "has", "had", "2", "days",
+                "weeks", "cough", "seen", "today", "admitted", "shortness", "breath", "diabetes", "at", "home"]
+RANDOM_TERMS = ["fever", "chest pain", "pneumonia", "edema", "heart attack", "cough", "shortness of breath",
+                "diabetes", "pain"]
+RANDOM_PUNCTUATION = [".", ",", ";", ":", "-", "(", ")"]
+
+
+###############################################################################
+def random_cases(count, seed=1):
+    """
+    Build 'count' random (term, sentence) cases. Every sentence has at least
+    one trigger phrase and the term; either can be anywhere in the sentence,
+    including at its edges, next to punctuation or repeated.
+    """
+
+    rng = random.Random(seed)
+    triggers = sorted(set([rule.split('\t\t')[0] for rules in ctx.context_init().values() for rule in rules
+                           if '\t\t' in rule]))
+    cases = []
+    while len(cases) < count:
+        term = rng.choice(RANDOM_TERMS)
+        words = [rng.choice(triggers), term]
+        for i in range(rng.randint(1, 18)):
+            r = rng.random()
+            if r < 0.3:
+                words.append(rng.choice(triggers))
+            elif r < 0.4:
+                words.append(term)
+            elif r < 0.5:
+                words.append(rng.choice(RANDOM_PUNCTUATION))
+            else:
+                words.append(rng.choice(RANDOM_WORDS))
+        rng.shuffle(words)
+        sentence = ' '.join(words)
+        if rng.random() < 0.3:
+            sentence = sentence.upper() if rng.random() < 0.5 else sentence.capitalize()
+            if term not in sentence:
+                continue
+        if rng.random() < 0.5:
+            sentence += rng.choice([".", ". ", "", " "])
+        cases.append((term, sentence))
+
+    return cases
+
+
+###############################################################################
+def run_reference_context(expected_term, sentence):
+    """
+    Evaluate a term with the reference, rule-at-a-time implementation.
+    """
+
+    terms = ctx.context_init()
+    original_sentence = sentence
+    sentence = ctx.replace_dash_as_negation(expected_term, sentence)
+    sentence = ctx.replace_future_occurrence_as_current_negation(expected_term, sentence)
+
+    features = []
+    phrase_regex = re.compile(r"(\b|\]\[)%s(\b|\]\[)" % expected_term, re.IGNORECASE)
+    for key, rules in terms.items():
+        # copy the rules, run_individual_context appends to the list it is given
+        found = ctx.run_individual_context(sentence, expected_term, key, list(rules), phrase_regex)
+        if found:
+            features.extend(found)
+
+    temporality = ctx.Temporality.Recent
+    experiencer = ctx.Experiencer.Patient
+    negation = ctx.Negation.Affirmed
+    for feature in features:
+        mapped_feature = ctx.feature_map[feature.context_type]
+        if isinstance(mapped_feature, ctx.Temporality):
+            temporality = mapped_feature
+        elif isinstance(mapped_feature, ctx.Negation):
+            negation = mapped_feature
+        elif isinstance(mapped_feature, ctx.Experiencer):
+            experiencer = mapped_feature
+
+    return ctx.ContextResult(expected_term, original_sentence, temporality, experiencer, negation)
+
+
+###############################################################################
+def same_result(a, b):
+    return a.temporality == b.temporality and a.experiencier == b.experiencier and a.negex == b.negex
+
+
+###############################################################################
+def compare(cases=None):
+    """
+    Return the list of (term, sentence, reference, engine) tuples for which
+    the compiled engine and the reference implementation disagree.
+    """
+
+    if cases is None:
+        cases = BENCHMARK_CASES
+
+    context = ctx.Context()
+    mismatches = []
+    for term, sentence in cases:
+        reference = run_reference_context(term, sentence)
+        result = context.run_context(term, sentence)
+        if not same_result(reference, result):
+            mismatches.append((term, sentence, reference, result))
+
+    return mismatches
+
+
+###############################################################################
+def time_calls(func, cases, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        for term, sentence in cases:
+            func(term, sentence)
+    elapsed = time.perf_counter() - start
+    return 1000.0 * elapsed / (repeat * len(cases))
+
+
+###############################################################################
+def run(repeat=50, random_count=3000, seed=1):
+
+    cases = BENCHMARK_CASES + random_cases(random_count, seed)
+    mismatches = compare(cases)
+    for term, sentence, reference, result in mismatches:
+        log('MISMATCH for "{0}": reference {1}, engine {2}'.format(term, reference, result), ERROR)
+    log('{0} cases, {1} mismatches'.format(len(cases), len(mismatches)))
+
+    reference_ms = time_calls(run_reference_context, BENCHMARK_CASES, repeat)
+
+    context = ctx.Context()
+
+    def run_uncached(term, sentence):
+        # empty the cache so that every call finds the rules that can match its sentence again
+        context.candidate_cache.clear()
+        return context.run_context(term, sentence)
+
+    engine_ms = time_calls(run_uncached, BENCHMARK_CASES, repeat)
+    cached_ms = time_calls(context.run_context, BENCHMARK_CASES, repeat)
+
+    log('reference implementation:  {0:.3f} ms/call'.format(reference_ms))
+    log('compiled engine:           {0:.3f} ms/call ({1:.1f}x)'.format(engine_ms, reference_ms / engine_ms))
+    log('compiled engine, cached:   {0:.3f} ms/call ({1:.1f}x)'.format(cached_ms, reference_ms / cached_ms))
+
+    return len(mismatches) == 0
+
+
+###############################################################################
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark the compiled ConText engine')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='number of passes over the benchmark cases')
+    parser.add_argument('--random', type=int, default=3000,
+                        help='number of random sentences to compare the results of')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='seed of the random sentences')
+    args = parser.parse_args()
+
+    if not run(args.repeat, args.random, args.seed):
+        sys.exit(1)
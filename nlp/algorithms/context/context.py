@@ -2,6 +2,7 @@ import re
 import os
 import traceback
 from enum import Enum
+from cachetools import LRUCache
 from claritynlp_logging import log, ERROR, DEBUG
 
 SCRIPT_DIR = os.path.dirname(__file__)
@@ -10,7 +11,9 @@ over_several_period_rule = re.compile(r"(within the last|in the last|for the pas
 for_the_past_period_rule = re.compile(r"(for the past|for the last|over the past|over the last|for)(\s+\d*(\.\d*)*|\s+(\w+)(\s+\w*)?(\s+\w*)?(\s+\w*)?(\s+\w*)?(\s+\w*)?)?(\s+weeks|\s+week|\s+months|\s+month|\s+years|\s+year)", re.IGNORECASE|re.MULTILINE)
 space_rule = r"[\s+]"
 negative_window = 4
+candidate_cache_size = 1000
 all_terms = dict()
+all_rule_sets = dict()
 inited = False
 
 
@@ -39,6 +42,9 @@ def context_init():
         all_terms["historical"] = load_terms("history")
         all_terms["hypothetical"] = load_terms("hypothetical")
 
+        for key, rules in all_terms.items():
+            all_rule_sets[key] = RuleSet(key, rules)
+
         inited = True
     return all_terms
 
@@ -102,8 +108,251 @@ windows = {
 
 def stop_trigger(ipt: str):
     return ipt.startswith("[CONJ]") or ipt.startswith("[PSEU]") or ipt.startswith("[POST]")  or ipt.startswith("[PREN]")  or ipt.startswith("[PREP]") or ipt.startswith("[POSP]") or ipt.startswith("[FSTT]") or ipt.startswith("[ONEW]")
-  
 
+
+def forward_trigger(ipt: str):
+    return ipt.startswith("[PREN]") or ipt.startswith("[FSTT]") or ipt.startswith("[ONEW]")
+
+
+non_ascii = re.compile(r"[^\x00-\x7f]")
+# plain text is matched literally by a regex and only holds ASCII, so it can be compared after lower()
+not_plain_text = re.compile(r"[^\x00-\x7f]|[.^$*+?{}\[\]\\|()]")
+word_rule = re.compile(r"[a-z0-9]+")
+
+
+def plain_text(text: str):
+    return not_plain_text.search(text) is None
+
+
+class ContextRule(object):
+
+    # One trigger rule, compiled once; run_individual_context compiles every rule for every sentence and term.
+    def __init__(self, rule: str, period_rule=False):
+        self.rule = rule
+        self.period_rule = period_rule
+        rule_tokens = rule.strip().split('\t\t')
+        self.text = rule_tokens[0]
+        self.label = None
+        if len(rule_tokens) > 1:
+            tokens = rule_tokens[1].strip().split("[")
+            if len(tokens) > 1:
+                self.label = tokens[1]
+        try:
+            self.regex = re.compile(r"\b(%s)\b" % self.text, re.IGNORECASE | re.MULTILINE)
+        except Exception as e:
+            log(e, ERROR)
+            self.regex = None
+        # the runs of letters and digits the rule needs to find in a sentence; None if it is tried on every one
+        self.words = None
+        if self.regex is not None and plain_text(self.text) and '_' not in self.text:
+            self.words = word_rule.findall(self.text.lower())
+
+    def tag_texts(self):
+        # the text a match of the rule adds to the sentence around the matched phrase
+        if self.label is None:
+            return []
+        texts = ["[" + self.label, "[/" + self.label]
+        suffix = self.label[self.label.rfind(']') + 1:]
+        if len(suffix) > 0:
+            # a label like 'CONJ]nege' runs into the matched phrase
+            texts.append(suffix + self.text.split(' ')[0])
+        return [t.lower() for t in texts]
+
+    def __repr__(self):
+        return '%s(%s, %s)' % (self.__class__.__name__, self.text, self.label)
+
+
+class RuleSet(object):
+
+    # All trigger rules of one context category, compiled once and ordered the way run_individual_context
+    # applies them (longest rule first, file order for the same length).
+    def __init__(self, key, rules):
+        self.key = key
+        self.rules = [ContextRule(rule) for rule in sorted(rules, key=len, reverse=True)]
+        self.period_rules = dict()
+        self.window = windows[key]
+        self.prefilter = True
+
+        tag_texts = set(["[conj]", "[/conj]"])
+        for rule in self.rules:
+            tag_texts.update(rule.tag_texts())
+            # a rule that ends in punctuation could join its label to the next word of the sentence
+            if rule.label is not None and not rule.label.endswith(']') and not re.search(r"\w$", rule.text):
+                self.prefilter = False
+        tag_text = '\n'.join(sorted(tag_texts))
+        self.tag_substrings = set([t[i:j] for t in tag_texts for i in range(len(t))
+                                   for j in range(i + 1, len(t) + 1)])
+        self.tag_suffixes = set([t[i:] for t in tag_texts for i in range(len(t))])
+        # per rule, the words that can only come from the sentence, not from a label a match adds
+        self.sentence_words = [None if r.words is None else [w for w in r.words if w not in tag_text]
+                               for r in self.rules]
+
+    def candidates(self, text: str):
+        """
+        The positions of the rules that can match the lowercased sentence 'text', or one of the sentences derived
+        from it while the rules are applied. Rules whose words aren't all in it never match.
+        """
+        if text is None or not self.prefilter:
+            return None
+        return [i for i, words in enumerate(self.sentence_words)
+                if words is None or all([w in text for w in words])]
+
+    def period_rule(self, rule: str):
+        if rule not in self.period_rules:
+            self.period_rules[rule] = ContextRule(rule, period_rule=True)
+        return self.period_rules[rule]
+
+    def ordered_rules(self, eval_sentence: str, candidates):
+        """
+        The rules to apply to the sentence, with the CONJ rules run_individual_context adds for a "for the past
+        N days" phrase of a historical sentence; and the positions of the candidates among them.
+        """
+        if self.key != "historical":
+            return self.rules, candidates
+
+        added = list()
+        over_several_period_match = re.findall(over_several_period_rule, eval_sentence)
+        if any(True for _ in over_several_period_match):
+            added.append(self.period_rule("%s\t\t[CONJ]" % over_several_period_match[0][0].strip()))
+        for_the_past_period_match = re.findall(for_the_past_period_rule, eval_sentence)
+        if any(True for _ in for_the_past_period_match):
+            added.append(self.period_rule("%s\t\t[CONJ]" % for_the_past_period_match[0][0].strip()))
+        if len(added) == 0:
+            return self.rules, candidates
+
+        # a stable sort, so the added rules follow the rules of the same length, as they do in the reference
+        rules = sorted(self.rules + added, key=lambda r: len(r.rule), reverse=True)
+        if candidates is not None:
+            candidate_rules = set([self.rules[i] for i in candidates])
+            candidates = [i for i, r in enumerate(rules) if r.period_rule or r in candidate_rules]
+        return rules, candidates
+
+    def find(self, target_phrase: str, sentence: str, eval_sentence: str, phrase_regex, candidates, plain: bool):
+        """
+        Apply the rules to the eval sentence the way run_individual_context does, and return the first feature
+        it would find, or None. 'candidates' are the positions of the rules that can match the sentence (None
+        for all); 'plain' is True if the target phrase has no regex syntax.
+        """
+        words = None
+        if plain and not non_ascii.search(eval_sentence):
+            words = self.phrase_words(target_phrase)
+            if words is not None and not all([w in eval_sentence.replace("_", " ").lower() for w in words]):
+                return None
+        rules, candidates = self.ordered_rules(eval_sentence, candidates)
+        if candidates is None:
+            candidates = range(len(rules))
+
+        # rules before the first match leave the sentence as it is, so only the candidates need to be tried
+        first = -1
+        for i in candidates:
+            rule = rules[i]
+            if rule.regex is None:
+                return None
+            eval_sentence, rule_match = apply_rule(rule, eval_sentence)
+            if rule_match is None:
+                return None
+            if rule_match > 0:
+                first = i
+                break
+        if first < 0:
+            return None
+
+        candidate_set = set(candidates)
+        for i in range(first, len(rules)):
+            rule = rules[i]
+            if i > first and i in candidate_set:
+                if rule.regex is None:
+                    return None
+                eval_sentence, rule_match = apply_rule(rule, eval_sentence)
+                if rule_match is None:
+                    return None
+
+            # every rule after the first match drops the first character of the sentence and cuts it at its
+            # last period, or at its last character
+            eval_sentence = eval_sentence.replace("_", " ")
+            eval_sentence = eval_sentence[1:eval_sentence.strip().rfind('.')]
+
+            matched_phrase = forward_phrase(eval_sentence, phrase_regex, plain, self.window)
+            if matched_phrase is not None:
+                return ContextFeature(target_phrase, matched_phrase, sentence, eval_sentence, self.key)
+
+            # the sentence only gets shorter, so once it has lost the target phrase nothing more is found
+            if len(eval_sentence) == 0:
+                return None
+            if words is not None:
+                lower_sentence = eval_sentence.lower()
+                if not all([w in lower_sentence for w in words]):
+                    return None
+
+        return None
+
+    def phrase_words(self, target_phrase: str):
+        """
+        The words of a plain target phrase, which the eval sentence has to hold for the phrase to match; or None
+        if a word could also come from a label the rules add.
+        """
+        words = [w for w in target_phrase.lower().split(' ') if len(w) > 0]
+        for w in words:
+            if w in self.tag_substrings or any([w[:n] in self.tag_suffixes for n in range(1, len(w))]):
+                return None
+        return words
+
+
+def apply_rule(rule: ContextRule, eval_sentence: str):
+    """
+    Tag every match of the rule in the eval sentence. Returns the new sentence and the number of matches, or None
+    for a match the reference can't tag (it stops evaluating the category there).
+    """
+    prev_end = 0
+    rule_match = 0
+    new_eval_sentence = ''
+    for matched in rule.regex.finditer(eval_sentence):
+        if rule.label is None:
+            return eval_sentence, None
+        match_text = str(matched.group(0)).strip().replace(" ", "_")
+        new_eval_sentence += eval_sentence[prev_end:matched.start()]
+        new_eval_sentence += "[%s%s[/%s" % (rule.label, match_text, rule.label)
+        prev_end = matched.end()
+        rule_match += 1
+    if rule_match == 0:
+        return eval_sentence, 0
+    return new_eval_sentence + eval_sentence[prev_end:], rule_match
+
+
+def forward_phrase(eval_sentence: str, phrase_regex, plain: bool, custom_window: int):
+    """
+    The phrase run_individual_context matches the target phrase in for a forward trigger (PREN/FSTT/ONEW) of the
+    eval sentence, or None. Its scan index never advances, so every forward trigger scans the whole sentence, and
+    the phrase keeps growing while no match is found; its backward scan never runs.
+    """
+    if "[PREN]" not in eval_sentence and "[FSTT]" not in eval_sentence and "[ONEW]" not in eval_sentence:
+        return None
+    sentence_tokens = eval_sentence.strip().split(' ')
+    forward_count = len([t for t in sentence_tokens if forward_trigger(t.strip())])
+    if forward_count == 0:
+        return None
+
+    sentence_phrase = ' '.join(sentence_tokens) + ' '
+    if plain:
+        # a match in a part of the phrase that ends in a space is also a match in all of it
+        matched_phrase = sentence_phrase * forward_count
+        return matched_phrase if phrase_regex.search(matched_phrase) else None
+
+    # a target phrase with regex syntax is matched the way the reference grows the phrase, one token at a time
+    sentence_tokens_length = len(sentence_tokens)
+    matched_phrase = ''
+    for f in range(forward_count):
+        break_trigger = False
+        for j in range(sentence_tokens_length):
+            matched_phrase += (sentence_tokens[j] + " ")
+            if j >= (sentence_tokens_length - 1) or j > custom_window or stop_trigger(sentence_tokens[j].strip()):
+                break_trigger = True
+            if break_trigger and phrase_regex.search(matched_phrase):
+                return matched_phrase
+    return None
+
+
+# reference implementation, applies one trigger rule at a time; kept to compare the compiled engine against
 def run_individual_context(sentence: str, target_phrase: str, key: str, rules, phrase_regex):
     found = []
     custom_window = windows[key]
@@ -265,6 +514,39 @@ class Context(object):
     def __init__(self):
         log("Context init...")
         self.terms = context_init()
+        self.rule_sets = all_rule_sets
+        self.candidate_cache = LRUCache(maxsize=candidate_cache_size)
+
+    def sentence_candidates(self, sentence: str):
+        # the rules that can match the sentence, by category; kept, since a sentence is usually evaluated for
+        # more than one target phrase
+        candidates = self.candidate_cache.get(sentence)
+        if candidates is None:
+            text = None if non_ascii.search(sentence) else sentence.lower()
+            candidates = dict()
+            for key, rule_set in self.rule_sets.items():
+                candidates[key] = rule_set.candidates(text)
+            self.candidate_cache[sentence] = candidates
+        return candidates
+
+    def get_features(self, expected_term, sentence, phrase_regex):
+        features = []
+        # the target phrase is quoted and joined into one word, the same way run_individual_context builds its
+        # eval sentence
+        target_replace = repr(expected_term).replace(" ", "_")
+        eval_sentence = ".%s." % sentence.replace(expected_term, target_replace)
+        if repr(expected_term) == "'%s'" % expected_term:
+            candidates = self.sentence_candidates(sentence)
+        else:
+            # the escapes of the quoted phrase can add words the sentence doesn't have
+            candidates = dict([(key, None) for key in self.rule_sets])
+
+        plain = plain_text(expected_term)
+        for key, rule_set in self.rule_sets.items():
+            feature = rule_set.find(expected_term, sentence, eval_sentence, phrase_regex, candidates[key], plain)
+            if feature is not None:
+                features.append(feature)
+        return features
 
     def run_context(self, expected_term, sentence):
 
@@ -272,12 +554,8 @@ class Context(object):
         sentence = replace_dash_as_negation(expected_term, sentence)
         sentence = replace_future_occurrence_as_current_negation(expected_term, sentence)
 
-        features = []
         phrase_regex = re.compile(r"(\b|\]\[)%s(\b|\]\[)" % expected_term, re.IGNORECASE)
-        for key, terms in self.terms.items():
-            found = run_individual_context(sentence, expected_term, key, terms, phrase_regex)
-            if found:
-                features.extend(found)
+        features = self.get_features(expected_term, sentence, phrase_regex)
 
         temporality = Temporality.Recent
         experiencer = Experiencer.Patient
@@ -294,6 +572,22 @@ class Context(object):
 
         return ContextResult(expected_term, original_sentence, temporality, experiencer, negation)
 
+    def run_context_batch(self, expected_terms, sentence):
+        """
+        A ContextResult for each of the terms found in the sentence. The sentence isn't tagged once for all of
+        them: each term is still substituted into its own eval sentence and evaluated with run_context, as
+        run_individual_context does. What the terms share is the per-sentence rule candidates, computed once
+        here, and repeated terms share a result.
+        """
+        self.sentence_candidates(sentence)
+        results = list()
+        evaluated = dict()
+        for expected_term in expected_terms:
+            if expected_term not in evaluated:
+                evaluated[expected_term] = self.run_context(expected_term, sentence)
+            results.append(evaluated[expected_term])
+        return results
+
 
 if __name__ == '__main__':
     ctxt = Context()
@@ -1,9 +1,12 @@
-from .size_measurement_finder import run as run_size_measurement, SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
-from .date_finder import run as run_date_finder, DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-from .time_finder import run as run_time_finder, TimeValue, EMPTY_FIELD as EMPTY_TIME_FIELD
-from .o2sat_finder import run as run_o2sat_finder, O2Tuple, EMPTY_FIELD as EMPTY_O2_FIELD
+from .size_measurement_finder import run as run_size_measurement, run_objects as run_size_measurement_objects, \
+    SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
+from .date_finder import run as run_date_finder, run_objects as run_date_finder_objects, DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
+from .time_finder import run as run_time_finder, run_objects as run_time_finder_objects, TimeValue, EMPTY_FIELD as EMPTY_TIME_FIELD
+from .o2sat_finder import run as run_o2sat_finder, run_objects as run_o2sat_finder_objects, O2Tuple, EMPTY_FIELD as EMPTY_O2_FIELD
 from .terms import *
-from .named_entity_recognition import get_standard_entities, NamedEntity
-from .subject_finder import run as run_subject_finder, clean_sentence as subject_clean_sentence, init as subject_finder_init
+from .named_entity_recognition import get_standard_entities, get_standard_entities_batch, NamedEntity
+from .subject_finder import run as run_subject_finder, run_objects as run_subject_finder_objects, \
+    clean_sentence as subject_clean_sentence, init as subject_finder_init
 from .lab_value_matcher import init as lab_value_matcher_init
+from .sentence_prefilter import SentencePrefilter
 
@@ -101,6 +101,10 @@ To unpack the JSON results:
                 log(d.day)
             etc.
 
+To get the list of DateValue namedtuples without the JSON round trip:
+
+        date_results = df.run_objects(sentence)
+
 Reference: PHP Date Formats, http://php.net/manual/en/datetime.formats.date.php
 
 """
@@ -373,12 +377,12 @@ def _clean_sentence(sentence):
 
 
 ###############################################################################
-def run(sentence):
+def run_objects(sentence):
     """
 
     Find dates in the sentence by attempting to match all regexes. Avoid
-    matching sub-expressions of already-matched strings. Returns a JSON
-    array containing info on each date found.
+    matching sub-expressions of already-matched strings. Returns a list
+    of DateValue namedtuples, one for each date found.
 
     """
 
@@ -485,6 +489,17 @@ def run(sentence):
     # sort results to match order in sentence
     results = sorted(results, key=lambda x: x.start)
 
+    return results
+
+
+###############################################################################
+def run(sentence):
+    """
+    Same as 'run_objects', but returns a JSON array of the results.
+    """
+
+    results = run_objects(sentence)
+
     # convert to list of dicts to preserve field names in JSON output
     return json.dumps([r._asdict() for r in results], indent=4)
 
@@ -1,14 +1,11 @@
-import en_core_web_sm as english_model
 from data_access import BaseModel
-import time
+import spacy_models
 from algorithms.segmentation import Segmentation
 from claritynlp_logging import log, ERROR, DEBUG
 
 
 segmentation = Segmentation()
 
-data = {}
-loading_status = 'none'
 descriptions = {
     "PERSON": "People",
     "NORP": "Nationalities or religious or political groups",
@@ -32,26 +29,8 @@ descriptions = {
 
 
 def nlp_init(tries=0):
-    if tries > 0:
-        log('Retrying, try%d' % tries)
-
-    global loading_status
-    if loading_status == 'none' and 'nlp' not in data:
-        try:
-            log('NER init...')
-            loading_status = 'loading'
-            data['nlp'] = english_model.load()
-            loading_status = 'done'
-        except Exception as exc:
-            log(exc)
-            loading_status = 'none'
-    elif loading_status == 'loading' and tries < 30:
-        time.sleep(10)
-        if loading_status == 'loading':
-            new_tries = tries + 1
-            return nlp_init(tries=new_tries)
-
-    return data['nlp']
+    # the pipeline is shared with the other spaCy users in the process
+    return spacy_models.get_model()
 
 
 class NamedEntity(BaseModel):
@@ -69,14 +48,21 @@ class NamedEntity(BaseModel):
 
 
 def get_standard_entities(text):
-    spacy = nlp_init()
-    sentences = segmentation.parse_sentences(text)
-    results = []
-    for s in sentences:
-        s = s.strip()
-        if len(s) > 0:
-            doc = spacy(s)
-            results.extend([NamedEntity(s, ent.text, ent.start_char, ent.end_char, ent.label_) for ent in doc.ents])
+    return get_standard_entities_batch([text])[0]
+
+
+def get_standard_entities_batch(texts, batch_size=spacy_models.DEFAULT_BATCH_SIZE, n_process=1):
+    """
+    Find the entities in each text, streaming the sentences of all texts through spaCy together.
+    Returns one list of NamedEntity per text; start and end are offsets into the entity's sentence.
+    """
+    results = [list() for text in texts]
+    sentence_lists = [segmentation.parse_sentences(text) for text in texts]
+    for index, s, doc in spacy_models.pipe_documents(nlp_init(), sentence_lists,
+                                                     disable=spacy_models.DISABLE_FOR_ENTITIES,
+                                                     batch_size=batch_size, n_process=n_process):
+        results[index].extend([NamedEntity(s, ent.text, ent.start_char, ent.end_char, ent.label_)
+                               for ent in doc.ents])
     return results
 
 
@@ -871,11 +871,11 @@ def _erase(sentence, candidates):
 
 
 ###############################################################################
-def run(sentence):
+def run_objects(sentence):
     """
     Find values related to oxygen saturation, flow rates, etc. Compute values
-    such as P/F ratio when possible. Returns a JSON array containing info
-    on all values extracted or computed.
+    such as P/F ratio when possible. Returns a list of O2Tuple namedtuples
+    for all values extracted or computed.
     """
 
     results = []
@@ -1078,6 +1078,17 @@ def run(sentence):
     # sort results to match order of occurrence in sentence
     results = sorted(results, key=lambda x: x.start)
 
+    return results
+
+
+###############################################################################
+def run(sentence):
+    """
+    Same as 'run_objects', but returns a JSON array of the results.
+    """
+
+    results = run_objects(sentence)
+
     # convert to list of dicts to preserve field names in JSON output
     return json.dumps([r._asdict() for r in results], indent=4)
     
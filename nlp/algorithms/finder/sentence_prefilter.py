@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+
+Prefilter that selects the sentences worth running an expensive finder on.
+
+The value extractor and the measurement (subject) finder can only report a
+result for a sentence that contains one of the query terms, but both do a
+full sentence cleanup, many regex passes and (for the subject finder) a spaCy
+parse before they find that out. This module builds one Aho-Corasick
+automaton (see term_trie.py) from the query terms and uses it to:
+
+    1. skip a document without any term before it is segmented
+    2. skip each sentence without a term, keeping 'window' sentences on
+       either side of each sentence with a term
+
+The prefilter never drops a sentence that a finder could match. Each term is
+keyed on its longest run of letters and digits, matched case-insensitively
+and without word boundaries, which every match of the term has to contain.
+Terms with regex operators that make characters optional or alternative
+(such as '?', '*' or '|') have no such key; if any term has one the
+prefilter selects everything.
+
+The counts of documents and sentences seen and skipped are kept on the
+prefilter, for the job stats.
+
+"""
+
+import re
+
+from algorithms.finder.term_trie import TermTrie, fold_case
+
+# operators after which a term's letters are no longer required to match
+_OPTIONAL_CHARS = set('?*|[]{}\\^$')
+
+_regex_word = re.compile(r'[^\W_]+')
+
+
+###############################################################################
+def term_key(term):
+    """
+    Return the case-folded text that any match of the term must contain, or
+    None if there is none.
+    """
+
+    if any(c in _OPTIONAL_CHARS for c in term):
+        return None
+    words = _regex_word.findall(fold_case(term))
+    if 0 == len(words):
+        return None
+    return max(words, key=len)
+
+
+###############################################################################
+class SentencePrefilter(object):
+
+    def __init__(self, terms, window=0):
+        self.window = int(window)
+        self.trie = TermTrie()
+        self.enabled = terms is not None and len(terms) > 0
+        if self.enabled:
+            for term in terms:
+                key = term_key(term)
+                if key is None:
+                    self.enabled = False
+                    break
+                self.trie.add(key, term)
+            self.trie.build()
+
+        self.documents = 0
+        self.documents_skipped = 0
+        self.sentences = 0
+        self.sentences_skipped = 0
+
+    def has_terms(self, text):
+        for match in self.trie.scan(fold_case(text)):
+            return True
+        return False
+
+    def document_has_terms(self, text):
+        """
+        Returns False if the document can be skipped without segmenting it.
+        """
+
+        if not self.enabled:
+            return True
+        self.documents += 1
+        if self.has_terms(text):
+            return True
+        self.documents_skipped += 1
+        return False
+
+    def select(self, sentences):
+        """
+        Returns the sentences with a term hit, plus 'window' neighbors on
+        either side, in their original order.
+        """
+
+        if not self.enabled:
+            return sentences
+
+        count = len(sentences)
+        keep = [False] * count
+        for i, sentence in enumerate(sentences):
+            if self.has_terms(sentence):
+                for j in range(max(0, i - self.window), min(count, i + self.window + 1)):
+                    keep[j] = True
+
+        selected = [sentence for i, sentence in enumerate(sentences) if keep[i]]
+        self.sentences += count
+        self.sentences_skipped += count - len(selected)
+        return selected
+
+    def add_stats(self, stats):
+        # counts from a copy of the prefilter that ran in another process
+        self.documents += stats['documents']
+        self.documents_skipped += stats['documents_skipped']
+        self.sentences += stats['sentences']
+        self.sentences_skipped += stats['sentences_skipped']
+
+    def get_stats(self):
+        return {
+            'documents': self.documents,
+            'documents_skipped': self.documents_skipped,
+            'sentences': self.sentences,
+            'sentences_skipped': self.sentences_skipped
+        }
@@ -76,6 +76,10 @@ To unpack the JSON into a list of SizeMeasurement namedtuples:
         json_data = json.loads(json_string)
         measurements = [smf.SizeMeasurement(**m) for m in json_data]
 
+or get the same list without the JSON round trip:
+
+        measurements = smf.run_objects(sentence)
+
 To access the fields in each measurement:
 
         for m in measurements:
@@ -132,6 +136,12 @@ SIZE_MEASUREMENT_FIELDS = [
 ]
 SizeMeasurement = namedtuple('SizeMeasurement', SIZE_MEASUREMENT_FIELDS)
 
+# key order of the JSON returned by 'run'
+_JSON_FIELDS = [
+    'text', 'start', 'end', 'temporality', 'units', 'condition', 'values',
+    'x', 'y', 'z', 'xView', 'yView', 'zView', 'minValue', 'maxValue'
+]
+
 # values for the temporality field
 STR_CURRENT  = 'CURRENT'
 STR_PREVIOUS = 'PREVIOUS'
@@ -319,18 +329,16 @@ def enable_debug():
 
 
 ###############################################################################
-def _to_json(measurement_list):
+def _to_size_measurements(measurement_list):
     """
-    Convert a list of _Measurement namedtuples to a JSON string.
-
-    Convert each _Measurement to a dict, add each to a list of dicts, and
-    then serialize the entire list of dicts.
+    Convert a list of _Measurement namedtuples to a list of SizeMeasurement
+    namedtuples, in order of their position in the sentence.
     """
 
     # order the measurements by their position in the sentence
     measurement_list = sorted(measurement_list, key=lambda x: x.start)
 
-    dict_list = []
+    results = []
     for m in measurement_list:
         m_dict = {}
         m_dict['text'] = m.text
@@ -430,7 +438,7 @@ def _to_json(measurement_list):
 
             # something wrong if empty dict
             if 0 == len(data):
-                log('size_measurement::_to_json: DATA LIST IS EMPTY')
+                log('size_measurement::_to_size_measurements: DATA LIST IS EMPTY')
                 log(m_dict)
                 assert len(data) > 0
 
@@ -441,9 +449,20 @@ def _to_json(measurement_list):
         m_dict['maxValue'] = maxValue
         
         # this measurement has now been converted
-        dict_list.append(m_dict)
+        results.append(SizeMeasurement(**m_dict))
 
-    # serialize the entire list of dicts
+    return results
+
+
+###############################################################################
+def _to_json(size_measurements):
+    """
+    Convert a list of SizeMeasurement namedtuples to a JSON string.
+    """
+
+    # convert to list of dicts to preserve field names in JSON output
+    dict_list = [{field: getattr(m, field) for field in _JSON_FIELDS}
+                 for m in size_measurements]
     return json.dumps(dict_list, indent=4)
 
 
@@ -1155,11 +1174,12 @@ def _clean_sentence(sentence):
 
 
 ###############################################################################
-def run(sentence):
+def run_objects(sentence):
     """
 
     Search the sentence for size measurements and construct a _Measurement
-    namedtuple for each measurement found. Returns a JSON string.
+    namedtuple for each measurement found. Returns a list of SizeMeasurement
+    namedtuples.
     
     """
 
@@ -1272,8 +1292,16 @@ def run(sentence):
             if 0 == len(s):
                 break
 
-    # convert list to JSON
-    return _to_json(measurements)
+    return _to_size_measurements(measurements)
+
+
+###############################################################################
+def run(sentence):
+    """
+    Same as 'run_objects', but returns a JSON array of the measurements.
+    """
+
+    return _to_json(run_objects(sentence))
 
 
 ###############################################################################
@@ -132,6 +132,12 @@ To unpack the measurement list:
         meas_list = result.measurementList
         measurements = [sf.Measurement(**m) for m in meas_list]
 
+To skip the JSON round trip, 'run_objects' takes the same arguments as 'run'
+and returns the SubjectFinderResult directly, with a list of Measurement
+namedtuples in its measurementList field:
+
+        result = sf.run_objects(term_string, sentence)
+
 The fields of each measurement are now accessible via:
 
         for m in measurements:
@@ -205,22 +211,24 @@ if __name__ == '__main__':
 
 try:
     import finder_overlap as overlap 
-    from size_measurement_finder import run as smf_run, SizeMeasurement, STR_PREVIOUS
+    from size_measurement_finder import run_objects as smf_run_objects, SizeMeasurement, STR_PREVIOUS
 except:
     from algorithms.finder import finder_overlap as overlap
-    from algorithms.finder.size_measurement_finder import run as smf_run, SizeMeasurement, STR_PREVIOUS
+    from algorithms.finder.size_measurement_finder import run_objects as smf_run_objects, SizeMeasurement, \
+        STR_PREVIOUS
 
+import spacy_models
     
 FILE_DIR = os.path.dirname(__file__)
 
 # debug only
 from spacy import displacy
 
-# load Spacy's English model
-nlp = spacy.load('en_core_web_sm')
+# private copy of Spacy's English model, loaded on first use by 'get_nlp'
+nlp = None
 
 VERSION_MAJOR = 0
-VERSION_MINOR = 10
+VERSION_MINOR = 11
 
 # set to True to enable debug output
 TRACE = False
@@ -601,24 +609,42 @@ def init(ngram_file_path=NGRAM_FILE):
         print('ngram min chars: {0}'.format(ngram_min_chars))
         for n in range(1, len(ngram_word_counts)+1):
             print('Number of ngrams of length {0:2}: {1:6}'.format(n, len(ngram_dict[n])))
-    
+
+
+###############################################################################
+def get_nlp():
+    """
+    Return this module's spaCy pipeline, loading it on first use. The
+    tokenizer special cases below would change the tokenization for other
+    modules, so the pipeline is a private copy rather than the shared one.
+    """
+
+    global nlp
+    if nlp is not None:
+        return nlp
+
+    model = spacy_models.get_model(disable=spacy_models.DISABLE_FOR_PARSE, key='subject_finder')
+
     # 'measures' is a 3rd person singular present verb
     special_case = [{ORTH: u'measures', LEMMA: u'measure', TAG: u'VBZ', POS: u'VERB'}]
-    nlp.tokenizer.add_special_case(u'measures', special_case)
+    model.tokenizer.add_special_case(u'measures', special_case)
 
     # 'measure' is a non 3rd person singular present verb
     special_case = [{ORTH: u'measure', LEMMA: u'measure', TAG: u'VBP', POS: u'VERB'}]
-    nlp.tokenizer.add_special_case(u'measure', special_case)
+    model.tokenizer.add_special_case(u'measure', special_case)
 
     # 'measured' is a verb, past participle
     special_case = [{ORTH: u'measured', LEMMA: u'measure', TAG: u'VBN', POS: u'VERB'}]
-    nlp.tokenizer.add_special_case(u'measured', special_case)
+    model.tokenizer.add_special_case(u'measured', special_case)
 
     # 'measuring' is a verb form, either a gerund or present participle
     special_case = [{ORTH: u'measuring', LEMMA: u'measure', TAG: u'VBG', POS: u'VERB'}]
-    nlp.tokenizer.add_special_case(u'measuring', special_case)    
+    model.tokenizer.add_special_case(u'measuring', special_case)
+
+    nlp = model
+    return nlp
+
 
-    
 ###############################################################################
 def load_ngram_file(filepath, ngram_dict):
     """
@@ -657,16 +683,12 @@ def load_ngram_file(filepath, ngram_dict):
 
                 
 ###############################################################################
-def to_json(original_terms, original_sentence, measurements):
+def to_result(original_terms, original_sentence, measurements):
     """
-    Convert the results to a JSON string.
+    Convert the results to a SubjectFinderResult namedtuple, with a list of
+    Measurement namedtuples in its 'measurementList' field.
     """
 
-    result_dict = {}
-    result_dict['sentence'] = original_sentence
-    result_dict['measurementCount'] = len(measurements)
-    result_dict['terms'] = original_terms
-
     # check for presence of query terms in the meas subjects
     terms_lc = [t.lower() for t in original_terms]
 
@@ -687,9 +709,7 @@ def to_json(original_terms, original_sentence, measurements):
                     found_it = True
                     # no break, need to append all matches
 
-    result_dict['querySuccess'] = found_it
-
-    dict_list = []
+    measurement_list = []
     for m in measurements:
         m_dict = {}
 
@@ -702,13 +722,40 @@ def to_json(original_terms, original_sentence, measurements):
         elif isinstance(loc, list) and 0 == len(loc):
             m_dict['location'] = EMPTY_FIELD
 
-        dict_list.append(m_dict)
-    
-    # serialize everything to JSON
-    result_dict['measurementList'] = dict_list
+        measurement_list.append(Measurement(**m_dict))
+
+    return SubjectFinderResult(sentence = original_sentence,
+                               terms = original_terms,
+                               querySuccess = found_it,
+                               measurementCount = len(measurements),
+                               measurementList = measurement_list)
+
+
+###############################################################################
+def result_to_json(result):
+    """
+    Convert a SubjectFinderResult namedtuple to a JSON string.
+    """
+
+    # same key order as the JSON that 'run' has always returned
+    result_dict = {}
+    result_dict['sentence'] = result.sentence
+    result_dict['measurementCount'] = result.measurementCount
+    result_dict['terms'] = result.terms
+    result_dict['querySuccess'] = result.querySuccess
+    result_dict['measurementList'] = [m._asdict() for m in result.measurementList]
     return json.dumps(result_dict, indent=4)
 
 
+###############################################################################
+def to_json(original_terms, original_sentence, measurements):
+    """
+    Convert the results to a JSON string.
+    """
+
+    return result_to_json(to_result(original_terms, original_sentence, measurements))
+
+
 ###############################################################################
 def log_token(token):
     """
@@ -1619,7 +1666,7 @@ def tokenize_and_find_subjects(sentence):
     original_sentence = sentence
     
     # tokenize and produce a dependency parse of the sentence
-    doc = nlp(sentence)
+    doc = get_nlp()(sentence)
 
     if TRACE:
         log_tokens(doc)
@@ -1644,7 +1691,7 @@ def tokenize_and_find_subjects(sentence):
             if 0 == len(meas_subject) and first_try:
                 if TRACE: print('no subject found, retrying...')
                 sentence2 = regex_punctuation.sub(' ', sentence)
-                doc = nlp(sentence2)
+                doc = get_nlp()(sentence2)
                 i = 0
                 num_tokens = len(doc)
                 first_try = False
@@ -1764,9 +1811,9 @@ def _find_simple_subjects(terms, sentence, measurements):
     
 
 ###############################################################################
-def run(term_string, sentence, nosub=False, use_displacy=False):
+def run_objects(term_string, sentence, nosub=False, use_displacy=False):
     """
-    Do the main work of this module.
+    Do the main work of this module. Returns a SubjectFinderResult namedtuple.
     """
 
     global ENABLE_DISPLACY
@@ -1796,9 +1843,7 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
     sentence = clean_sentence(sentence)
 
     # find all size measurements
-    json_string = smf_run(sentence)
-    json_data = json.loads(json_string)
-    size_measurements = [SizeMeasurement(**m) for m in json_data]
+    size_measurements = smf_run_objects(sentence)
 
     if TRACE:
         print('\n\nCalled subject_finder run()...')
@@ -1811,7 +1856,7 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
             
     # if no measurements then no measurement subjects
     if 0 == len(measurements):
-        return to_json(original_terms, original_sentence, [])
+        return to_result(original_terms, original_sentence, [])
 
     # attempt to resolve the simple constructs first
     resolved_meas_tuples = []
@@ -1830,7 +1875,7 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
     # take an early exit if possible
     num_resolved = len(resolved_meas_indices)
     if num_resolved == len(measurements) or num_resolved == len(terms):
-        return to_json(original_terms, original_sentence, resolved_measurements)
+        return to_result(original_terms, original_sentence, resolved_measurements)
 
     # replace measurement text with <space>M<space+>, preserves sentence length
     for i,m in enumerate(measurements):
@@ -1956,8 +2001,16 @@ def run(term_string, sentence, nosub=False, use_displacy=False):
     for i,meas in resolved_meas_tuples:
         measurements[i] = meas
             
-    # convert to a JSON result
-    return to_json(original_terms, original_sentence, measurements)
+    return to_result(original_terms, original_sentence, measurements)
+
+
+###############################################################################
+def run(term_string, sentence, nosub=False, use_displacy=False):
+    """
+    Same as 'run_objects', but returns the result as a JSON string.
+    """
+
+    return result_to_json(run_objects(term_string, sentence, nosub, use_displacy))
 
 
 ###############################################################################
@@ -1967,7 +2020,7 @@ def set_default_subject(m_sentence, sentence_ss, measurements):
     """
 
     # generate a dependency parse of the sentence
-    doc = nlp(sentence_ss)
+    doc = get_nlp()(sentence_ss)
 
     noun_list = []
     for token in doc:
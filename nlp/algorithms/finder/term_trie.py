@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+
+Aho-Corasick automaton for finding many literal strings in a single pass.
+
+Patterns are added with a value; after 'build' the automaton reports every
+occurrence of every pattern in a text as (start, end, value) tuples, in a
+single left-to-right scan whose cost does not depend on the number of
+patterns. Occurrences are reported in order of their end offset; overlapping
+occurrences are all reported.
+
+The automaton matches characters exactly. Callers that want case-insensitive
+matching should add case-folded patterns and scan case-folded text (see
+'fold_case'), and callers that want word boundaries should check them on
+the reported offsets (see 'at_word_boundary').
+
+"""
+
+from collections import deque
+
+
+###############################################################################
+def fold_case(text):
+    """
+    Lowercase the text, keeping every character offset unchanged.
+    """
+
+    folded = text.lower()
+    if len(folded) != len(text):
+        # a few characters lowercase to more than one character; keep those
+        folded = ''.join([c.lower() if len(c.lower()) == 1 else c for c in text])
+    return folded
+
+
+###############################################################################
+def is_word_char(c):
+    return c.isalnum() or '_' == c
+
+
+###############################################################################
+def at_word_boundary(text, pos):
+    """
+    Return True if there is a regex word boundary ('\\b') at text[pos].
+    """
+
+    before = pos > 0 and is_word_char(text[pos - 1])
+    after = pos < len(text) and is_word_char(text[pos])
+    return before != after
+
+
+###############################################################################
+class TermTrie(object):
+
+    def __init__(self):
+        self.goto = [dict()]
+        self.fail = [0]
+        self.output = [list()]
+        self.pattern_count = 0
+        self.built = True
+
+    def __len__(self):
+        return self.pattern_count
+
+    def add(self, pattern, value):
+        if len(pattern) == 0:
+            return
+
+        node = 0
+        for c in pattern:
+            next_node = self.goto[node].get(c)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][c] = next_node
+                self.goto.append(dict())
+                self.fail.append(0)
+                self.output.append(list())
+            node = next_node
+
+        self.output[node].append((len(pattern), value))
+        self.pattern_count += 1
+        self.built = False
+
+    def build(self):
+        """
+        Compute the failure links; called automatically by 'scan'.
+        """
+
+        queue = deque()
+        for node in self.goto[0].values():
+            self.fail[node] = 0
+            queue.append(node)
+
+        while len(queue) > 0:
+            node = queue.popleft()
+            for c, next_node in self.goto[node].items():
+                queue.append(next_node)
+                fail_node = self.fail[node]
+                while fail_node > 0 and c not in self.goto[fail_node]:
+                    fail_node = self.fail[fail_node]
+                self.fail[next_node] = self.goto[fail_node].get(c, 0)
+                if len(self.output[self.fail[next_node]]) > 0:
+                    self.output[next_node] = self.output[next_node] + self.output[self.fail[next_node]]
+
+        self.built = True
+
+    def scan(self, text):
+        if not self.built:
+            self.build()
+
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        node = 0
+        for i, c in enumerate(text):
+            while node > 0 and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            if output[node]:
+                end = i + 1
+                for length, value in output[node]:
+                    yield end - length, end, value
+
+
+###############################################################################
+if __name__ == '__main__':
+
+    trie = TermTrie()
+    for term in ['he', 'she', 'his', 'hers']:
+        trie.add(term, term)
+    for hit in trie.scan('ushers'):
+        print(hit)
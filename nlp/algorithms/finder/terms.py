@@ -1,26 +1,29 @@
 from data_access import BaseModel
-import itertools
 import util
 from algorithms.vocabulary import get_related_terms
 from algorithms.context import *
 from algorithms.sec_tag import *
 from algorithms.segmentation import *
+from algorithms.segmentation import segmentation_cache
+from algorithms.finder.term_trie import TermTrie, fold_case, at_word_boundary
 from cachetools import cached, LRUCache
 from claritynlp_logging import log, ERROR, DEBUG
 import regex
 import string
 
-log('Initializing models for term finder...')
-try:
-    section_tagger_init()
-except Exception as ex1:
-    log('Error initializing sed tagger', ERROR)
-    log(ex1, ERROR)
-c_text = Context()
 segmentor = Segmentation()
-spacy = segmentation_init()
-log('Done initializing models for term finder...')
+_context = None
 regex_cache = LRUCache(maxsize=1000)
+REGEX_METACHARACTERS = set('.^$*+?{}[]|()\\')
+
+
+def get_context():
+    # the section tagger and spaCy load on first use as well, in sec_tag_process and segmentation_init
+    global _context
+    if _context is None:
+        log('Initializing context for term finder...')
+        _context = Context()
+    return _context
 
 
 class IdentifiedTerm(BaseModel):
@@ -64,24 +67,38 @@ def filter_match(lookup, filters):
         return lookup_str in filters
 
 
-def get_matches(matcher, sentence: str, section='UNKNOWN', filters=None):
-    matches = list()
-    match = matcher.search(sentence)
-    match_ = matcher.match(sentence)
-    findall = matcher.findall(sentence)
+def search_matchers(matchers, sentence: str):
+    if isinstance(matchers, MultiTermMatcher):
+        return matchers.search_all(sentence)
 
-    if match:
-        if filters is None:
-            filters = dict()
+    found = list()
+    for matcher in matchers:
+        match = matcher.search(sentence)
+        if match:
+            found.append(match)
+    return found
+
+
+def get_sentence_matches(matchers, sentence: str, section='UNKNOWN', filters=None):
+    found = search_matchers(matchers, sentence)
 
-        temporality_filters = get_filter_values(filters, "temporality")
-        experiencer_filters = get_filter_values(filters, "experiencer")
-        negex_filters = get_filter_values(filters, "negex")
-        section_filters = get_filter_values(filters, "sections")
+    matches = list()
+    if len(found) == 0:
+        return matches
 
-        context_matches = c_text.run_context(match.group(0), sentence)
-        term = IdentifiedTerm(sentence, match.group(), str(context_matches.negex.name),
-                              str(context_matches.temporality.name), str(context_matches.experiencier.name),
+    if filters is None:
+        filters = dict()
+
+    temporality_filters = get_filter_values(filters, "temporality")
+    experiencer_filters = get_filter_values(filters, "experiencer")
+    negex_filters = get_filter_values(filters, "negex")
+    section_filters = get_filter_values(filters, "sections")
+
+    # the context rule candidates of the sentence are found once for all the terms found in it
+    context_matches = get_context().run_context_batch([match.group(0) for match in found], sentence)
+    for match, context_match in zip(found, context_matches):
+        term = IdentifiedTerm(sentence, match.group(), str(context_match.negex.name),
+                              str(context_match.temporality.name), str(context_match.experiencier.name),
                               section, match.start(), match.end())
         if filter_match(term.temporality, temporality_filters) and filter_match(term.negex, negex_filters) \
                 and filter_match(term.experiencer, experiencer_filters) and filter_match(term.section, section_filters):
@@ -90,6 +107,10 @@ def get_matches(matcher, sentence: str, section='UNKNOWN', filters=None):
     return matches
 
 
+def get_matches(matcher, sentence: str, section='UNKNOWN', filters=None):
+    return get_sentence_matches([matcher], sentence, section, filters)
+
+
 def get_full_text_matches(matchers, text: str, filters=None, section_headers=None, section_texts=None,
                           excluded_matchers=None, strip_punct=False):
     if filters is None:
@@ -104,7 +125,7 @@ def get_full_text_matches(matchers, text: str, filters=None, section_headers=Non
 
     for idx in range(0, len(section_headers)):
         section_text = section_texts[idx]
-        sentences_raw = segmentor.parse_sentences(section_text, spacy=spacy)
+        sentences_raw = segmentation_cache.get_sentences(section_text)
         sentences = list()
         if strip_punct:
             for s in sentences:
@@ -113,19 +134,14 @@ def get_full_text_matches(matchers, text: str, filters=None, section_headers=Non
             sentences = sentences_raw
         # section_code = ".".join([str(i) for i in section_headers[idx].treecode_list])
 
-        list_product = itertools.product(matchers, sentences)
-
-        for l in list_product:
-            found = get_matches(l[0], l[1], section_headers[idx], filters)
+        for sentence in sentences:
+            found = get_sentence_matches(matchers, sentence, section_headers[idx], filters)
             if found:
                 excluded = False
                 if has_exclusions:
-                    for e in excluded_matchers:
-                        if not excluded:
-                            found_excluded = get_matches(e, l[1], section_headers[idx], filters)
-                            if found_excluded:
-                                excluded = True
-                                break
+                    found_excluded = get_sentence_matches(excluded_matchers, sentence, section_headers[idx], filters)
+                    if found_excluded:
+                        excluded = True
                 if not excluded:
                     found_terms.extend(found)
     return found_terms
@@ -142,59 +158,145 @@ def get_matcher(t, max_errors=0):
         return regex.compile("(%s){e<=%d}" % (t, max_errors), regex.IGNORECASE)
 
 
+def get_literal_term(t, max_errors=0):
+    # the (text, needs word boundaries) a term's get_matcher regex matches literally, or None if the term has to be
+    # matched as a regex
+    if max_errors > 0:
+        return None
+    if all(x.isalpha() or x.isspace() for x in t):
+        return t, True
+
+    literal = ''
+    escaped = False
+    for x in t:
+        if escaped:
+            if x.isalnum():
+                return None
+            literal += x
+            escaped = False
+        elif x == '\\':
+            escaped = True
+        elif x in REGEX_METACHARACTERS:
+            return None
+        else:
+            literal += x
+    if escaped:
+        return None
+    return literal, False
+
+
+class TermMatch(object):
+
+    def __init__(self, text, start, end):
+        self.text = text
+        self.match_start = start
+        self.match_end = end
+
+    def group(self, *args):
+        return self.text
+
+    def start(self):
+        return self.match_start
+
+    def end(self):
+        return self.match_end
+
+
+class MultiTermMatcher(object):
+
+    # Finds the first match of each term in a sentence with one Aho-Corasick scan, with the same case folding and
+    # word boundaries as the term's get_matcher regex. Terms that aren't literal strings fall back to a compiled
+    # matcher from the fallback factory (get_matcher by default).
+    def __init__(self, terms, max_errors=0, fallback=None):
+        if fallback is None:
+            fallback = get_matcher
+        self.terms = list(terms)
+        self.trie = TermTrie()
+        self.fallback_matchers = list()
+        for idx, t in enumerate(self.terms):
+            literal = get_literal_term(t, max_errors)
+            if literal and len(literal[0]) > 0:
+                self.trie.add(fold_case(literal[0]), (idx, literal[1]))
+            else:
+                self.fallback_matchers.append((idx, fallback(t, max_errors=max_errors)))
+        self.trie.build()
+
+    def __len__(self):
+        return len(self.terms)
+
+    def search_all(self, sentence: str):
+        first_matches = dict()
+        if len(self.trie) > 0:
+            for start, end, (idx, bounded) in self.trie.scan(fold_case(sentence)):
+                if idx in first_matches:
+                    continue
+                if bounded and not (at_word_boundary(sentence, start) and at_word_boundary(sentence, end)):
+                    continue
+                first_matches[idx] = TermMatch(sentence[start:end], start, end)
+
+        for idx, matcher in self.fallback_matchers:
+            match = matcher.search(sentence)
+            if match:
+                first_matches[idx] = match
+
+        return [first_matches[idx] for idx in sorted(first_matches.keys())]
+
+
+def expand_terms(match_terms, include_synonyms=False, include_descendants=False, include_ancestors=False,
+                 vocabulary='SNOMED'):
+    # the normalized terms plus their related terms from the vocabulary, which takes a few queries per term
+    terms = list()
+    for s in match_terms:
+        s = s.replace("\r", " ").replace("\n", " ").strip()
+        terms.append(s.lower())
+    terms = list(set(terms))
+    added = []
+    if include_synonyms or include_descendants or include_ancestors and len(util.conn_string) > 0:
+        for term in terms:
+            added.extend(get_related_terms(util.conn_string, term, vocabulary, include_synonyms,
+                                           include_descendants, include_ancestors))
+        terms.extend(added)
+    return terms
+
+
 class TermFinder(BaseModel):
 
+    # expanded_terms, from expand_terms, skips the vocabulary lookups when the termset was expanded already
     def __init__(self, match_terms,  include_synonyms=False,
                  include_descendants=False, include_ancestors=False,
                  vocabulary='SNOMED', filters=None, excluded_terms=None,
-                 max_errors=0):
+                 max_errors=0, expanded_terms=None):
         if filters is None:
             self.filters = {}
         else:
             self.filters = filters
 
-        self.terms = list()
-        for s in match_terms:
-            s = s.replace("\r", " ").replace("\n", " ").strip()
-            self.terms.append(s.lower())
-        self.terms = list(set(self.terms))
-        self.matchers = []
-        added = []
+        if expanded_terms is None:
+            expanded_terms = expand_terms(match_terms, include_synonyms, include_descendants, include_ancestors,
+                                          vocabulary)
+        self.terms = list(expanded_terms)
         self.max_errors = max_errors
-        if include_synonyms or include_descendants or include_ancestors and len(util.conn_string) > 0:
-            for term in self.terms:
-                added.extend(get_related_terms(util.conn_string, term, vocabulary, include_synonyms,
-                                               include_descendants, include_ancestors))
-            self.terms.extend(added)
-        self.matchers = [get_matcher(t, max_errors=max_errors) for t in self.terms]
-        self.secondary_matchers = list()
-        for t in self.terms:
-            if len(t) > 5:
-                get_matcher(t, max_errors=self.max_errors+1)
-        self.excluded_matchers = list()
+        self.matcher = MultiTermMatcher(self.terms, max_errors=max_errors)
+
         self.excluded_terms = list()
         if excluded_terms and len(excluded_terms) > 0:
             for s in excluded_terms:
-                s = s.replace("\r", " ").replace("\n", " ").trim()
+                s = s.replace("\r", " ").replace("\n", " ").strip()
                 self.excluded_terms.append(s.lower())
                 self.excluded_terms.append(s.lower().translate(str.maketrans('', '', string.punctuation)))
         self.excluded_terms = list(set(self.excluded_terms))
-        self.excluded_matchers = [get_matcher(t) for t in self.excluded_terms]
+        self.excluded_matcher = MultiTermMatcher(self.excluded_terms)
 
     def get_term_matches(self, sentence: str, section='UNKNOWN'):
-        term_matches = list()
-        for m in self.matchers:
-            cur = get_matches(m, sentence, section)
-            term_matches.extend(cur)
-        return term_matches
+        return get_sentence_matches(self.matcher, sentence, section)
 
     def get_term_full_text_matches(self, full_text: str, section_headers=None, section_texts=None):
         if section_headers is None:
             section_headers = [UNKNOWN]
         if section_texts is None:
             section_texts = [full_text]
-        ft_matches = get_full_text_matches(self.matchers, full_text, self.filters, section_headers, section_texts,
-                                           excluded_matchers=self.excluded_matchers)
+        ft_matches = get_full_text_matches(self.matcher, full_text, self.filters, section_headers, section_texts,
+                                           excluded_matchers=self.excluded_matcher)
         if ft_matches and len(ft_matches) > 0:
             return ft_matches
         else:
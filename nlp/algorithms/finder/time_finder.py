@@ -141,6 +141,10 @@ To unpack the JSON results:
                 log(t.hours)
             etc.
 
+To get the list of TimeValue namedtuples without the JSON round trip:
+
+        time_results = tf.run_objects(sentence)
+
 References: 
 
     PHP Time Formats:
@@ -457,12 +461,12 @@ def _clean_sentence(sentence):
 
 
 ###############################################################################
-def run(sentence):
+def run_objects(sentence):
     """
 
     Find time expressions in the sentence by attempting to match all regexes.
-    Avoid matching sub-expressions of already-matched strings. Returns a JSON
-    array containing info on each date found.
+    Avoid matching sub-expressions of already-matched strings. Returns a list
+    of TimeValue namedtuples, one for each time expression found.
     
     """    
 
@@ -596,6 +600,17 @@ def run(sentence):
     # sort results to match order of occurrence in sentence
     results = sorted(results, key=lambda x: x.start)
     
+    return results
+
+
+###############################################################################
+def run(sentence):
+    """
+    Same as 'run_objects', but returns a JSON array of the results.
+    """
+
+    results = run_objects(sentence)
+
     # convert to list of dicts to preserve field names in JSON output
     return json.dumps([r._asdict() for r in results], indent=4)
 
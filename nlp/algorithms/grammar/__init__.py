@@ -1 +1 @@
-from .pos_tagger import get_tags, Tag
+from .pos_tagger import get_tags, get_tags_batch, Tag
@@ -1,14 +1,11 @@
-import en_core_web_sm as english_model
 from data_access import BaseModel
-import time
+import spacy_models
 from algorithms.segmentation import Segmentation
 from claritynlp_logging import log, ERROR, DEBUG
 
 
 segmentation = Segmentation()
 
-data = {}
-loading_status = 'none'
 tags = {
     "CC": "Coordinating conjunction",
     "CD": "Cardinal number",
@@ -50,26 +47,8 @@ tags = {
 
 
 def nlp_init(tries=0):
-    if tries > 0:
-        log('Retrying, try%d' % tries)
-
-    global loading_status
-    if loading_status == 'none' and 'nlp' not in data:
-        try:
-            log('POSTagger init...')
-            loading_status = 'loading'
-            data['nlp'] = english_model.load()
-            loading_status = 'done'
-        except Exception as exc:
-            log(exc)
-            loading_status = 'none'
-    elif loading_status == 'loading' and tries < 30:
-        time.sleep(10)
-        if loading_status == 'loading':
-            new_tries = tries + 1
-            return nlp_init(tries=new_tries)
-
-    return data['nlp']
+    # the pipeline is shared with the other spaCy users in the process
+    return spacy_models.get_model()
 
 
 class Tag(BaseModel):
@@ -91,15 +70,21 @@ class Tag(BaseModel):
 
 
 def get_tags(text):
-    spacy = nlp_init()
-    sentences = segmentation.parse_sentences(text)
-    results = []
-    for s in sentences:
-        s = s.strip()
-        if len(s) > 0:
-            doc = spacy(s)
-            results.extend([Tag(s, token.text, token.lemma_, token.pos_, token.tag_, token.dep_,
-                                token.shape_, token.is_alpha, token.is_stop) for token in doc])
+    return get_tags_batch([text])[0]
+
+
+def get_tags_batch(texts, batch_size=spacy_models.DEFAULT_BATCH_SIZE, n_process=1):
+    """
+    Tag the tokens of each text, streaming the sentences of all texts through spaCy together.
+    Returns one list of Tag per text.
+    """
+    results = [list() for text in texts]
+    sentence_lists = [segmentation.parse_sentences(text) for text in texts]
+    for index, s, doc in spacy_models.pipe_documents(nlp_init(), sentence_lists,
+                                                     disable=spacy_models.DISABLE_FOR_PARSE,
+                                                     batch_size=batch_size, n_process=n_process):
+        results[index].extend([Tag(s, token.text, token.lemma_, token.pos_, token.tag_, token.dep_,
+                                   token.shape_, token.is_alpha, token.is_stop) for token in doc])
     return results
 
 
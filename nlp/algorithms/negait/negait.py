@@ -87,15 +87,15 @@ import re
 import os
 import sys
 import json
-import spacy
 import optparse
 from collections import namedtuple
 from nltk.stem.porter import PorterStemmer
+import spacy_models
 from claritynlp_logging import log, ERROR, DEBUG
 
 
 VERSION_MAJOR = 0
-VERSION_MINOR = 2
+VERSION_MINOR = 3
 
 # serializable result object
 EMPTY_FIELD = None
@@ -113,9 +113,6 @@ NEGAIT_RESULT_FIELDS = ['sentence', 'negation_list']
 NegaitResult = namedtuple('NegaitResult', NEGAIT_RESULT_FIELDS)
 
 
-# load Spacy's English model
-nlp = spacy.load('en_core_web_sm')
-
 stemmer = PorterStemmer()
 
 STEMMED_TOKEN_FIELDS = ['token', 'stem']
@@ -305,7 +302,9 @@ def run(original_sentence, json_output=True):
 
     sentence = original_sentence.lower()
     
-    doc = nlp(sentence)
+    # the shared English pipeline, loaded on first use
+    nlp = spacy_models.get_model()
+    doc = nlp(sentence, disable=spacy_models.DISABLE_FOR_PARSE)
 
     # build stemmed token list
     st_list = [StemmedToken(token, stemmer.stem(token.text)) for token in doc]
@@ -2,6 +2,7 @@
 
 import re
 import os
+import threading
 from copy import deepcopy
 
 from nltk.tokenize import sent_tokenize
@@ -697,6 +698,10 @@ def merge(list1, list2):
 ###############################################################################
 def process_report(report):
 
+    # load the concept maps on first use
+    if not inited:
+        section_tagger_init()
+
     #raw_sentences = sent_tokenize(report)
     sentences = sent_tokenize(report)
 
@@ -1059,9 +1064,16 @@ def sec_tag_file_path():
 
 inited = False
 init_in_progress = False
+_init_lock = threading.Lock()
 
 
 def section_tagger_init():
+    # a caller that arrives during another thread's init waits for it
+    with _init_lock:
+        return _section_tagger_init()
+
+
+def _section_tagger_init():
     global init_in_progress, inited
     if inited or init_in_progress:
         log("section tagger init already done or in progress")
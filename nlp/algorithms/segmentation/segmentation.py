@@ -61,9 +61,7 @@ import re
 import os
 import sys
 import json
-import time
 import argparse
-import en_core_web_sm as english_model
 from nltk.tokenize import sent_tokenize
 
 if __name__ == '__main__':
@@ -81,39 +79,23 @@ if __name__ == '__main__':
 else:
     from algorithms.segmentation import segmentation_helper as seg_helper
 
+import spacy_models
 from claritynlp_logging import log, ERROR, DEBUG
 
 
 _VERSION_MAJOR = 0
-_VERSION_MINOR = 3
+_VERSION_MINOR = 4
 _MODULE_NAME = 'segmentation.py'
 
-_data = {}
-_loading_status = 'none'
-
 
 ###############################################################################
 def segmentation_init(tries=0):
-    if tries > 0:
-        log('Retrying, try%d' % tries)
+    """
+    Return the shared spaCy pipeline, loading it on first use. The 'tries'
+    argument is no longer used; concurrent callers wait for a single load.
+    """
 
-    global _loading_status
-    if _loading_status == 'none' and 'nlp' not in _data:
-        try:
-            log('Segmentation init...')
-            _loading_status = 'loading'
-            _data['nlp'] = english_model.load()
-            _loading_status = 'done'
-        except Exception as exc:
-            log(exc, ERROR)
-            _loading_status = 'none'
-    elif _loading_status == 'loading' and tries < 30:
-        time.sleep(10)
-        if _loading_status == 'loading':
-            new_tries = tries + 1
-            return segmentation_init(tries=new_tries)
-
-    return _data['nlp']
+    return spacy_models.get_model()
 
 
 ###############################################################################
@@ -132,7 +114,7 @@ def parse_sentences_spacy(text, spacy=None):
     text = seg_helper.do_substitutions(text)
 
     # now do the sentence tokenization with the substitutions in place
-    doc = spacy(text)
+    doc = spacy(text, disable=spacy_models.DISABLE_FOR_PARSE)
     sentences = [sent.string.strip() for sent in doc.sents]
 
     # fix various problems and undo the substitutions
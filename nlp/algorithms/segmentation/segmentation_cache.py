@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+
+Cache of sentence and section segmentation results, keyed by a hash of the
+segmented text.
+
+Several pipelines in a phenotype job usually run on the same Solr documents,
+and each of them needs the document's sentences (spaCy) or sections
+(section tagger). This module keeps those results in an in-process LRU cache
+(if util.use_memory_caching is enabled) backed by Redis (if
+util.use_redis_caching is enabled), so that a document is segmented only once
+per job, whichever task asks first. Sentences are kept as offsets into the
+text where possible (see segmentation_spans.py), not as copies of it.
+
+Lookups and misses are counted with util.add_cache_query_count and
+util.add_cache_compute_count.
+
+"""
+
+import json
+import hashlib
+from cachetools import LRUCache
+
+import util
+from algorithms.segmentation.segmentation import Segmentation
+from algorithms.segmentation.segmentation_spans import locate_spans, SpanList
+from claritynlp_logging import log, ERROR, DEBUG
+
+# bump when the segmentation or the cached format changes, so that old entries are no longer read
+CACHE_NAMESPACE = 'segmentation:v2'
+SENTENCES_PREFIX = 'sentences'
+SECTIONS_PREFIX = 'sections'
+
+segmentation_cache = LRUCache(maxsize=5000)
+segmentor = Segmentation()
+
+
+###############################################################################
+def text_key(prefix, text):
+    digest = hashlib.sha1(text.encode('utf-8', errors='replace')).hexdigest()
+    return '{0}:{1}'.format(prefix, digest)
+
+
+###############################################################################
+def get_cached(prefix, text, compute):
+    """
+    Return compute(text), looking it up in the memory and Redis caches first.
+    The computed value must be JSON serializable.
+    """
+
+    key = text_key(prefix, text)
+    util.add_cache_query_count()
+
+    use_memory = util.use_memory_caching == "true"
+    use_redis = util.use_redis_caching == "true"
+
+    if use_memory:
+        value = segmentation_cache.get(key)
+        if value is not None:
+            return value
+
+    if use_redis:
+        try:
+            cached_text = util.cache_get(CACHE_NAMESPACE, key)
+            if cached_text:
+                value = json.loads(cached_text)
+                if use_memory:
+                    segmentation_cache[key] = value
+                return value
+        except Exception as ex:
+            log(ex, ERROR)
+
+    util.add_cache_compute_count()
+    value = compute(text)
+
+    if use_memory:
+        segmentation_cache[key] = value
+    if use_redis:
+        try:
+            util.cache_set(CACHE_NAMESPACE, key, json.dumps(value))
+        except Exception as ex:
+            log(ex, ERROR)
+
+    return value
+
+
+###############################################################################
+def segment_to_spans(text, spacy=None):
+    """
+    Segment the text, and return {'spans': offsets} if every sentence can be
+    sliced back from the text, or else the list of sentences.
+    """
+
+    sentences = segmentor.parse_sentences(text, spacy=spacy)
+    spans = locate_spans(text, sentences, exact=True)
+    if spans is None:
+        return sentences
+    return {'spans': spans}
+
+
+###############################################################################
+def get_sentences(text, spacy=None):
+    """
+    Return the sentences of the text, segmenting it only on a cache miss.
+    """
+
+    value = get_cached(SENTENCES_PREFIX, text, lambda t: segment_to_spans(t, spacy=spacy))
+    if isinstance(value, dict):
+        return SpanList(text, value['spans'])
+    return value
+
+
+###############################################################################
+def get_sections(text, compute):
+    """
+    Return the (section names, section texts) of the text, calling
+    compute(text) only on a cache miss.
+    """
+
+    names, section_texts = get_cached(SECTIONS_PREFIX, text, lambda t: list(compute(t)))
+    return names, section_texts
@@ -10,7 +10,6 @@ For import only.
 import re
 import os
 import sys
-import json
 from claritynlp_logging import log, ERROR, DEBUG
 
 try:
@@ -334,14 +333,9 @@ def _find_size_meas_subs(report, sub_list, token_text):
     measurements after the first '.'.
     """
 
-    json_string = smf.run(report)
-    if '[]' == json_string:
+    measurements = smf.run_objects(report)
+    if 0 == len(measurements):
         return report
-    
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of SizeMeasurement namedtuples
-    measurements = [smf.SizeMeasurement(**m) for m in json_data]
 
     # convert to a list of (start, end, match_text) tuples
     tuple_list = [(m.start, m.end, m.text) for m in measurements]
@@ -359,15 +353,10 @@ def _find_date_subs(report, sub_list, token_text):
     Run date_finder to find dates in the report text and replace with tokens.
     """
 
-    json_string = df.run(report)
-    if '[]' == json_string:
+    dates = df.run_objects(report)
+    if 0 == len(dates):
         return report
 
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of DateValue namedtuples
-    dates = [df.DateValue(**d) for d in json_data]
-
     # ignore all-digit dates, or all text (such as 'may', 'june', etc.)
     keep_dates = []
     for d in dates:
@@ -399,14 +388,9 @@ def _find_time_subs(report, sub_list, token_text):
     replace with tokens.
     """
 
-    json_string = tf.run(report)
-    if '[]' == json_string:
+    times = tf.run_objects(report)
+    if 0 == len(times):
         return report
-        
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of TimeValue namedtuples
-    times = [tf.TimeValue(**t) for t in json_data]
 
     # convert to a list of (start, end, match_text) tuples
     # ignore any all-digit matches, could be a measured value
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+
+Sentences and sections stored as character offsets into the document text.
+
+The segmenter cleans up a report before it splits it, so its sentences are
+the document text with whitespace collapsed, not exact substrings. Storing
+those strings duplicates every document in Solr and in the caches. This
+module stores them as a flat list of offsets instead,
+
+        [start_0, end_0, start_1, end_1, ...]
+
+and reads them back with a SpanList, which slices each sentence from the one
+text buffer when it is accessed.
+
+'locate_spans' finds each piece in order by its non-whitespace characters.
+With exact=True (sentences) a piece is only located if the span, with
+whitespace collapsed, is identical to it; if cleanup changed anything else
+(for instance runs of dashes) there are no spans and the caller keeps the
+strings. Section texts are looked up without that check, since they are
+segmented again before use.
+
+"""
+
+from collections.abc import Sequence
+
+
+###############################################################################
+def collapse_whitespace(text):
+    return ' '.join(text.split())
+
+
+###############################################################################
+def _compact(text):
+    """
+    Return the text without whitespace, and the offset in the text of each of
+    its characters.
+    """
+
+    positions = [i for i, c in enumerate(text) if not c.isspace()]
+    compact = ''.join([text[i] for i in positions])
+    return compact, positions
+
+
+###############################################################################
+def locate_spans(text, pieces, exact=False):
+    """
+    Return the flat list of offsets of the pieces of the text, in order, or
+    None if a piece can't be located.
+    """
+
+    compact, positions = _compact(text)
+    spans = list()
+    cursor = 0
+    for piece in pieces:
+        key = ''.join(piece.split())
+        if 0 == len(key):
+            # an empty section still has a place in the order
+            if exact and piece != '':
+                return None
+            start = positions[cursor] if cursor < len(positions) else len(text)
+            spans.extend([start, start])
+            continue
+
+        index = compact.find(key, cursor)
+        if index < 0:
+            return None
+        start = positions[index]
+        end = positions[index + len(key) - 1] + 1
+        if exact and collapse_whitespace(text[start:end]) != piece:
+            return None
+
+        spans.extend([start, end])
+        cursor = index + len(key)
+
+    return spans
+
+
+###############################################################################
+class SpanList(Sequence):
+    """
+    Read-only list of the strings at the given spans of the text, sliced and
+    whitespace-collapsed on access.
+    """
+
+    def __init__(self, text, spans):
+        self.text = text
+        self.spans = spans
+
+    def __len__(self):
+        return len(self.spans) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('SpanList index out of range')
+        return collapse_whitespace(self.text[self.spans[2 * index]:self.spans[2 * index + 1]])
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return 'SpanList({0})'.format(list(self))
@@ -1,3 +1,4 @@
-from .value_extractor import run as run_value_extractor, ValueResult, Value, EMPTY_FIELD as EMPTY_VALUE_FIELD
+from .value_extractor import run as run_value_extractor, run_objects as run_value_extractor_objects, ValueResult, Value, \
+    ValueExtractorPlan, EMPTY_FIELD as EMPTY_VALUE_FIELD
 from .tnm_stage_extractor import run as run_tnm_stager, TNM_FIELDS, TnmCode, EMPTY_FIELD as EMPTY_TNM_FIELD
 from .columbia_transfusion_note_reader import run_on_text as run_transfusion_note_reader
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark a ValueExtractorPlan against per-sentence setup.
+
+Before ValueExtractorPlan, the value extractor's 'run' function cleaned and
+sorted the query terms and compiled every query for every sentence it was
+given. A ValueExtractorPlan does the setup once per term set, and 'apply'
+only matches. This module loads value_extractor.py as of a git revision
+from before the plan ('--baseline', from the git repo this file is in),
+builds a corpus of synthetic vital signs sentences, runs it through both,
+verifies that the results are identical and reports the time per sentence:
+
+        python3 ./benchmark_value_extractor.py
+        python3 ./benchmark_value_extractor.py --sentences 20000 --seed 7
+        python3 ./benchmark_value_extractor.py --baseline <git revision>
+
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+
+if __name__ == '__main__':
+
+    # interactive testing; add nlp dir to path to find logging class
+    match = re.search(r'nlp/', sys.path[0])
+    if match:
+        nlp_dir = sys.path[0][:match.end()]
+        sys.path.append(nlp_dir)
+    else:
+        print('\n*** benchmark_value_extractor.py: nlp dir not found ***\n')
+        sys.exit(0)
+
+    import value_extractor as ve
+else:
+    from algorithms.value_extraction import value_extractor as ve
+
+from claritynlp_logging import log, ERROR, DEBUG
+
+# the last revision whose value extractor compiled its queries per sentence
+BASELINE_REV = 'fe65c93'
+VALUE_EXTRACTOR_PATH = 'nlp/algorithms/value_extraction/value_extractor.py'
+
+VITALS_TERMS = ['temperature', 'temp', 'T', 'BP', 'HR', 'pulse', 'RR', 'respiratory rate', 'O2 sat', 'SpO2',
+                'SaO2', 'weight', 'wt']
+
+VITALS_TEMPLATES = [
+    'Vitals: T {t} BP {sys}/{dia} HR {hr} RR {rr} O2 sat {o2}% on RA.',
+    'VS: temp {t}, BP {sys}/{dia}, pulse {hr}, RR {rr}, SpO2 {o2}% 2L NC',
+    'On arrival to the floor his vitals were BP {sys}/{dia} and HR {hr}, RR {rr}, and SpO2 {o2}% on NRB.',
+    'Temperature {t} degrees, heart rate between {hr} and {hr2}, blood pressure {sys}/{dia} to {sys2}/{dia2}.',
+    'Patient weight {wt} kg, temp max {t}, SaO2 > {o2}%.',
+    'HR {hr}-{hr2}s, BP {sys}/{dia}, RR {rr} unlabored, T {t} at 0600 on 3/14/2019.',
+    'Respiratory rate approx. {rr}, O2 sat less than {o2}% for 2 hrs after transfusion.',
+    'No acute distress; wt {wt} lbs, pulse {hr} regular, BP {sys}/{dia} sitting.',
+    'If temperature above {t2} call for fever workup; current temp {t}.',
+    'The patient is alert and oriented with no complaints today.',
+]
+
+
+###############################################################################
+def make_corpus(count, seed=1):
+    """
+    Return a list of 'count' vital signs sentences with random values.
+    """
+
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        template = VITALS_TEMPLATES[i % len(VITALS_TEMPLATES)]
+        values = {
+            't': '{0:.1f}'.format(rng.uniform(96.0, 103.0)),
+            't2': '{0:.1f}'.format(rng.uniform(100.0, 102.0)),
+            'sys': rng.randint(85, 190),
+            'sys2': rng.randint(85, 190),
+            'dia': rng.randint(40, 110),
+            'dia2': rng.randint(40, 110),
+            'hr': rng.randint(45, 140),
+            'hr2': rng.randint(45, 140),
+            'rr': rng.randint(10, 32),
+            'o2': rng.randint(82, 100),
+            'wt': rng.randint(45, 130),
+        }
+        corpus.append(template.format(**values))
+    return corpus
+
+
+###############################################################################
+def load_baseline(rev=BASELINE_REV):
+    """
+    Import value_extractor.py as of git revision 'rev' as a separate module.
+    """
+
+    this_dir = os.path.dirname(os.path.abspath(__file__))
+    source = subprocess.check_output(['git', 'show', '{0}:{1}'.format(rev, VALUE_EXTRACTOR_PATH)],
+                                     cwd=this_dir)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filepath = os.path.join(tmp_dir, 'baseline_value_extractor.py')
+        with open(filepath, 'wb') as outfile:
+            outfile.write(source)
+        spec = importlib.util.spec_from_file_location('baseline_value_extractor', filepath)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+###############################################################################
+def run_per_sentence(baseline, sentences, minval, maxval):
+    return [baseline.run(VITALS_TERMS, sentence, minval, maxval) for sentence in sentences]
+
+
+###############################################################################
+def run_plan(sentences, minval, maxval):
+    plan = ve.ValueExtractorPlan(VITALS_TERMS, minval, maxval)
+    return [plan.apply(sentence) for sentence in sentences]
+
+
+###############################################################################
+def time_run(func, sentences, minval, maxval):
+    start = time.perf_counter()
+    results = func(sentences, minval, maxval)
+    elapsed = time.perf_counter() - start
+    return results, 1000.0 * elapsed / len(sentences)
+
+
+###############################################################################
+def run(sentence_count=2000, seed=1, minval='0', maxval='1000', baseline_rev=BASELINE_REV):
+
+    baseline = load_baseline(baseline_rev)
+    sentences = make_corpus(sentence_count, seed)
+
+    reference, per_sentence_ms = time_run(lambda *args: run_per_sentence(baseline, *args),
+                                          sentences, minval, maxval)
+    results, plan_ms = time_run(run_plan, sentences, minval, maxval)
+
+    mismatches = 0
+    for sentence, a, b in zip(sentences, reference, results):
+        if a != b:
+            mismatches += 1
+            log('MISMATCH for "{0}"'.format(sentence), ERROR)
+    log('{0} sentences, {1} mismatches'.format(len(sentences), mismatches))
+
+    log('per-sentence setup:  {0:.3f} ms/sentence'.format(per_sentence_ms))
+    log('ValueExtractorPlan:  {0:.3f} ms/sentence ({1:.1f}x)'.format(plan_ms, per_sentence_ms / plan_ms))
+
+    return 0 == mismatches
+
+
+###############################################################################
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark the value extractor query plan')
+    parser.add_argument('--sentences', type=int, default=2000,
+                        help='number of synthetic vital signs sentences')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='random seed for the synthetic corpus')
+    parser.add_argument('--baseline', default=BASELINE_REV,
+                        help='git revision of the per-sentence value extractor to compare against')
+    args = parser.parse_args()
+
+    if not run(args.sentences, args.seed, baseline_rev=args.baseline):
+        sys.exit(1)
@@ -13,6 +13,7 @@ import sys
 import json
 import argparse
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 if __name__ == '__main__':
     # for interactive command-line tests
@@ -1044,6 +1045,46 @@ def test_value_extractor_full():
     return True
 
 
+###############################################################################
+def test_value_extractor_run_many():
+    """
+    Plans must not share term mappings, and run_many on a thread pool must
+    give the same results as applying the plan to each sentence in turn.
+    """
+
+    sentences = [
+        'Temp 101.2, BP 120/80, HR 88',
+        'TEMP 98.6 and bp 135/85 at rest',
+        'temp max 102.1, pulse 110, HR 105',
+        'No vitals recorded today.'
+    ]
+
+    # both term lists clean to 'temp'; each plan must restore its own term
+    plan_a = ve.ValueExtractorPlan('Temp, HR', 0, 1000)
+    plan_b = ve.ValueExtractorPlan('TEMP, BP', 0, 1000)
+
+    for sentence in sentences:
+        for plan, original in [(plan_a, 'Temp'), (plan_b, 'TEMP')]:
+            result = plan.apply_objects(sentence)
+            if result is None:
+                continue
+            for value in result.measurementList:
+                if 'temp' == value.matchingTerm.lower() and \
+                   original != value.matchingTerm:
+                    print('\texpected matching term "{0}", found "{1}"'.
+                          format(original, value.matchingTerm))
+                    return False
+
+    expected = [plan_a.apply_objects(sentence) for sentence in sentences]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        computed = plan_a.run_many(sentences * 8, executor=executor)
+    if computed != expected * 8:
+        print('\trun_many results differ from apply_objects results')
+        return False
+
+    return True
+
+
 ###############################################################################
 if __name__ == '__main__':
 
@@ -1068,4 +1109,5 @@ if __name__ == '__main__':
         ve.enable_debug()
 
     assert test_value_extractor_full()
+    assert test_value_extractor_run_many()
     
@@ -78,6 +78,11 @@ To unpack the array of values:
             print(v.end)
             etc.
 
+To get the ValueResult without the JSON round trip (None if no values were
+found), with a list of Value namedtuples in its measurementList field:
+
+        result = ve.run_objects(search_term_string, sentence, minval, maxval)
+
 The 'run' function has the following signature:
 
         def run(term_string, sentence, str_minval=None, str_maxval=None,
@@ -99,6 +104,7 @@ import re
 import os
 import sys
 import json
+from functools import lru_cache
 from collections import namedtuple
 from claritynlp_logging import log, ERROR, DEBUG
 
@@ -106,12 +112,12 @@ from claritynlp_logging import log, ERROR, DEBUG
 # imports from ClarityNLP core
 try:
     # for normal operation via NLP pipeline
-    from algorithms.finder.date_finder import run as \
-        run_date_finder, DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-    from algorithms.finder.time_finder import run as \
-        run_time_finder, TimeValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-    from algorithms.finder.size_measurement_finder import run as \
-        run_size_measurement, SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
+    from algorithms.finder.date_finder import run_objects as \
+        run_date_finder_objects, DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
+    from algorithms.finder.time_finder import run_objects as \
+        run_time_finder_objects, TimeValue, EMPTY_FIELD as EMPTY_DATE_FIELD
+    from algorithms.finder.size_measurement_finder import run_objects as \
+        run_size_measurement_objects, SizeMeasurement, EMPTY_FIELD as EMPTY_SMF_FIELD
     from algorithms.finder import finder_overlap as overlap
 except Exception as e:
     # If here, this module was executed directly from the value_extraction
@@ -124,12 +130,12 @@ except Exception as e:
         nlp_dir = this_module_dir[:pos+4]
         finder_dir = os.path.join(nlp_dir, 'algorithms', 'finder')
         sys.path.append(finder_dir)
-        from date_finder import run as run_date_finder, \
+        from date_finder import run_objects as run_date_finder_objects, \
             DateValue, EMPTY_FIELD as EMPTY_DATE_FIELD
-        from time_finder import run as run_time_finder, \
+        from time_finder import run_objects as run_time_finder_objects, \
             TimeValue, EMPTY_FIELD as EMPTY_TIME_FIELD
-        from size_measurement_finder import run as \
-            run_size_measurement, SizeMeasurement, EMPTY_FIELD as \
+        from size_measurement_finder import run_objects as \
+            run_size_measurement_objects, SizeMeasurement, EMPTY_FIELD as \
             EMPTY_SMF_FIELD
         from algorithms.finder import finder_overlap as overlap
         
@@ -169,7 +175,7 @@ ValueMeasurement = namedtuple('ValueMeasurement',
 ###############################################################################
 
 _VERSION_MAJOR = 0
-_VERSION_MINOR = 19
+_VERSION_MINOR = 21
 _MODULE_NAME = 'value_extractor.py'
 
 # set to True to enable debug output
@@ -321,9 +327,25 @@ _DURATION_GROUP_NAMES = ['dur_amt', 'dur_amt1']
 _str_enum_suffix = r'\s*(st|nd|rd|th)'
 _regex_enum_suffix = re.compile(_str_enum_suffix)
 
-# used to restore original terms and original filter terms
-_term_dict = {}
-_filter_term_dict = {}
+_regex_bf = re.compile(_str_bf)
+
+# compiled value extraction queries for a single query term
+_VALUE_QUERY_FIELDS = [
+    'bf_fraction_range', # between/from fraction range
+    'fraction_range',    # two fractions with a range separator inbetween
+    'fraction',          # two ints separated by '/', such as blood pressure
+    'units_range',       # range with units after each number
+    'bf_range',          # between/from numeric range
+    'range',             # two numbers with a range separator inbetween
+    'op_val',            # <query> <operator> <value>
+    'wds_val'            # <query> <words> <value>
+]
+_ValueQueries = namedtuple('_ValueQueries', _VALUE_QUERY_FIELDS)
+
+# compiled enumlist queries: the query for the leading term of each match,
+# and the search for each trailing term in the text that follows it
+_ENUM_QUERY_FIELDS = ['lead_queries', 'trail_searches']
+_EnumQueries = namedtuple('_EnumQueries', _ENUM_QUERY_FIELDS)
 
 
 ###############################################################################
@@ -334,28 +356,24 @@ def enable_debug():
 
 
 ###############################################################################
-def _to_json(original_terms, original_sentence, results, filter_terms):
+def _to_result(original_terms, original_sentence, results, filter_terms,
+               term_dict, filter_term_dict):
     """
-    Convert results to a JSON string.
+    Convert results to a ValueResult namedtuple, with a list of Value
+    namedtuples in its 'measurementList' field. The term dicts map the
+    cleaned terms back to the original terms.
     """
 
     if _TRACE:
-        log('calling _to_json...')
+        log('calling _to_result...')
         print('\tTERM DICT: ')
-        for k,v in _term_dict.items():
+        for k,v in term_dict.items():
             print('\t\t{0} => {1}'.format(k,v))
 
-    total = len(results)
     has_enumlist = len(filter_terms) > 0
-    
-    result_dict = {}
-    result_dict['sentence'] = original_sentence
-    result_dict['measurementCount'] = len(results)
-    result_dict['terms'] = original_terms
-    result_dict['querySuccess'] = len(results) > 0
-
-    # build a list of dictionaries for the value measurements
-    dict_list = []
+
+    # build a list of Value namedtuples for the value measurements
+    value_list = []
     for m in results:
         m_dict = {}
 
@@ -367,9 +385,9 @@ def _to_json(original_terms, original_sentence, results, filter_terms):
         m_dict['start'] = m.start
         m_dict['end'] = m.end
         m_dict['condition'] = m.cond
-        m_dict['matchingTerm'] = _term_dict[m.matching_term]
+        m_dict['matchingTerm'] = term_dict[m.matching_term]
         if has_enumlist:
-            m_dict['x'] = _filter_term_dict[m.num1]
+            m_dict['x'] = filter_term_dict[m.num1]
         else:
             m_dict['x'] = m.num1
 
@@ -395,9 +413,26 @@ def _to_json(original_terms, original_sentence, results, filter_terms):
         if _TRACE:
             log('\t\tresult: {0}'.format(m_dict))
 
-        dict_list.append(m_dict)
+        value_list.append(Value(**m_dict))
+
+    return ValueResult(sentence = original_sentence,
+                       measurementCount = len(results),
+                       terms = original_terms,
+                       querySuccess = len(results) > 0,
+                       measurementList = value_list)
+
+
+###############################################################################
+def _to_json(result):
+    """
+    Convert a ValueResult namedtuple to a JSON string.
+    """
+
+    if result is None:
+        return EMPTY_RESULT
 
-    result_dict['measurementList'] = dict_list
+    result_dict = result._asdict()
+    result_dict['measurementList'] = [v._asdict() for v in result.measurementList]
     return json.dumps(result_dict, indent=4)
 
     
@@ -535,7 +570,7 @@ def _get_query_start(query_term):
 
 
 ###############################################################################
-def _extract_enumlist_values_left(query_terms, sentence, enum_terms):
+def _extract_enumlist_values_left(query_terms, sentence, enum_terms, queries=None):
     """
     Extract a word to match the query term, and accept if that word
     appears in the result filter. Assumes the enumerated terms FOLLOW the
@@ -548,6 +583,9 @@ def _extract_enumlist_values_left(query_terms, sentence, enum_terms):
         log('\t query_terms: {0}'.format(query_terms))
         log('\t  enum_terms: {0}'.format(enum_terms))
 
+    if queries is None:
+        queries = _compile_enum_queries(enum_terms, query_terms, 'query_text', 'qt')
+
     results = []
 
     # query_terms and enum_terms are sorted in decreasing order of length
@@ -555,14 +593,9 @@ def _extract_enumlist_values_left(query_terms, sentence, enum_terms):
     for et in enum_terms:
         if _TRACE:
             log('searching for enum term "{0}"'.format(et))
-        escaped_enum_term = re.escape(et)
-        str_enum_query = escaped_enum_term               +\
-            r'(?P<query_text>'                           +\
-            r'\s*(' + _str_enumlist_value + r'\s*){0,8}' +\
-            r')'
 
         candidates = []
-        iterator = re.finditer(str_enum_query, sentence)
+        iterator = queries.lead_queries[et].finditer(sentence)
         for match in iterator:
             if _TRACE: log('\tMATCH_TEXT: ->{0}<-'.format(match.group()))
             match_start = match.start()
@@ -576,9 +609,7 @@ def _extract_enumlist_values_left(query_terms, sentence, enum_terms):
             
             # now search for the longest matching query term in this text
             for qt in query_terms:
-                escaped_query_term = re.escape(qt)
-                str_query_term = r'(?P<qt>' + escaped_query_term + r')'
-                match2 = re.search(str_query_term, query_text)
+                match2 = queries.trail_searches[qt].search(query_text)
                 if match2:
                     match_text = match2.group()
                     start = match.start()
@@ -607,7 +638,7 @@ def _extract_enumlist_values_left(query_terms, sentence, enum_terms):
                 
         
 ###############################################################################
-def _extract_enumlist_values_right(query_terms, sentence, enum_terms):
+def _extract_enumlist_values_right(query_terms, sentence, enum_terms, queries=None):
     """
     Extract a word to match the query term, and accept if that word
     appears in the result filter. Assumes the enumerated terms FOLLOW the
@@ -620,19 +651,17 @@ def _extract_enumlist_values_right(query_terms, sentence, enum_terms):
         log('\t query_terms: {0}'.format(query_terms))
         log('\t  enum_terms: {0}'.format(enum_terms))
 
+    if queries is None:
+        queries = _compile_enum_queries(query_terms, enum_terms, 'enum_text', 'et')
+
     results = []
 
     for query_term in query_terms:
         if _TRACE:
             log('searching for query term "{0}"'.format(query_term))
-        escaped_query_term = re.escape(query_term)
-        str_enum_query = escaped_query_term                                  +\
-            r'(?P<enum_text>'                                                +\
-            r'\s*(' + _str_enumlist_value + r'\s*){0,8}'                     +\
-            r')'
 
         candidates = []
-        iterator = re.finditer(str_enum_query, sentence)
+        iterator = queries.lead_queries[query_term].finditer(sentence)
         for match in iterator:
             if _TRACE: log('\tMATCH TEXT: ->{0}<-'.format(match.group()))
             match_start = match.start()
@@ -647,9 +676,7 @@ def _extract_enumlist_values_right(query_terms, sentence, enum_terms):
             # now search for the longest matching enum term in this text
             # enum terms are sorted by length from longest to shortest
             for et in enum_terms:
-                escaped_enum_term = re.escape(et)
-                str_enum_term = r'(?P<et>' + escaped_enum_term + r')'
-                match2 = re.search(str_enum_term, enum_text)
+                match2 = queries.trail_searches[et].search(enum_text)
                 if match2:
                     match_text = match2.group()
                     #start = enum_text_start + match2.start()
@@ -679,23 +706,34 @@ def _extract_enumlist_values_right(query_terms, sentence, enum_terms):
 
         
 ###############################################################################
-def _extract_value(query_term, sentence, minval, maxval, denom_only):
+def _compile_enum_queries(lead_terms, trail_terms, text_group, term_group):
     """
-    Search the sentence for the query term, find associated values that fit
-    one of the regex patterns, extract the values, check the value against
-    [minval, maxval], determine relationship between query term and value
-    (i.e. less than, greater than, etc.), and return results.
+    Compile the enumlist queries: each lead term followed by the text to
+    search for trailing terms (captured in 'text_group'), and a search for
+    each trailing term (captured in 'term_group').
     """
 
-    if _TRACE:
-        log('calling extract_value with term "{0}"'.format(query_term))
-    
-    # no values to extract if the sentence contains no digits
-    match = _regex_digits.search(sentence)
-    if not match:
-        if _TRACE:
-            log('\tno digits found in sentence: {0}'.format(sentence))
-        return []
+    lead_queries = {}
+    for term in lead_terms:
+        str_query = re.escape(term)                                          +\
+            r'(?P<' + text_group + r'>'                                      +\
+            r'\s*(' + _str_enumlist_value + r'\s*){0,8}'                     +\
+            r')'
+        lead_queries[term] = re.compile(str_query)
+
+    trail_searches = {}
+    for term in trail_terms:
+        str_term = r'(?P<' + term_group + r'>' + re.escape(term) + r')'
+        trail_searches[term] = re.compile(str_term)
+
+    return _EnumQueries(lead_queries, trail_searches)
+
+
+###############################################################################
+def _compile_value_queries(query_term):
+    """
+    Compile the value extraction queries for a query term.
+    """
 
     str_start = _get_query_start(query_term)
 
@@ -718,11 +756,48 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
     # <query> <words> <value>
     str_wds_val_query = str_start + _str_val
 
+    return _ValueQueries(
+        bf_fraction_range = re.compile(str_bf_fraction_range_query),
+        fraction_range    = re.compile(str_fraction_range_query),
+        fraction          = re.compile(str_fraction_query),
+        units_range       = re.compile(str_units_range_query),
+        bf_range          = re.compile(str_bf_range_query),
+        range             = re.compile(str_range_query),
+        op_val            = re.compile(str_op_val_query),
+        wds_val           = re.compile(str_wds_val_query)
+    )
+
+
+###############################################################################
+def _extract_value(query_term, sentence, minval, maxval, denom_only,
+                   queries=None):
+    """
+    Search the sentence for the query term, find associated values that fit
+    one of the regex patterns, extract the values, check the value against
+    [minval, maxval], determine relationship between query term and value
+    (i.e. less than, greater than, etc.), and return results.
+
+    The compiled queries for the term are built if not provided.
+    """
+
+    if _TRACE:
+        log('calling extract_value with term "{0}"'.format(query_term))
+    
+    # no values to extract if the sentence contains no digits
+    match = _regex_digits.search(sentence)
+    if not match:
+        if _TRACE:
+            log('\tno digits found in sentence: {0}'.format(sentence))
+        return []
+
+    if queries is None:
+        queries = _compile_value_queries(query_term)
+
     spans   = []  # [start, end) character offsets of each match
     results = []  # ValueMeasurement namedtuple results
 
     # check for bf fraction ranges first
-    iterator = re.finditer(str_bf_fraction_range_query, sentence)
+    iterator = queries.bf_fraction_range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             log('\tmatched bf_fraction_range_query: {0}'.format(match.group()))
@@ -748,7 +823,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
             spans.append( (start, end))
 
     # check for other fraction ranges
-    iterator = re.finditer(str_fraction_range_query, sentence)
+    iterator = queries.fraction_range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             log('\tmatched fraction_range_query: {0}'.format(match.group()))
@@ -769,7 +844,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                   cond, query_term)
 
     # check for fractions
-    iterator = re.finditer(str_fraction_query, sentence)
+    iterator = queries.fraction.finditer(sentence)
     for match in iterator:
         if _TRACE:
             log('\tmatched fraction_query: {0}'.format(match.group()))
@@ -798,7 +873,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                       cond, query_term)
 
     # check for units range query
-    iterator = re.finditer(str_units_range_query, sentence)
+    iterator = queries.units_range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             log('\tmatched units_range_query: {0}'.format(match.group()))
@@ -836,7 +911,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                       cond, query_term)
 
     # check for bf numeric ranges
-    iterator = re.finditer(str_bf_range_query, sentence)
+    iterator = queries.bf_range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             log('\tmatched bf_range_query: {0}'.format(match.group()))
@@ -850,7 +925,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                   cond, query_term)
             
     # check for numeric ranges
-    iterator = re.finditer(str_range_query, sentence)
+    iterator = queries.range.finditer(sentence)
     for match in iterator:
         if _TRACE:
             log('\tmatched range query: {0}'.format(match.group()))
@@ -864,7 +939,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                   cond, query_term)
 
     # check for op-value matches
-    iterator = re.finditer(str_op_val_query, sentence)
+    iterator = queries.op_val.finditer(sentence)
     for match in iterator:
         if _TRACE:
             log('\tmatched op_val_query: {0}'.format(match.group()))
@@ -879,7 +954,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
         if val >= minval and val <= maxval:
             words = match.group('words')
             cond_words = match.group('cond').strip()
-            if re.search(_str_bf, words) or re.search(_str_bf, cond_words):
+            if _regex_bf.search(words) or _regex_bf.search(cond_words):
                 # found only a single digit of a range
                 if _TRACE:
                     log('\t\tdiscarding, missing second value')
@@ -900,7 +975,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
                                       cond, query_term)
             
     # check for wds-value matches
-    iterator = re.finditer(str_wds_val_query, sentence)
+    iterator = queries.wds_val.finditer(sentence)
     for match in iterator:
         if _TRACE:
             log('\tmatched wds_val_query: {0}'.format(match.group()))
@@ -914,7 +989,7 @@ def _extract_value(query_term, sentence, minval, maxval, denom_only):
 
         val = _get_suffixed_num(match, 'val', 'suffix')
         if val >= minval and val <= maxval:
-            if re.search(_str_bf, words):
+            if _regex_bf.search(words):
                 # found only a single digit of a range
                 if _TRACE:
                     log('\t\tdiscarding, missing second value')
@@ -1407,11 +1482,7 @@ def _clean_sentence(sentence, is_case_sensitive):
     sentence = string_list[0]
     
     # find date expressions in the sentence
-    json_string = run_date_finder(sentence)
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of DateMeasurement namedtuples
-    dates = [DateValue(**record) for record in json_data]
+    dates = run_date_finder_objects(sentence)
 
     # erase each date expression from the sentence
     for date in dates:
@@ -1429,11 +1500,7 @@ def _clean_sentence(sentence, is_case_sensitive):
             sentence = _erase(sentence, start, end)
 
     # find size measurements in the sentence
-    json_string = run_size_measurement(sentence)
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of SizeMeasurement namedtuples
-    measurements = [SizeMeasurement(**m) for m in json_data]
+    measurements = run_size_measurement_objects(sentence)
 
     # erase each size measurement from the sentence except for those in
     # units of cc's and inches
@@ -1455,11 +1522,7 @@ def _clean_sentence(sentence, is_case_sensitive):
         sentence = _erase(sentence, start, end)
 
     # find time expressions in the sentence
-    json_string = run_time_finder(sentence)
-    json_data = json.loads(json_string)
-
-    # unpack JSON result into a list of TimeValue namedtuples
-    times = [TimeValue(**record) for record in json_data]
+    times = run_time_finder_objects(sentence)
 
     # erase each time expression from the sentence
     for t in times:
@@ -1498,6 +1561,228 @@ def _clean_sentence(sentence, is_case_sensitive):
     return sentence
 
 
+###############################################################################
+class ValueExtractorPlan(object):
+    """
+    The query terms, term maps, min/max or enumlist settings and compiled
+    queries for one set of 'run' arguments. Build a plan once per pipeline
+    and apply it to each sentence, instead of repeating the setup for every
+    sentence:
+
+        plan = ValueExtractorPlan(terms, str_minval, str_maxval)
+        for sentence in sentences:
+            json_string = plan.apply(sentence)
+
+    'apply' returns the same JSON result as 'run' with the same arguments.
+
+    A plan is not modified after it is built and the module keeps no state
+    between calls, so a plan can be shared by threads or pickled to worker
+    processes. 'run_many' applies a plan to a batch of sentences, optionally
+    on a concurrent.futures executor or a multiprocessing Pool.
+    """
+
+    def __init__(self,
+                 term_string_or_list,
+                 str_minval=None,
+                 str_maxval=None,
+                 str_enumlist=None,
+                 is_case_sensitive=False,
+                 is_denom_only=False,
+                 values_before_terms=False):
+
+        assert term_string_or_list is not None
+
+        # treat empty enumlist as None
+        if str_enumlist is not None and isinstance(str_enumlist, list) and \
+           0 == len(str_enumlist):
+            str_enumlist = None
+
+        # the arguments, hashable, for rebuilding the plan in other processes
+        self._args = tuple(tuple(arg) if isinstance(arg, list) else arg
+                           for arg in [term_string_or_list, str_minval,
+                                       str_maxval, str_enumlist,
+                                       is_case_sensitive, is_denom_only,
+                                       values_before_terms])
+
+        # use default minval and maxval if not provided
+        if str_enumlist is None and str_minval is None:
+            str_minval = '-' + str(sys.float_info.max)
+        if str_enumlist is None and str_maxval is None:
+            str_maxval = str(sys.float_info.max)
+
+        # convert terms to list of strings, strip extraneous whitespace
+        if isinstance(term_string_or_list, str):
+            terms = term_string_or_list.split(',')
+            terms = [term.strip() for term in terms]
+        else:
+            terms = [term.strip() for term in term_string_or_list]
+
+        # sort terms from longest to shortest, helps with overlap resolution
+        terms = sorted(terms, key=lambda x: len(x), reverse=True)
+
+        # save a copy of the original terms
+        original_terms = terms.copy()
+
+        filter_terms = []
+        original_filter_terms = []
+        if str_enumlist is not None:
+            if isinstance(str_enumlist, str):
+                filter_terms = str_enumlist.split(',')
+            else:
+                filter_terms = str_enumlist
+            filter_terms = [term.strip() for term in filter_terms]
+            filter_terms = sorted(filter_terms, key=lambda x: len(x), reverse=True)
+            original_filter_terms = filter_terms.copy()
+
+        _common_clean(terms, is_case_sensitive)
+        _common_clean(filter_terms, is_case_sensitive)
+
+        # convert terms to lowercase unless doing a case-sensitive match
+        if not is_case_sensitive:
+            terms = [term.lower() for term in terms]
+            if str_enumlist is not None:
+                filter_terms = [ft.lower() for ft in filter_terms]
+
+        if _TRACE:
+            log('\n\tterms: {0}'.format(terms))
+            if str_enumlist is not None:
+                log('\tfilter_terms: {0}'.format(filter_terms))
+
+        # map the new terms to the original, so can restore in output
+        self.term_dict = {}
+        self.filter_term_dict = {}
+        for i in range(len(terms)):
+            new_term = terms[i]
+            original_term = original_terms[i]
+            self.term_dict[new_term] = original_term
+            if _TRACE:
+                log('\tterm_dict[{0}] => {1}'.format(new_term, original_term))
+        if str_enumlist is not None:
+            for i in range(len(filter_terms)):
+                new_term = filter_terms[i]
+                original_term = original_filter_terms[i]
+                self.filter_term_dict[new_term] = original_term
+                if _TRACE:
+                    log('\tfilter_term_dict[{0}] => {1}'.format(new_term, original_term))
+
+        self.minval = None
+        self.maxval = None
+        if str_enumlist is None:
+            # do range check on numerator values for fractions
+            if isinstance(str_minval, str):
+                if -1 != str_minval.find('/'):
+                    str_minval = str_minval.split('/')[0]
+
+            if isinstance(str_maxval, str):
+                if -1 != str_maxval.find('/'):
+                    str_maxval = str_maxval.split('/')[0]
+
+            self.minval = float(str_minval)
+            self.maxval = float(str_maxval)
+
+        self.terms = terms
+        self.original_terms = original_terms
+        self.filter_terms = filter_terms
+        self.has_enumlist = str_enumlist is not None
+        self.is_case_sensitive = is_case_sensitive
+        self.is_denom_only = is_denom_only
+        self.values_before_terms = values_before_terms
+
+        # compile every query now, so that applying the plan only matches
+        self.value_queries = {}
+        self.enum_queries = None
+        if self.has_enumlist:
+            if values_before_terms:
+                self.enum_queries = _compile_enum_queries(
+                    filter_terms, terms, 'query_text', 'qt')
+            else:
+                self.enum_queries = _compile_enum_queries(
+                    terms, filter_terms, 'enum_text', 'et')
+        else:
+            for term in terms:
+                if term not in self.value_queries:
+                    self.value_queries[term] = _compile_value_queries(term)
+
+    def __reduce__(self):
+        # Send the arguments instead of the compiled queries, which are slow
+        # to unpickle; each worker process builds the plan once.
+        return (_cached_plan, (self._args,))
+
+    def apply_objects(self, sentence):
+        """
+        Returns a ValueResult namedtuple, or None if no values were found.
+        """
+
+        # save a copy of the original sentence (needed for results)
+        original_sentence = sentence
+
+        sentence = _clean_sentence(sentence, self.is_case_sensitive)
+
+        results = []
+        if self.has_enumlist:
+            if self.values_before_terms:
+                results = _extract_enumlist_values_left(
+                    self.terms, sentence, self.filter_terms, self.enum_queries)
+            else:
+                results = _extract_enumlist_values_right(
+                    self.terms, sentence, self.filter_terms, self.enum_queries)
+        else:
+            for term in self.terms:
+                # extract a single numeric value
+                values = _extract_value(term, sentence, self.minval,
+                                        self.maxval, self.is_denom_only,
+                                        self.value_queries[term])
+                results.extend(values)
+
+        if 0 == len(results):
+            if _TRACE:
+                log('\t*** no results found ***')
+            return None
+
+        # order results by their starting character offset
+        results = sorted(results, key=lambda x: x.start)
+
+        # prune if appropriate for overlapping results
+        results = _resolve_overlap(self.terms, self.filter_terms, sentence,
+                                   results)
+
+        return _to_result(self.original_terms, original_sentence, results,
+                          self.filter_terms, self.term_dict,
+                          self.filter_term_dict)
+
+    def apply(self, sentence):
+        """
+        Returns the result of 'apply_objects' as a JSON string, or
+        EMPTY_RESULT if no values were found.
+        """
+
+        return _to_json(self.apply_objects(sentence))
+
+    def run_many(self, sentences, executor=None, chunksize=64):
+        """
+        Returns the 'apply_objects' result for each sentence, in order. If
+        an executor is provided (a ThreadPoolExecutor, ProcessPoolExecutor
+        or multiprocessing Pool) the sentences are distributed across its
+        workers, 'chunksize' at a time for a process pool.
+        """
+
+        if executor is None or len(sentences) < 2:
+            return [self.apply_objects(sentence) for sentence in sentences]
+
+        return list(executor.map(self.apply_objects, sentences,
+                                 chunksize=chunksize))
+
+
+###############################################################################
+@lru_cache(maxsize=32)
+def _cached_plan(args):
+    """
+    Rebuild an unpickled plan from its arguments, at most once per process.
+    """
+
+    return ValueExtractorPlan(*args)
+
+
 ###############################################################################
 def run(term_string_or_list,       # comma-separated string of query terms, or
                                    # list of strings
@@ -1521,117 +1806,40 @@ def run(term_string_or_list,       # comma-separated string of query terms, or
         log('\t      is_denom_only: {0}'.format(is_denom_only))
         log('\tvalues_before_terms: {0}'.format(values_before_terms))
 
-    assert term_string_or_list is not None
-
-    # treat empty enumlist as None
-    if str_enumlist is not None and isinstance(str_enumlist, list) and \
-       0 == len(str_enumlist):
-        str_enumlist = None
-    
-    # use default minval and maxval if not provided
-    if str_enumlist is None and str_minval is None:
-        str_minval = '-' + str(sys.float_info.max)
-    if str_enumlist is None and str_maxval is None:
-        str_maxval = str(sys.float_info.max)
-    
-    # save a copy of the original sentence (needed for results)
-    original_sentence = sentence
-
-    # convert terms to list of strings, strip extraneous whitespace
-    if isinstance(term_string_or_list, str):
-        terms = term_string_or_list.split(',')
-        terms = [term.strip() for term in terms]
-    else:
-        terms = [term.strip() for term in term_string_or_list]
-    
-    # sort terms from longest to shortest, helps with overlap resolution
-    terms = sorted(terms, key=lambda x: len(x), reverse=True)
-
-    # save a copy of the original terms
-    original_terms = terms.copy()
-
-    filter_terms = []
-    original_filter_terms = []
-    if str_enumlist is not None:
-        if isinstance(str_enumlist, str):
-            filter_terms = str_enumlist.split(',')
-        else:
-            filter_terms = str_enumlist
-        filter_terms = [term.strip() for term in filter_terms]
-        filter_terms = sorted(filter_terms, key=lambda x: len(x), reverse=True)
-        original_filter_terms = filter_terms.copy()
-
-    _common_clean(terms, is_case_sensitive)
-    _common_clean(filter_terms, is_case_sensitive)
-        
-    # convert terms to lowercase unless doing a case-sensitive match
-    if not is_case_sensitive:
-        terms = [term.lower() for term in terms]
-        if str_enumlist is not None:
-            filter_terms = [ft.lower() for ft in filter_terms]
-
-    if _TRACE:
-        log('\n\tterms: {0}'.format(terms))
-        if str_enumlist is not None:
-            log('\tfilter_terms: {0}'.format(filter_terms))
-                
-    # map the new terms to the original, so can restore in output
-    for i in range(len(terms)):
-        new_term = terms[i]
-        original_term = original_terms[i]
-        _term_dict[new_term] = original_term
-        if _TRACE:
-            log('\tterm_dict[{0}] => {1}'.format(new_term, original_term))
-    if str_enumlist is not None:
-        for i in range(len(filter_terms)):
-            new_term = filter_terms[i]
-            original_term = original_filter_terms[i]
-            _filter_term_dict[new_term] = original_term
-            if _TRACE:
-                log('\tfilter_term_dict[{0}] => {1}'.format(new_term, original_term))
-
-    if str_enumlist is None:
-        # do range check on numerator values for fractions
-        if isinstance(str_minval, str):
-            if -1 != str_minval.find('/'):
-                str_minval = str_minval.split('/')[0]
+    plan = ValueExtractorPlan(term_string_or_list,
+                              str_minval,
+                              str_maxval,
+                              str_enumlist,
+                              is_case_sensitive,
+                              is_denom_only,
+                              values_before_terms)
 
-        if isinstance(str_maxval, str):
-            if -1 != str_maxval.find('/'):
-                str_maxval = str_maxval.split('/')[0]
+    return plan.apply(sentence)
 
-        minval = float(str_minval)
-        maxval = float(str_maxval)
 
-    # end of setup
-
-    sentence = _clean_sentence(sentence, is_case_sensitive)
-
-    results = []
-    if str_enumlist is not None:
-        if values_before_terms:
-            results = _extract_enumlist_values_left(terms, sentence, filter_terms)
-        else:
-            results = _extract_enumlist_values_right(terms, sentence, filter_terms)
-    else:
-        for term in terms:
-            # extract a single numeric value
-            values = _extract_value(term, sentence, minval, maxval,
-                                    is_denom_only)
-            results.extend(values)
-
-    if 0 == len(results):
-        if _TRACE:
-            log('\t*** no results found ***')
-        return EMPTY_RESULT
-            
-    # order results by their starting character offset
-    results = sorted(results, key=lambda x: x.start)
+###############################################################################
+def run_objects(term_string_or_list,
+                sentence,
+                str_minval=None,
+                str_maxval=None,
+                str_enumlist=None,
+                is_case_sensitive=False,
+                is_denom_only=False,
+                values_before_terms=False):
+    """
+    Same as 'run', but returns a ValueResult namedtuple, or None if no values
+    were found.
+    """
 
-    # prune if appropriate for overlapping results
-    results = _resolve_overlap(terms, filter_terms, sentence, results)
+    plan = ValueExtractorPlan(term_string_or_list,
+                              str_minval,
+                              str_maxval,
+                              str_enumlist,
+                              is_case_sensitive,
+                              is_denom_only,
+                              values_before_terms)
 
-    return _to_json(original_terms, original_sentence, results, filter_terms)
+    return plan.apply_objects(sentence)
 
 
 ###############################################################################
@@ -1,61 +1,73 @@
 from algorithms.segmentation import *
+from algorithms.segmentation import segmentation_cache
 from data_access import Measurement
-from algorithms import run_subject_finder, subject_finder_init
-import json
+from algorithms import run_subject_finder_objects, subject_finder_init
 from claritynlp_logging import log, ERROR, DEBUG
 
-log('Initializing models for measurement finder...')
 segmentor = Segmentation()
-subject_finder_init()
-log('Done initializing models for measurement finder..')
+_subject_finder_inited = False
 
 
-def run_measurement_finder_full(text, term_list, is_case_sensitive_text=False):
+def measurement_finder_init():
+    # loads the subject finder's ngrams on first use instead of at import
+    global _subject_finder_inited
+    if not _subject_finder_inited:
+        log('Initializing models for measurement finder...')
+        subject_finder_init()
+        _subject_finder_inited = True
+
+
+def run_measurement_finder_full(text, term_list, is_case_sensitive_text=False, prefilter=None):
     if not is_case_sensitive_text:
         term_list = [term.lower() for term in term_list]
         text = text.lower()
 
+    measurement_finder_init()
     term_count = len(term_list)
     terms = ",".join(term_list)
     results = []
 
-    sentence_list = segmentor.parse_sentences(text)
+    # a SentencePrefilter on the terms skips documents and sentences without a term, before the spaCy parse
+    if prefilter is not None and not prefilter.document_has_terms(text):
+        return results
+
+    sentence_list = segmentation_cache.get_sentences(text)
+    if prefilter is not None:
+        sentence_list = prefilter.select(sentence_list)
     for s in sentence_list:
-        json_str = run_subject_finder(terms, s)
-        json_obj = json.loads(json_str)
-        if 0 == json_obj['measurementCount']:
+        result = run_subject_finder_objects(terms, s)
+        if 0 == result.measurementCount:
             continue
-        if term_count > 0 and not json_obj['querySuccess']:
+        if term_count > 0 and not result.querySuccess:
             # ignore if query term(s) not found
             continue
-        if json_obj and 'measurementList' in json_obj:
-            for x in json_obj['measurementList']:
-                try:
-                    m = Measurement(sentence=s,
-                                    text=x['text'],
-                                    start=x['start'],
-                                    end=x['end'],
-                                    temporality=x['temporality'],
-                                    units=x['units'],
-                                    condition=x['condition'],
-                                    matching_terms=', '.join(x['matchingTerm']),
-                                    subject=', '.join(x['subject']),
-                                    location=x['location'],
-                                    X=x['x'],
-                                    Y=x['y'],
-                                    Z=x['z'],
-                                    x_view=x['xView'],
-                                    y_view=x['yView'],
-                                    z_view=x['zView'],
-                                    value1=x['values'],
-                                    min_value = x['minValue'],
-                                    max_value = x['maxValue']
-                    )
-                    results.append(m)
-                    
-                except Exception as ex:
-                    log('measurement_finder_wrapper exception: {0}'.format(ex), ERROR)
-                    log(ERROR, ex)
+        for x in result.measurementList:
+            try:
+                m = Measurement(sentence=s,
+                                text=x.text,
+                                start=x.start,
+                                end=x.end,
+                                temporality=x.temporality,
+                                units=x.units,
+                                condition=x.condition,
+                                matching_terms=', '.join(x.matchingTerm),
+                                subject=', '.join(x.subject),
+                                location=x.location,
+                                X=x.x,
+                                Y=x.y,
+                                Z=x.z,
+                                x_view=x.xView,
+                                y_view=x.yView,
+                                z_view=x.zView,
+                                value1=x.values,
+                                min_value = x.minValue,
+                                max_value = x.maxValue
+                )
+                results.append(m)
+
+            except Exception as ex:
+                log('measurement_finder_wrapper exception: {0}'.format(ex), ERROR)
+                log(ERROR, ex)
 
     return results
 
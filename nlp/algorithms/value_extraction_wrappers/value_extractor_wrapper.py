@@ -1,8 +1,9 @@
 import regex as re
-import json
+from functools import lru_cache
 from data_access import Measurement
 from algorithms.segmentation import *
-from algorithms.value_extraction import run_value_extractor
+from algorithms.segmentation import segmentation_cache
+from algorithms.value_extraction import ValueExtractorPlan
 from claritynlp_logging import log, ERROR, DEBUG
 
 log('Initializing models for value extractor...')
@@ -10,6 +11,39 @@ segmentor = Segmentation()
 log('Done initializing models for value extractor...')
 
 
+def make_value_extractor_plan(term_list,
+                              minimum_value,
+                              maximum_value,
+                              enumlist=None,
+                              is_case_sensitive_text=False,
+                              denom_only=False,
+                              values_before_terms=False):
+    """
+    The ValueExtractorPlan for a pipeline's arguments. Plans are cached by their arguments, so all the batches of
+    a pipeline that run in a process share one.
+    """
+
+    if enumlist is None:
+        enumlist = list()
+    args = tuple(tuple(arg) if isinstance(arg, list) else arg
+                 for arg in [term_list, minimum_value, maximum_value, enumlist, is_case_sensitive_text, denom_only,
+                             values_before_terms])
+    return _cached_value_extractor_plan(args)
+
+
+@lru_cache(maxsize=32)
+def _cached_value_extractor_plan(args):
+    term_list, minimum_value, maximum_value, enumlist, is_case_sensitive_text, denom_only, values_before_terms = \
+        [list(arg) if isinstance(arg, tuple) else arg for arg in args]
+    return ValueExtractorPlan(term_list,
+                              str_minval = minimum_value,
+                              str_maxval = maximum_value,
+                              str_enumlist = enumlist,
+                              is_case_sensitive = is_case_sensitive_text,
+                              is_denom_only = denom_only,
+                              values_before_terms = values_before_terms)
+
+
 def run_value_extractor_full(term_list,
                              text,
                              minimum_value,
@@ -17,52 +51,72 @@ def run_value_extractor_full(term_list,
                              enumlist=None,
                              is_case_sensitive_text=False,
                              denom_only=False,
-                             values_before_terms=False):
+                             values_before_terms=False,
+                             plan=None):
 
-    if enumlist is None:
-        enumlist = list()
-    sentence_list = segmentor.parse_sentences(text)
-    process_results = []
+    # callers running many documents with the same arguments pass in a plan
+    # built once by make_value_extractor_plan
+    if plan is None:
+        plan = make_value_extractor_plan(term_list, minimum_value, maximum_value, enumlist,
+                                         is_case_sensitive_text, denom_only, values_before_terms)
+    sentence_list = segmentation_cache.get_sentences(text)
+    results = [plan.apply_objects(sentence) for sentence in sentence_list]
+    return _to_measurements(sentence_list, results)
+
+
+def run_value_extractor_many(texts, plan, executor=None, prefilter=None):
+    """
+    Run a value extractor plan on each text and return a list of Measurement lists, one per text. The texts are
+    segmented here; the sentences of all texts are then matched together with plan.run_many, on the executor if
+    one is provided. A SentencePrefilter on the query terms skips texts and sentences without a term.
+    """
 
-    for sentence in sentence_list:
+    sentence_lists = list()
+    for text in texts:
+        if prefilter is None:
+            sentence_lists.append(segmentation_cache.get_sentences(text))
+        elif prefilter.document_has_terms(text):
+            sentence_lists.append(prefilter.select(segmentation_cache.get_sentences(text)))
+        else:
+            sentence_lists.append(list())
+    all_sentences = [sentence for sentence_list in sentence_lists for sentence in sentence_list]
+    all_results = plan.run_many(all_sentences, executor=executor)
 
-        json_string = run_value_extractor(
-            term_list,
-            sentence,
-            str_minval = minimum_value,
-            str_maxval = maximum_value,
-            str_enumlist = enumlist,
-            is_case_sensitive = is_case_sensitive_text,
-            is_denom_only = denom_only,
-            values_before_terms = values_before_terms)
+    measurement_lists = []
+    start = 0
+    for sentence_list in sentence_lists:
+        end = start + len(sentence_list)
+        measurement_lists.append(_to_measurements(sentence_list, all_results[start:end]))
+        start = end
+    return measurement_lists
 
-        if json_string is not None and len(json_string) > 0:
 
-            # parse the JSON result
-            json_data = json.loads(json_string)
+def _to_measurements(sentence_list, results):
+    process_results = []
+
+    for sentence, result in zip(sentence_list, results):
+
+        if result is not None:
 
             # the individual value extractions are in the 'measurementList'
-            if 'measurementList' in json_data:
-                measurements = json_data['measurementList']
-                for m in measurements:
-                    process_results.append(
-                        Measurement(
-                            sentence       = sentence,
-                            text           = m['text'],
-                            start          = m['start'],
-                            end            = m['end'],
-                            condition      = m['condition'],
-                            X              = m['x'],
-                            Y              = m['y'],
-                            matching_terms = m['matchingTerm'],
-                            min_value      = m['minValue'],
-                            max_value      = m['maxValue']
-                        )
+            for m in result.measurementList:
+                process_results.append(
+                    Measurement(
+                        sentence       = sentence,
+                        text           = m.text,
+                        start          = m.start,
+                        end            = m.end,
+                        condition      = m.condition,
+                        X              = m.x,
+                        Y              = m.y,
+                        matching_terms = m.matchingTerm,
+                        min_value      = m.minValue,
+                        max_value      = m.maxValue
                     )
+                )
 
     return process_results
 
-
 if __name__ == '__main__':
     res = run_value_extractor_full(["temperature", "temp", "T", "BP", "HR", "Sp02"],
                                    'Prior to transfer, his vitals were BP 119/53 and BP 105/43 sleeping, '
@@ -110,7 +110,6 @@ USAGE:
 import re
 import os
 import sys
-import spacy
 import errno
 import optparse
 from nltk.corpus import wordnet
@@ -144,18 +143,16 @@ if -1 != pos:
     nlp_dir = module_dir[:pos+4]
     sys.path.append(nlp_dir)
 import util
+import spacy_models
 
 VERSION_MAJOR = 0
-VERSION_MINOR = 7
+VERSION_MINOR = 8
 
 MODULE_NAME = 'termset_expander.py'
 
 global DEBUG
 DEBUG = False
 
-# load Spacy's English model
-nlp = spacy.load('en_core_web_sm')
-
 # initialize the CMU phoneme dictionary
 cmu_dict = cmudict.dict()
 
@@ -524,7 +521,7 @@ def get_synonyms(namespace, term_list, return_type=RETURN_TYPE_STRING):
 
         if is_multiword:
             # get parts of speech
-            doc = nlp(t)
+            doc = spacy_models.get_model()(t, disable=spacy_models.DISABLE_FOR_POS)
             if 1 == len(doc):
                 continue
 
@@ -667,7 +664,7 @@ def get_verb_inflections(namespace, term_list, return_type=RETURN_TYPE_STRING):
             new_terms.extend(verbs)
         else:
             # get parts of speech and find verbs
-            doc = nlp(t)
+            doc = spacy_models.get_model()(t, disable=spacy_models.DISABLE_FOR_POS)
             if 1 == len(doc):
                 verbs = get_single_verb_inflections(t)
                 new_terms.extend(verbs)
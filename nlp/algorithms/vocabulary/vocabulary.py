@@ -14,9 +14,15 @@ import json
 from claritynlp_logging import log, ERROR, DEBUG
 
 
+def _connect(conn_string, site):
+    # imported here because data_access imports the finders, which import this module
+    from data_access import pg_pool
+    return pg_pool.connect(conn_string, site)
+
+
 # Function to get synonyms for given concept
 def get_synonyms(conn_string, concept, vocabulary):
-    conn = psycopg2.connect(conn_string)
+    conn = _connect(conn_string, 'vocabulary.get_synonyms')
     cursor = conn.cursor()
 
     if vocabulary is None:
@@ -46,7 +52,7 @@ def get_synonyms(conn_string, concept, vocabulary):
 
 # Function to get ancestors for given concept
 def get_ancestors(conn_string, concept, vocabulary):
-    conn = psycopg2.connect(conn_string)
+    conn = _connect(conn_string, 'vocabulary.get_ancestors')
     cursor = conn.cursor()
 
     if vocabulary is None:
@@ -74,7 +80,7 @@ def get_ancestors(conn_string, concept, vocabulary):
 
 # Function to get descendants for given concept
 def get_descendants(conn_string, concept, vocabulary):
-    conn = psycopg2.connect(conn_string)
+    conn = _connect(conn_string, 'vocabulary.get_descendants')
     cursor = conn.cursor()
 
     if vocabulary is None:
@@ -21,6 +21,9 @@ def create_app(config_filename=None):
     clarity_app.register_blueprint(algorithm_app)
     clarity_app.register_blueprint(utility_app)
 
+    from data_access import mongo_indexes
+    mongo_indexes.ensure_indexes_in_background()
+
     return clarity_app
 
 
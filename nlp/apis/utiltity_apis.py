@@ -6,6 +6,8 @@ from claritynlp_logging import log, ERROR, DEBUG
 
 
 from data_access import *
+from data_access import pg_pool
+from data_access import mongo_indexes
 from algorithms import *
 from results import *
 import tasks
@@ -111,6 +113,35 @@ def get_job_stats(job_ids: str):
         return "Failed to get job stats" + str(e)
 
 
+@utility_app.route('/pg_stats', methods=['GET'])
+def get_pg_stats():
+    """GET Postgres connection counts and latencies by call site, for the API process"""
+    try:
+        return json.dumps(pg_pool.get_stats(), indent=4)
+    except Exception as e:
+        return "Failed to get Postgres stats" + str(e)
+
+
+@utility_app.route('/http_stats', methods=['GET'])
+def get_http_stats():
+    """GET Solr, report mapper and CQL request counts and latency histograms, for the API process"""
+    try:
+        return json.dumps(util.get_http_stats(), indent=4)
+    except Exception as e:
+        return "Failed to get HTTP stats" + str(e)
+
+
+@utility_app.route('/mongo_index_stats', methods=['GET'])
+def get_mongo_index_stats():
+    """GET result index usage, and with ?job_id= the query plans of the hot result queries for that job"""
+    try:
+        job_id = request.args.get('job_id')
+        stats = mongo_indexes.index_stats(int(job_id) if job_id else None)
+        return json.dumps(stats, indent=4, default=str)
+    except Exception as e:
+        return "Failed to get Mongo index stats" + str(e)
+
+
 @utility_app.route('/performance/<string:job_ids>', methods=['GET'])
 def get_job_performance(job_ids: str):
     """GET current job performance"""
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark the latency of the results API calls in data_access/results.py,
+with a new MongoClient per call (as before util.shared_mongo_client) and with
+the shared, process-wide client. It needs the configured Mongo and a job with
+results. Run it from the nlp directory:
+
+        python3 ./benchmark_mongo.py --job 1234
+        python3 ./benchmark_mongo.py --job 1234 --repeat 200
+
+"""
+
+import time
+import argparse
+import statistics
+
+import util
+from data_access import results
+from claritynlp_logging import log, ERROR, DEBUG
+
+
+###############################################################################
+class NewMongoClient(object):
+    """
+    util.mongo_client as it was: a new client per call, closed by the caller.
+    """
+
+    def __call__(self, host=None, port=None, username=None, password=None):
+        return util.new_mongo_client(host=host, port=port, username=username, password=password)
+
+
+###############################################################################
+def api_calls(job):
+    return [
+        ('phenotype_stats', lambda: results.phenotype_stats(job, True)),
+        ('paged_phenotype_results', lambda: results.paged_phenotype_results(job, True)),
+        ('phenotype_results_by_context', lambda: results.phenotype_results_by_context(
+            'document', {'job_id': int(job), 'phenotype_final': True})),
+    ]
+
+
+###############################################################################
+def measure(call, repeat):
+    # one call first, so that both modes start with the modules and the server warm
+    call()
+    samples = list()
+    for i in range(repeat):
+        start = time.perf_counter()
+        call()
+        samples.append(1000.0 * (time.perf_counter() - start))
+    samples.sort()
+    return {
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[int(0.95 * (len(samples) - 1))]
+    }
+
+
+###############################################################################
+def run(job, repeat):
+    shared_mongo_client = util.mongo_client
+    for name, call in api_calls(job):
+        try:
+            util.mongo_client = NewMongoClient()
+            before = measure(call, repeat)
+        finally:
+            util.mongo_client = shared_mongo_client
+        after = measure(call, repeat)
+
+        log('{0}: new client median {1:.1f} ms (p95 {2:.1f}), shared client median {3:.1f} ms (p95 {4:.1f})'.format(
+            name, before['median_ms'], before['p95_ms'], after['median_ms'], after['p95_ms']))
+
+
+###############################################################################
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark results API latency with new and shared MongoClients')
+    parser.add_argument('--job', required=True,
+                        help='job id to query the results of')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='number of calls to time for each API function and mode')
+    args = parser.parse_args()
+
+    run(args.job, args.repeat)
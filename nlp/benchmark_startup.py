@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark worker startup: the time and memory it takes to import ClarityNLP
+modules, and to segment the first document afterwards.
+
+Each sample runs in a fresh interpreter, so that nothing is already imported
+or loaded. The spaCy pipelines loaded at import time are listed from the
+model registry (spacy_models.py); with lazy loading there should be none, and
+the model load shows up in the first segmentation instead. Run it from the
+nlp directory:
+
+        python3 ./benchmark_startup.py
+        python3 ./benchmark_startup.py --modules algorithms tasks --repeat 5
+
+With --pool, it instead runs segmentation batches in the worker pool
+(luigi_tools/worker_pool.py), once with the models preloaded in the parent
+and once with each worker loading them itself, and compares the time to the
+first finished batch and the memory of the workers:
+
+        python3 ./benchmark_startup.py --pool 4 --batches 16
+
+"""
+
+import sys
+import json
+import time
+import argparse
+import resource
+import importlib
+import statistics
+import subprocess
+
+from claritynlp_logging import log, ERROR, DEBUG
+
+SAMPLE_TEXT = 'The patient was admitted on 3/14/2019 with chest pain. BP 140/90, HR 88. ' \
+              'CT of the abdomen shows a 1.3 x 1.1 cm cyst in the left kidney. No acute distress.'
+
+
+###############################################################################
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+###############################################################################
+def measure(modules, first_use=True):
+    """
+    Import the modules and segment one document in this process, and return
+    the timings and peak RSS.
+    """
+
+    start = time.perf_counter()
+    for module in modules:
+        importlib.import_module(module)
+    result = {
+        'import_seconds': time.perf_counter() - start,
+        'import_rss_mb': peak_rss_mb()
+    }
+
+    import spacy_models
+    result['models_at_import'] = spacy_models.get_stats()
+
+    if first_use:
+        from algorithms.segmentation import Segmentation
+
+        start = time.perf_counter()
+        Segmentation().parse_sentences(SAMPLE_TEXT)
+        result['first_use_seconds'] = time.perf_counter() - start
+        result['first_use_rss_mb'] = peak_rss_mb()
+        result['models_after_first_use'] = spacy_models.get_stats()
+
+    return result
+
+
+###############################################################################
+class SegmentationBatch(object):
+    """
+    Stands in for a luigi batch task in the worker pool.
+    """
+
+    def __init__(self, batch):
+        self.param_kwargs = {'batch': batch}
+
+    def run(self):
+        from algorithms.segmentation import Segmentation
+
+        segmentation = Segmentation()
+        for i in range(10):
+            segmentation.parse_sentences(SAMPLE_TEXT)
+
+
+###############################################################################
+def measure_pool(processes, batches, preload):
+    from luigi_tools import worker_pool
+
+    tasks = [SegmentationBatch(batch) for batch in range(batches)]
+    return worker_pool.run_batches(tasks, processes, max_batches=0, preload=preload)
+
+
+###############################################################################
+def run_pool(processes, batches):
+
+    for preload in [True, False]:
+        args = [sys.executable, __file__, '--child', '--pool', str(processes), '--batches', str(batches)]
+        if not preload:
+            args.append('--no-preload')
+        output = subprocess.run(args, stdout=subprocess.PIPE, check=True).stdout.decode('utf-8')
+        stats = json.loads(output.strip().split('\n')[-1])
+
+        workers = list(stats['workers'].values())
+        log('{0}: first batch after {1:.2f}s ({2:.2f}s preload + {3:.2f}s), {4} batches in {5:.2f}s'.format(
+            'preloaded' if preload else 'lazy', stats['preload_seconds'] + stats['first_batch_seconds'],
+            stats['preload_seconds'], stats['first_batch_seconds'], stats['batches'], stats['seconds']))
+        for key in ['rss_mb', 'private_mb']:
+            values = [worker['memory'][key] for worker in workers if key in worker['memory']]
+            if len(values) > 0:
+                log('    worker {0}: mean {1:.0f}, max {2:.0f}'.format(key, statistics.mean(values), max(values)))
+
+
+###############################################################################
+def run_sample(modules, first_use):
+    args = [sys.executable, __file__, '--child', '--modules'] + modules
+    if not first_use:
+        args.append('--no-first-use')
+    output = subprocess.run(args, stdout=subprocess.PIPE, check=True).stdout.decode('utf-8')
+
+    # the sample is the last line; anything before it is logging
+    return json.loads(output.strip().split('\n')[-1])
+
+
+###############################################################################
+def run(modules, repeat=3, first_use=True):
+
+    samples = [run_sample(modules, first_use) for i in range(repeat)]
+
+    def median(key):
+        return statistics.median([sample[key] for sample in samples])
+
+    log('{0} samples, importing {1}'.format(repeat, ', '.join(modules)))
+    log('import:       {0:.2f}s, peak RSS {1:.0f} MB'.format(median('import_seconds'), median('import_rss_mb')))
+    log('spaCy pipelines loaded at import: {0}'.format(len(samples[0]['models_at_import'])))
+    for stats in samples[0]['models_at_import']:
+        log('    {0}'.format(stats))
+
+    if first_use:
+        log('first use:    {0:.2f}s, peak RSS {1:.0f} MB'.format(median('first_use_seconds'),
+                                                                 median('first_use_rss_mb')))
+        log('spaCy pipelines loaded after first use: {0}'.format(len(samples[0]['models_after_first_use'])))
+        for stats in samples[0]['models_after_first_use']:
+            log('    {0}'.format(stats))
+
+    return samples
+
+
+###############################################################################
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark import time and memory of ClarityNLP workers')
+    parser.add_argument('--modules', nargs='+', default=['algorithms'],
+                        help='modules to import, in order')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of fresh interpreters to sample')
+    parser.add_argument('--no-first-use', action='store_true',
+                        help='only measure the imports, not the first segmentation')
+    parser.add_argument('--pool', type=int, default=0,
+                        help='compare worker pools of this many processes, with and without preloading')
+    parser.add_argument('--batches', type=int, default=16,
+                        help='number of segmentation batches to run in the pool')
+    parser.add_argument('--no-preload', action='store_true',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child and args.pool > 0:
+        print(json.dumps(measure_pool(args.pool, args.batches, not args.no_preload)))
+    elif args.child:
+        print(json.dumps(measure(args.modules, not args.no_first_use)))
+    elif args.pool > 0:
+        run_pool(args.pool, args.batches)
+    else:
+        run(args.modules, args.repeat, not args.no_first_use)
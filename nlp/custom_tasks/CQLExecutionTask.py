@@ -500,6 +500,8 @@ class CQLExecutionTask(BaseTask):
     # VERY IMPORTANT to prevent parallel execution of this task, to avoid
     # sending lots of identical HTTP POSTs to the CQL Engine
     parallel_task = False
+    # it makes one CQL query per batch, not one per document
+    parallel_docs_safe = False
         
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
         
@@ -642,9 +644,9 @@ class CQLExecutionTask(BaseTask):
         has_error = False
         r = None
         try:
-            r = requests.post(cql_eval_url,
-                              headers=headers,
-                              data=json.dumps(payload, indent=4))
+            r = util.http_post('cql', cql_eval_url,
+                               headers=headers,
+                               data=json.dumps(payload, indent=4))
 
         except requests.exceptions.HTTPError as e:
             log('\n*** CQLExecutionTask HTTP error: "{0}" ***\n'.format(e))
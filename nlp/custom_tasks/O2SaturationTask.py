@@ -31,7 +31,7 @@ import json
 from pymongo import MongoClient
 from collections import namedtuple
 from tasks.task_utilities import BaseTask
-from algorithms import run_o2sat_finder, O2Tuple, EMPTY_O2_FIELD
+from algorithms import run_o2sat_finder_objects, O2Tuple, EMPTY_O2_FIELD
 
 _VERSION_MAJOR = 0
 _VERSION_MINOR = 1
@@ -56,9 +56,7 @@ class O2SaturationTask(BaseTask):
 
             # look for O2 saturation data in each sentence
             for sentence in sentence_list:
-                json_result = run_o2sat_finder(sentence)
-                json_data = json.loads(json_result)
-                result_list = [O2Tuple(**d) for d in json_data]
+                result_list = run_o2sat_finder_objects(sentence)
                 
                 if len(result_list) > 0:
                     for result in result_list:
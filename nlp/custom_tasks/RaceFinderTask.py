@@ -132,8 +132,9 @@ def get_race_for_doc(document_id):
     if len(result_list) == 0:
         sentence_list = list()
 
+    # a plain list, since the result is cached as JSON
     return {
-        'sentences': sentence_list,
+        'sentences': list(sentence_list),
         'results': result_list
     }
 
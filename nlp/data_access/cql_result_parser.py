@@ -113,11 +113,9 @@ def _convert_datetimes(flattened_obj):
                         day   = day
                     )
                 else:
-                    json_time = time_finder.run(time_str)
-                    time_list = json.loads(json_time)
+                    time_list = time_finder.run_objects(time_str)
                     assert 1 == len(time_list)
-                    the_time = time_list[0]
-                    time_obj = time_finder.TimeValue(**the_time)
+                    time_obj = time_list[0]
 
                     us = 0
                     if time_obj.fractional_seconds is not None:
@@ -1,5 +1,5 @@
 import util
-from algorithms import segmentation, segmentation_init
+from algorithms import segmentation
 from claritynlp_logging import log, ERROR, DEBUG
 
 try:
@@ -16,11 +16,10 @@ headers = {
 }
 batch_size = 10
 doc_size = 0
-spacy = segmentation_init()
 
 
 def document_sentences(txt):
-    sentence_list = segment.parse_sentences(txt, spacy=spacy)
+    sentence_list = segment.parse_sentences(txt)
     return sentence_list
 
 
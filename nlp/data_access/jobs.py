@@ -3,7 +3,10 @@ import psycopg2.extras
 import configparser
 import json
 import util
+import os
 import sys
+import atexit
+import threading
 import traceback
 from pymongo import MongoClient
 from datetime import datetime, timezone
@@ -12,10 +15,12 @@ from claritynlp_logging import log, ERROR, DEBUG
 
 try:
     from .base_model import BaseModel
+    from . import pg_pool
     from .results import phenotype_stats
 except Exception as e:
     log(e)
     from base_model import BaseModel
+    import pg_pool
     from results import phenotype_stats
 
 
@@ -27,6 +32,11 @@ WARNING = "WARNING"
 KILLED = "KILLED"
 STATS = "STATS"
 PROPERTIES = "PROPERTIES"
+PREFILTER_STATS = STATS + "_PREFILTER"
+WORKER_POOL_STATS = STATS + "_WORKER_POOL"
+
+# statuses that end (or, for PipelineTask.complete, settle) a job; these are written synchronously
+SYNCHRONOUS_STATUSES = [COMPLETED, FAILURE, KILLED, WARNING]
 
 
 class NlpJob(BaseModel):
@@ -48,7 +58,7 @@ class NlpJob(BaseModel):
 
 
 def create_new_job(job: NlpJob, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'jobs.create_new_job')
     cursor = conn.cursor()
 
     try:
@@ -78,7 +88,8 @@ def create_new_job(job: NlpJob, connection_string: str):
 
 
 def get_job_status(job_id: int, connection_string: str, get_updates=False):
-    conn = psycopg2.connect(connection_string)
+    flush_job_status()
+    conn = pg_pool.connect(connection_string, 'jobs.get_job_status')
     cursor = conn.cursor()
     status_dict = {
         "status": "UNKNOWN"
@@ -116,22 +127,45 @@ def get_job_status(job_id: int, connection_string: str, get_updates=False):
     return status_dict
 
 
-def update_job_status(job_id: str, connection_string: str, updated_status: str, description: str):
-    conn = psycopg2.connect(connection_string)
+class JobStatusEvent(object):
+
+    def __init__(self, job_id, connection_string: str, status: str, description: str):
+        self.job_id = job_id
+        self.connection_string = connection_string
+        self.status = status
+        self.description = description
+        self.date_updated = datetime.now()
+
+    def key(self):
+        return str(self.job_id), self.status, self.description
+
+
+def write_job_status_events(events: list, connection_string: str):
+    """
+    Write the events in one transaction: one status update per job, and all status rows in a single
+    multi-row INSERT.
+    """
+    conn = pg_pool.connect(connection_string, 'jobs.write_job_status_events')
     cursor = conn.cursor()
-    flag = -1 # To determine whether the update was successful or not
-    dt = datetime.now()
+    flag = -1
 
     try:
-        if not updated_status.startswith(PROPERTIES) and not updated_status.startswith(STATS):
-            cursor.execute("""UPDATE nlp.nlp_job set status = %s where nlp_job_id = %s""", (updated_status, job_id))
-
-        cursor.execute("""
+        job_status = dict()
+        job_ended = dict()
+        for e in events:
+            if not e.status.startswith(PROPERTIES) and not e.status.startswith(STATS):
+                job_status[e.job_id] = e.status
+            if e.status == COMPLETED or e.status == FAILURE or e.status == KILLED:
+                job_ended[e.job_id] = e.date_updated
+
+        for job_id, status in job_status.items():
+            cursor.execute("""UPDATE nlp.nlp_job set status = %s where nlp_job_id = %s""", (status, job_id))
+
+        psycopg2.extras.execute_values(cursor, """
                 INSERT INTO nlp.nlp_job_status (status, description, date_updated, nlp_job_id)
-                VALUES (%s, %s, %s, %s) RETURNING nlp_job_status_id""",
-                       (updated_status, description, dt, job_id))
+                VALUES %s""", [(e.status, e.description, e.date_updated, e.job_id) for e in events])
 
-        if updated_status == COMPLETED or updated_status == FAILURE or updated_status == KILLED:
+        for job_id, dt in job_ended.items():
             cursor.execute("""UPDATE nlp.nlp_job set date_ended = %s where nlp_job_id = %s""", (dt, job_id))
 
         flag = 1
@@ -146,8 +180,139 @@ def update_job_status(job_id: str, connection_string: str, updated_status: str,
     return flag
 
 
+class JobStatusWriter(object):
+    """
+    Queues job status events and writes them from a background thread, batching the rows of each flush into
+    one transaction. Repeated IN_PROGRESS events (same job and description) waiting in the queue are written
+    once. 'write' flushes the queue and then writes its event synchronously, so that statuses read back by
+    the scheduler are always current.
+    """
+
+    def __init__(self, flush_seconds=1.0, max_events=500):
+        self.flush_seconds = flush_seconds
+        self.max_events = max_events
+        self.reset()
+
+    def reset(self):
+        # also called in a forked child: the parent's thread does not exist there, and the parent writes
+        # the events it queued
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.events = list()
+        self.pending = set()
+        self.thread = None
+
+    def enqueue(self, event: JobStatusEvent):
+        with self.lock:
+            if event.status == IN_PROGRESS:
+                if event.key() in self.pending:
+                    return
+                self.pending.add(event.key())
+            self.events.append(event)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='JobStatusWriter', daemon=True)
+                self.thread.start()
+            if len(self.events) >= self.max_events:
+                self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_seconds)
+            self.wakeup.clear()
+            self.flush()
+
+    def write(self, event: JobStatusEvent = None):
+        with self.flush_lock:
+            with self.lock:
+                events = self.events
+                self.events = list()
+                self.pending = set()
+            if event is not None:
+                events.append(event)
+            if len(events) == 0:
+                return 1
+
+            flag = 1
+            by_connection = dict()
+            for e in events:
+                by_connection.setdefault(e.connection_string, list()).append(e)
+            for connection_string, connection_events in by_connection.items():
+                if write_job_status_events(connection_events, connection_string) < 0:
+                    flag = -1
+                    if len(connection_events) > 1:
+                        # don't let one bad row (e.g. for a deleted job) drop the rest
+                        for e in connection_events:
+                            write_job_status_events([e], connection_string)
+            return flag
+
+    def flush(self):
+        return self.write()
+
+
+status_writer = JobStatusWriter(flush_seconds=float(util.job_status_flush_seconds))
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=status_writer.reset)
+atexit.register(status_writer.flush)
+
+
+def flush_job_status():
+    return status_writer.flush()
+
+
+def prefilter_stats_description(task_name: str, stats: dict):
+    description = dict(stats)
+    description['task'] = task_name
+    return json.dumps(description)
+
+
+def add_prefilter_stats(performance: dict, description: str):
+    # sums the sentence prefilter counts that each batch writes, by task
+    try:
+        batch_stats = json.loads(description)
+    except Exception as ex:
+        log(ex, ERROR)
+        return
+
+    prefilter = performance.setdefault('prefilter', dict())
+    task_stats = prefilter.setdefault(batch_stats.get('task', 'unknown'), {
+        'documents': 0,
+        'documents_skipped': 0,
+        'sentences': 0,
+        'sentences_skipped': 0
+    })
+    for key in ['documents', 'documents_skipped', 'sentences', 'sentences_skipped']:
+        task_stats[key] += int(batch_stats.get(key, 0))
+
+    documents = task_stats['documents']
+    sentences = task_stats['sentences']
+    task_stats['document_skip_ratio'] = task_stats['documents_skipped'] / documents if documents > 0 else 0.0
+    task_stats['sentence_skip_ratio'] = task_stats['sentences_skipped'] / sentences if sentences > 0 else 0.0
+
+
+def add_worker_pool_stats(performance: dict, description: str):
+    # one entry per pipeline run in the worker pool
+    try:
+        pool_stats = json.loads(description)
+    except Exception as ex:
+        log(ex, ERROR)
+        return
+
+    performance.setdefault('worker_pool', list()).append(pool_stats)
+
+
+def update_job_status(job_id: str, connection_string: str, updated_status: str, description: str):
+    event = JobStatusEvent(job_id, connection_string, updated_status, description)
+    if util.use_async_job_status == "true" and updated_status not in SYNCHRONOUS_STATUSES:
+        status_writer.enqueue(event)
+        return 1
+
+    return status_writer.write(event)
+
+
 def delete_job(job_id: str, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    flush_job_status()
+    conn = pg_pool.connect(connection_string, 'jobs.delete_job')
     client = util.mongo_client()
 
     cursor = conn.cursor()
@@ -175,7 +340,7 @@ def delete_job(job_id: str, connection_string: str):
 
 
 def query_phenotype_jobs(status: str, connection_string: str, limit=100, skip=0):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'jobs.query_phenotype_jobs')
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     jobs = list()
 
@@ -238,7 +403,7 @@ def query_phenotype_jobs(status: str, connection_string: str, limit=100, skip=0)
 
 
 def query_phenotype_job_by_id(job_id: str, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'jobs.query_phenotype_job_by_id')
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     job = {}
 
@@ -270,7 +435,7 @@ def get_job_performance(job_ids: list, connection_string: str):
     if not job_ids or len(job_ids) == 0:
         return dict()
 
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'jobs.get_job_performance')
     cursor = conn.cursor()
     metrics = dict()
 
@@ -328,6 +493,10 @@ def get_job_performance(job_ids: list, connection_string: str):
                 performance['intermediate_subjects'] = status_value
             elif status_name == 'STATS_INTERMEDIATE_RESULTS':
                 performance['intermediate_results'] = status_value
+            elif status_name == PREFILTER_STATS:
+                add_prefilter_stats(performance, status_value)
+            elif status_name == WORKER_POOL_STATS:
+                add_worker_pool_stats(performance, status_value)
 
             performance['counts_found'] = counts_found
             metrics[job_id] = performance
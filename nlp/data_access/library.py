@@ -11,9 +11,11 @@ from claritynlp_logging import log, ERROR, DEBUG
 
 try:
     from .base_model import BaseModel
+    from . import pg_pool
 except Exception as e:
     log(e)
     from base_model import BaseModel
+    import pg_pool
 
 
 class NLPQL(BaseModel):
@@ -25,7 +27,7 @@ class NLPQL(BaseModel):
 
 
 def create_new_nlpql(nlpql: NLPQL, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'library.create_new_nlpql')
     cursor = conn.cursor()
 
     try:
@@ -47,7 +49,7 @@ def create_new_nlpql(nlpql: NLPQL, connection_string: str):
 
 
 def delete_query(query_id: str, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'library.delete_query')
     cursor = conn.cursor()
 
     try:
@@ -65,7 +67,7 @@ def delete_query(query_id: str, connection_string: str):
 
 
 def get_query(query_id: str, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'library.get_query')
     cursor = conn.cursor()
     query = {
 
@@ -97,7 +99,7 @@ def get_query(query_id: str, connection_string: str):
 
 
 def get_library(connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'library.get_library')
     cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     library = list()
 
@@ -0,0 +1,133 @@
+import threading
+
+import util
+from bson import ObjectId
+from pymongo import ASCENDING
+from claritynlp_logging import log, ERROR, DEBUG
+
+# (collection, keys) of the compound indexes for the hot result queries; keys in equality, then sort/range order
+RESULT_INDEXES = [
+    # nlpql_results_to_dataframe, pandas_process_operations, the expr_eval aggregations and
+    # phenotype_feature_results: {job_id, nlpql_feature (, subject)}
+    ('phenotype_results', [('job_id', ASCENDING), ('nlpql_feature', ASCENDING), ('subject', ASCENDING)]),
+    # phenotype_subjects, phenotype_subject_results and get_columns: {job_id, phenotype_final (, subject)}
+    ('phenotype_results', [('job_id', ASCENDING), ('phenotype_final', ASCENDING), ('subject', ASCENDING)]),
+    # paged_phenotype_results: {job_id, phenotype_final, _id > last_id}, read in _id order
+    ('phenotype_results', [('job_id', ASCENDING), ('phenotype_final', ASCENDING), ('_id', ASCENDING)]),
+    # pipeline_results and the pipeline job results export: {job_id, nlpql_feature}
+    ('pipeline_results', [('job_id', ASCENDING), ('nlpql_feature', ASCENDING)]),
+]
+
+
+def ensure_indexes(db=None):
+    """
+    Create the result indexes that don't exist yet. Returns the names of the indexes, by collection; an index
+    that fails (e.g. one with the same keys and other options) is logged and skipped.
+    """
+    client = None
+    if db is None:
+        client = util.mongo_client()
+        db = client[util.mongo_db]
+
+    names = dict()
+    try:
+        for collection, keys in RESULT_INDEXES:
+            try:
+                name = db[collection].create_index(keys, background=True)
+                names.setdefault(collection, list()).append(name)
+            except Exception as ex:
+                log('failed to create index {} on {}'.format(keys, collection), ERROR)
+                log(ex, ERROR)
+    finally:
+        if client is not None:
+            client.close()
+
+    log('ensured mongo result indexes {}'.format(names), DEBUG)
+    return names
+
+
+def ensure_indexes_in_background():
+    # building an index on a large existing collection can take a while, so the API starts without waiting
+    def run():
+        try:
+            ensure_indexes()
+        except Exception as ex:
+            log('failed to create mongo result indexes', ERROR)
+            log(ex, ERROR)
+
+    thread = threading.Thread(target=run, name='MongoIndexes', daemon=True)
+    thread.start()
+    return thread
+
+
+def query_shapes(db, job_id: int):
+    """
+    The hot phenotype_results queries for a job, with a feature and subject of that job filled in.
+    """
+    sample = db.phenotype_results.find_one({'job_id': job_id}) or dict()
+    feature = sample.get('nlpql_feature', '')
+    subject = sample.get('subject', '')
+    return {
+        'job_feature': {'job_id': job_id, 'nlpql_feature': {'$in': [feature]}},
+        'job_feature_subject': {'job_id': job_id, 'nlpql_feature': feature, 'subject': subject},
+        'job_final': {'job_id': job_id, 'phenotype_final': True},
+        'job_final_subject': {'job_id': job_id, 'phenotype_final': True, 'subject': subject},
+        'job_final_after_id': {'_id': {'$gt': ObjectId('0' * 24)}, 'job_id': job_id, 'phenotype_final': True},
+    }
+
+
+def plan_summary(plan: dict):
+    """
+    The stages of a winning plan from the innermost out, e.g. ['IXSCAN job_id_1_phenotype_final_1', 'FETCH'].
+    """
+    stages = list()
+    for p in plan.get('inputStages', list()):
+        stages.extend(plan_summary(p))
+    if 'inputStage' in plan:
+        stages.extend(plan_summary(plan['inputStage']))
+    stage = plan.get('stage', '')
+    if 'indexName' in plan:
+        stage += ' ' + plan['indexName']
+    stages.append(stage)
+    return stages
+
+
+def explain_query(db, collection: str, query: dict):
+    explain = db.command('explain', {'find': collection, 'filter': query}, verbosity='executionStats')
+    stats = explain.get('executionStats', dict())
+    return {
+        'plan': plan_summary(explain.get('queryPlanner', dict()).get('winningPlan', dict())),
+        'returned': stats.get('nReturned'),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'docs_examined': stats.get('totalDocsExamined'),
+        'millis': stats.get('executionTimeMillis')
+    }
+
+
+def index_stats(job_id: int = None):
+    """
+    $indexStats usage counters of the result collections and, given a job, the winning plans of the hot query
+    shapes for that job.
+    """
+    client = util.mongo_client()
+    db = client[util.mongo_db]
+    stats = dict()
+    try:
+        for collection in sorted(set([c for c, k in RESULT_INDEXES])):
+            stats[collection] = {
+                s['name']: {
+                    'key': dict(s['key']),
+                    'ops': s['accesses']['ops'],
+                    'since': str(s['accesses']['since'])
+                }
+                for s in db[collection].aggregate([{'$indexStats': {}}])
+            }
+
+        if job_id is not None:
+            stats['queries'] = dict()
+            for name, query in query_shapes(db, job_id).items():
+                stats['queries'][name] = explain_query(db, 'phenotype_results', query)
+    finally:
+        client.close()
+
+    return stats
@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+
+import psycopg2
+from psycopg2 import pool
+
+import util
+from claritynlp_logging import log, ERROR, DEBUG
+
+_lock = threading.Lock()
+_pools = dict()
+_pool_pid = os.getpid()
+# pools inherited across a fork; kept referenced so that garbage collection in the child never closes the
+# parent's connections
+_inherited_pools = list()
+_stats = dict()
+
+
+def _get_pool(connection_string: str):
+    global _pool_pid
+
+    with _lock:
+        pid = os.getpid()
+        if pid != _pool_pid:
+            _inherited_pools.extend(_pools.values())
+            _pools.clear()
+            _stats.clear()
+            _pool_pid = pid
+
+        conn_pool = _pools.get(connection_string)
+        if conn_pool is None:
+            conn_pool = pool.ThreadedConnectionPool(int(util.pg_pool_min_connections),
+                                                    int(util.pg_pool_max_connections),
+                                                    connection_string)
+            _pools[connection_string] = conn_pool
+        return conn_pool
+
+
+def _record(site: str, elapsed: float, error: bool):
+    with _lock:
+        site_stats = _stats.get(site)
+        if site_stats is None:
+            site_stats = {
+                'calls': 0,
+                'errors': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0
+            }
+            _stats[site] = site_stats
+        ms = 1000.0 * elapsed
+        site_stats['calls'] += 1
+        site_stats['total_ms'] += ms
+        if ms > site_stats['max_ms']:
+            site_stats['max_ms'] = ms
+        if error:
+            site_stats['errors'] += 1
+
+
+class PooledConnection(object):
+    """
+    A psycopg2 connection borrowed from the process pool. It is used like the connection returned by
+    psycopg2.connect; 'close' hands it back to the pool and records how long the call site held it.
+    """
+
+    def __init__(self, conn, conn_pool, site: str):
+        self._conn = conn
+        self._pool = conn_pool
+        self._site = site
+        self._start = time.time()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is None:
+            return
+
+        conn = self._conn
+        self._conn = None
+        broken = conn.closed != 0
+        if not broken:
+            try:
+                # end any transaction the call site left open, so the next borrower starts clean
+                conn.rollback()
+            except Exception as ex:
+                log(ex, ERROR)
+                broken = True
+
+        try:
+            if self._pool is not None:
+                self._pool.putconn(conn, close=broken)
+            else:
+                conn.close()
+        except Exception as ex:
+            log(ex, ERROR)
+        _record(self._site, time.time() - self._start, broken)
+
+
+def connect(connection_string: str, site: str = 'unknown'):
+    """
+    Return a pooled connection for the connection string. Callers close it as before. If the pool is exhausted
+    a direct connection is opened instead, so callers never block on the pool.
+    """
+    conn_pool = None
+    try:
+        conn_pool = _get_pool(connection_string)
+        conn = conn_pool.getconn()
+    except pool.PoolError as ex:
+        log('postgres pool exhausted at {}, opening a direct connection: {}'.format(site, ex), DEBUG)
+        conn_pool = None
+        conn = psycopg2.connect(connection_string)
+    return PooledConnection(conn, conn_pool, site)
+
+
+def get_stats():
+    """
+    Per call site counts and latencies (time each connection was held), for this process.
+    """
+    with _lock:
+        stats = dict()
+        for site, site_stats in _stats.items():
+            s = dict(site_stats)
+            s['avg_ms'] = s['total_ms'] / s['calls'] if s['calls'] > 0 else 0.0
+            stats[site] = s
+        return stats
+
+
+def close_all():
+    with _lock:
+        if os.getpid() == _pool_pid:
+            for conn_pool in _pools.values():
+                conn_pool.closeall()
+        _pools.clear()
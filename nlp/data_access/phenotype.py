@@ -9,10 +9,12 @@ from claritynlp_logging import log, ERROR, DEBUG
 
 try:
     from .base_model import BaseModel
+    from . import pg_pool
     from .pipeline_config import PipelineConfig
 except Exception as e:
     log(e)
     from base_model import BaseModel
+    import pg_pool
     from pipeline_config import PipelineConfig
 
 
@@ -148,7 +150,7 @@ class PhenotypeModel(BaseModel):
 
 
 def insert_phenotype_mapping(phenotype_id, pipeline_id, connection_string):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'phenotype.insert_phenotype_mapping')
     cursor = conn.cursor()
 
     try:
@@ -169,7 +171,7 @@ def insert_phenotype_mapping(phenotype_id, pipeline_id, connection_string):
 
 
 def insert_phenotype_model(phenotype: PhenotypeModel, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'phenotype.insert_phenotype_model')
     cursor = conn.cursor()
     p_id = -1
 
@@ -207,7 +209,7 @@ def insert_phenotype_model(phenotype: PhenotypeModel, connection_string: str):
 
 
 def update_phenotype_model(phenotype: PhenotypeModel, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'phenotype.update_phenotype_model')
     cursor = conn.cursor()
 
     try:
@@ -231,7 +233,7 @@ def update_phenotype_model(phenotype: PhenotypeModel, connection_string: str):
 
 
 def phenotype_structure(phenotype_id: int, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'phenotype.phenotype_structure')
     cursor = conn.cursor()
     hierarchy = dict()
 
@@ -269,7 +271,7 @@ def phenotype_structure(phenotype_id: int, connection_string: str):
 
 
 def query_pipeline_ids(phenotype_id: int, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'phenotype.query_pipeline_ids')
     cursor = conn.cursor()
     pipeline_ids = list()
 
@@ -291,7 +293,7 @@ def query_pipeline_ids(phenotype_id: int, connection_string: str):
 
 
 def query_phenotype(phenotype_id: int, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'phenotype.query_phenotype')
     cursor = conn.cursor()
     phenotype = None
 
@@ -9,9 +9,11 @@ from claritynlp_logging import log, ERROR, DEBUG
 
 try:
     from .base_model import BaseModel
+    from . import pg_pool
 except Exception as ex:
     log(ex)
     from base_model import BaseModel
+    import pg_pool
 
 
 class Pipeline(BaseModel):
@@ -115,7 +117,7 @@ class PipelineConfig(BaseModel):
 
 
 def insert_pipeline_config(pipeline: PipelineConfig, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'pipeline_config.insert_pipeline_config')
     cursor = conn.cursor()
     pipeline_id = -1
 
@@ -142,7 +144,7 @@ def insert_pipeline_config(pipeline: PipelineConfig, connection_string: str):
 
 
 def update_pipeline_config(pipeline: PipelineConfig, connection_string: str):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'pipeline_config.update_pipeline_config')
     cursor = conn.cursor()
 
     try:
@@ -165,7 +167,7 @@ def update_pipeline_config(pipeline: PipelineConfig, connection_string: str):
 
 
 def get_pipeline_config(pipeline_id, connection_string):
-    conn = psycopg2.connect(connection_string)
+    conn = pg_pool.connect(connection_string, 'pipeline_config.get_pipeline_config')
     cursor = conn.cursor()
 
     try:
@@ -228,6 +230,14 @@ def insert_pipeline_results(pipeline_config: PipelineConfig, db, obj):
     return inserted
 
 
+def insert_many_pipeline_results(pipeline_config: PipelineConfig, db, objs: list):
+    if pipeline_config.is_phenotype:
+        inserted = db.phenotype_results.insert_many(objs, ordered=False)
+    else:
+        inserted = db.pipeline_results.insert_many(objs, ordered=False)
+    return inserted
+
+
 if __name__ == '__main__':
     if len(sys.argv) > 1:
         q = sys.argv[1]
@@ -1,13 +1,12 @@
 import sys
-from urllib import request
 from urllib.parse import quote
 import simplejson
-import requests
 import util
 from ohdsi import getCohort
 import traceback
 import sys
 import json
+from cachetools import LRUCache
 from claritynlp_logging import log, ERROR, DEBUG
 
 try:
@@ -18,6 +17,14 @@ except Exception:
 HEADERS = {
         'Content-Type': 'application/json',
     }
+START_CURSOR = '*'
+TERMS_FILTER_THRESHOLD = 100
+# ids read per request when planning batches (plan_batch_ids)
+PLAN_PAGE_ROWS = 10000
+filter_cache = LRUCache(maxsize=500)
+# Redis namespace of the resolved pipeline filters; they are only read while the job's batches run
+FILTER_NAMESPACE = 'solr_filters'
+FILTER_CACHE_TTL_SECONDS = 86400
 
 
 def normalize_tag(tag):
@@ -32,8 +39,9 @@ def get_report_type_mappings(url, inst, key):
     try:
         if len(url) > 0:
             url = "%s/institutes/%s/reportTypes?apiToken=%s" % (url, inst, key)
-            connection = request.urlopen(url)
-            response = simplejson.load(connection)
+            connection = util.http_get('report_mapper', url)
+            connection.raise_for_status()
+            response = connection.json()
 
             for rep in response:
                 if len(rep['tags']) > 0:
@@ -84,7 +92,7 @@ def make_fq(types, tags, fq, mapper_url, mapper_inst, mapper_key, report_type_qu
 
     if job_results_filter:
         for k in job_results_filter.keys():
-            job_filter = job_results_filter[k]
+            job_filter = dict(job_results_filter[k])
             context = job_filter.pop('context', None)
             results = phenotype_results_by_context(context, job_filter)
             if context.lower() == 'patient' or context.lower() == 'subject':
@@ -119,18 +127,24 @@ def make_fq(types, tags, fq, mapper_url, mapper_inst, mapper_key, report_type_qu
             report_types = util.solr_report_type_field + ': ("' + match_report_clause + '")'
             new_fq += report_types
 
+    id_filters = list()
     if len(subjects) > 0:
-        if len(new_fq) > 0:
-            new_fq += ' AND '
-        subject_fq = util.solr_subject_field + ': (' + ' OR '.join(subjects) + ')'
-        new_fq += subject_fq
+        subject_fq = make_id_filter(util.solr_subject_field, subjects)
+        if subject_fq.startswith('{!'):
+            id_filters.append(subject_fq)
+        else:
+            if len(new_fq) > 0:
+                new_fq += ' AND '
+            new_fq += subject_fq
 
     if len(documents) > 0:
-        if len(new_fq) > 0:
-            new_fq += ' AND '
-        doc_fq = util.solr_report_id_field + ': (' + ' OR '.join(subjects) + ')'
-        new_fq += doc_fq
-
+        doc_fq = make_id_filter(util.solr_report_id_field, documents)
+        if doc_fq.startswith('{!'):
+            id_filters.append(doc_fq)
+        else:
+            if len(new_fq) > 0:
+                new_fq += ' AND '
+            new_fq += doc_fq
 
     if sources and len(sources) > 0:
         if len(new_fq) > 0:
@@ -138,14 +152,66 @@ def make_fq(types, tags, fq, mapper_url, mapper_inst, mapper_key, report_type_qu
         sources_fq = util.solr_source_field + ': ("' + '" OR "'.join(sources) + '")'
         new_fq += sources_fq
 
-    return new_fq
+    filters = list()
+    if len(new_fq) > 0:
+        filters.append(new_fq)
+    filters.extend(id_filters)
+    return filters
+
+
+def make_id_filter(field, ids):
+    # long id lists go through the terms query parser rather than a boolean OR of every id
+    ids = sorted(set(ids))
+    if len(ids) > TERMS_FILTER_THRESHOLD:
+        return '{!terms f=' + field + '}' + ','.join(ids)
+    return field + ': (' + ' OR '.join(ids) + ')'
+
+
+def pipeline_filter_key(pipeline_id, job_id):
+    return '{}:{}'.format(pipeline_id, job_id)
+
+
+def get_pipeline_filters(pipeline_id, job_id, pipeline_config, mapper_url='', mapper_inst='', mapper_key=''):
+    """
+    Return the Solr filters of a pipeline (see make_fq), resolving cohorts, job result filters and report
+    type mappings only once per pipeline and job. The filters are cached in memory and in Redis, so the batch
+    tasks of the pipeline share the filters computed by initialize_task_and_get_documents.
+    """
+    key = pipeline_filter_key(pipeline_id, job_id)
+
+    filters = filter_cache.get(key)
+    if filters is not None:
+        return filters
+
+    if util.use_redis_caching == "true":
+        try:
+            cached_filters = util.cache_get(FILTER_NAMESPACE, key)
+            if cached_filters:
+                filters = json.loads(cached_filters)
+                filter_cache[key] = filters
+                return filters
+        except Exception as ex:
+            log(ex, ERROR)
+
+    filters = make_fq(pipeline_config.report_types, pipeline_config.report_tags, pipeline_config.filter_query,
+                      mapper_url, mapper_inst, mapper_key, pipeline_config.report_type_query,
+                      pipeline_config.cohort, pipeline_config.job_results, pipeline_config.sources)
+
+    filter_cache[key] = filters
+    if util.use_redis_caching == "true":
+        try:
+            util.cache_set(FILTER_NAMESPACE, key, json.dumps(filters), ttl=FILTER_CACHE_TTL_SECONDS)
+        except Exception as ex:
+            log(ex, ERROR)
+
+    return filters
 
 
 def get_headers():
     return HEADERS
 
 
-def make_post_body(qry, fq, sort, start, rows):
+def make_post_body(qry, fq, sort, start, rows, cursor_mark='', fields=''):
     data = dict()
     data['query'] = qry
     if fq and len(fq) > 0:
@@ -154,16 +220,139 @@ def make_post_body(qry, fq, sort, start, rows):
         data['sort'] = sort
     data['offset'] = start
     data['limit'] = rows
+    if fields and len(fields) > 0:
+        data['fields'] = fields
     data['params'] = {
         'wt': 'json'
     }
+    if cursor_mark and len(cursor_mark) > 0:
+        data['params']['cursorMark'] = cursor_mark
     return data
 
 
+def cursor_sort(sort=''):
+    # cursorMark paging needs a total order, so the unique key is always the last sort clause
+    id_sort = util.solr_id_field + ' asc'
+    if not sort or len(sort) == 0:
+        return id_sort
+    if util.solr_id_field in [s.strip().split(' ')[0] for s in sort.split(',')]:
+        return sort
+    return sort + ', ' + id_sort
+
+
+def query_page(qry, fq, rows, cursor_mark=START_CURSOR, sort='', fields='',
+               solr_url='http://nlp-solr:8983/solr/sample'):
+    """
+    Fetch one page of documents from the cursor mark. Returns the documents and the cursor mark of the next
+    page; the next cursor mark equals the given one at the end of the results.
+    """
+    url = solr_url + '/select'
+    data = make_post_body(qry, fq, cursor_sort(sort), 0, rows, cursor_mark=cursor_mark, fields=fields)
+    response = util.http_post('solr', url, headers=get_headers(), data=json.dumps(data))
+    if response.status_code != 200:
+        raise Exception('Solr cursor query failed ({}): {}'.format(response.status_code, response.text))
+
+    results = response.json()
+    return results['response']['docs'], results.get('nextCursorMark', cursor_mark)
+
+
+def stream_documents(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
+                     sort='', rows=10, cohort_ids: list=None, types: list=None,
+                     filter_query='', job_results_filters: dict=None, sources=None,
+                     report_type_query='', cursor_mark=START_CURSOR, max_docs=-1, fields='',
+                     filters: list=None, solr_url='http://nlp-solr:8983/solr/sample'):
+    """
+    Generator over all documents matching the query, fetched 'rows' at a time with Solr cursorMark paging
+    (sorted on the unique id), starting at 'cursor_mark'. Unlike start/rows paging, the cost per page doesn't
+    grow with depth, and documents added or removed during the walk don't shift the pages.
+    """
+
+    if tags is None:
+        tags = list()
+    if cohort_ids is None:
+        cohort_ids = list()
+    if types is None:
+        types = list()
+    if job_results_filters is None:
+        job_results_filters = dict()
+    if sources is None:
+        sources = list()
+
+    fq = filters
+    if fq is None:
+        fq = make_fq(types, tags, filter_query, mapper_url, mapper_inst, mapper_key, report_type_query, cohort_ids,
+                     job_results_filters, sources)
+
+    count = 0
+    while True:
+        docs, next_cursor_mark = query_page(qry, fq, rows, cursor_mark=cursor_mark, sort=sort, fields=fields,
+                                            solr_url=solr_url)
+        for doc in docs:
+            if 0 <= max_docs <= count:
+                return
+            count += 1
+            yield doc
+
+        if len(docs) == 0 or next_cursor_mark == cursor_mark:
+            return
+        cursor_mark = next_cursor_mark
+
+
+def plan_batch_ids(qry, doc_limit, rows, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
+                   cohort_ids: list=None, types: list=None, filter_query='', job_results_filters: dict=None,
+                   sources=None, report_type_query='', filters: list=None, page_rows=PLAN_PAGE_ROWS,
+                   solr_url='http://nlp-solr:8983/solr/sample'):
+    """
+    Split the first 'doc_limit' results into batches of 'rows' documents by unique id, and return the id of the
+    first document of each batch (see query's 'first_id'). The ids are read 'page_rows' at a time, so planning
+    takes one Solr request per 'page_rows' documents rather than one per batch.
+    """
+
+    if tags is None:
+        tags = list()
+    if cohort_ids is None:
+        cohort_ids = list()
+    if types is None:
+        types = list()
+    if job_results_filters is None:
+        job_results_filters = dict()
+    if sources is None:
+        sources = list()
+
+    fq = filters
+    if fq is None:
+        fq = make_fq(types, tags, filter_query, mapper_url, mapper_inst, mapper_key, report_type_query, cohort_ids,
+                     job_results_filters, sources)
+
+    first_ids = list()
+    cursor_mark = START_CURSOR
+    count = 0
+    while count < doc_limit:
+        docs, next_cursor_mark = query_page(qry, fq, max(rows, page_rows), cursor_mark=cursor_mark,
+                                            fields=util.solr_id_field, solr_url=solr_url)
+        for doc in docs:
+            if count >= doc_limit:
+                break
+            if count % rows == 0:
+                first_ids.append(doc[util.solr_id_field])
+            count += 1
+        if len(docs) == 0 or next_cursor_mark == cursor_mark:
+            break
+        cursor_mark = next_cursor_mark
+
+    return first_ids
+
+
+def id_range_filter(first_id):
+    # the documents from 'first_id' on, in unique id order
+    quoted = '"' + first_id.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return '{}:[{} TO *]'.format(util.solr_id_field, quoted)
+
+
 def query(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
           sort='', start=0, rows=10, cohort_ids: list=None, types: list=None,
           filter_query='', job_results_filters: dict=None, sources=None,
-          report_type_query='', solr_url='http://nlp-solr:8983/solr/sample'):
+          report_type_query='', first_id='', filters: list=None, solr_url='http://nlp-solr:8983/solr/sample'):
 
     if tags is None:
         tags = list()
@@ -177,9 +366,17 @@ def query(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
         sources = list()
 
     url = solr_url + '/select'
-    fq = make_fq(types, tags, filter_query, mapper_url, mapper_inst, mapper_key, report_type_query, cohort_ids,
-                 job_results_filters, sources)
-    data = make_post_body(qry,  fq, sort, start, rows)
+    fq = filters
+    if fq is None:
+        fq = make_fq(types, tags, filter_query, mapper_url, mapper_inst, mapper_key, report_type_query, cohort_ids,
+                     job_results_filters, sources)
+    if first_id and len(first_id) > 0:
+        # one batch from its first id, handed out by plan_batch_ids, rather than paging 'start' documents deep
+        if isinstance(fq, str):
+            fq = [fq] if len(fq) > 0 else list()
+        data = make_post_body(qry, list(fq) + [id_range_filter(first_id)], cursor_sort(sort), 0, rows)
+    else:
+        data = make_post_body(qry,  fq, sort, start, rows)
     post_data = json.dumps(data, indent=4)
 
     # if util.debug_mode == "true":
@@ -187,7 +384,7 @@ def query(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
     #     log(post_data)
 
     # Getting ID for new cohort
-    response = requests.post(url, headers=get_headers(), data=post_data)
+    response = util.http_post('solr', url, headers=get_headers(), data=post_data)
 
     # log(response['response']['numFound'], "documents found.")
 
@@ -205,7 +402,7 @@ def query(qry, mapper_url='', mapper_inst='', mapper_key='', tags: list=None,
 def query_doc_size(qry, mapper_url, mapper_inst, mapper_key, tags: list=None,
                    sort='', start=0, rows=10, cohort_ids: list=None, types: list=None,
                    filter_query='', job_results_filters: dict=None, sources: list=None,
-                   report_type_query='', solr_url='http://nlp-solr:8983/solr/sample'):
+                   report_type_query='', filters: list=None, solr_url='http://nlp-solr:8983/solr/sample'):
 
     if tags is None:
         tags = list()
@@ -219,8 +416,10 @@ def query_doc_size(qry, mapper_url, mapper_inst, mapper_key, tags: list=None,
         sources = list()
     
     url = solr_url + '/select'
-    fq = make_fq(types, tags, filter_query, mapper_url, mapper_inst, mapper_key, report_type_query, cohort_ids,
-                 job_results_filters, sources)
+    fq = filters
+    if fq is None:
+        fq = make_fq(types, tags, filter_query, mapper_url, mapper_inst, mapper_key, report_type_query, cohort_ids,
+                     job_results_filters, sources)
     data = make_post_body(qry, fq, sort, start, rows)
     post_data = json.dumps(data)
 
@@ -229,7 +428,7 @@ def query_doc_size(qry, mapper_url, mapper_inst, mapper_key, tags: list=None,
         log(post_data, DEBUG)
 
     # Getting ID for new cohort
-    response = requests.post(url, headers=get_headers(), data=post_data)
+    response = util.http_post('solr', url, headers=get_headers(), data=post_data)
     if response.status_code != 200:
         return 0
 
@@ -248,7 +447,7 @@ def query_doc_by_id(report_id, solr_url='http://nlp-solr:8983/solr/sample'):
     #     log("Querying to get document " + url, DEBUG)
     #     log(post_data, DEBUG)
 
-    response = requests.post(url, headers=get_headers(), data=post_data)
+    response = util.http_post('solr', url, headers=get_headers(), data=post_data)
     if response.status_code != 200:
         return {}
 
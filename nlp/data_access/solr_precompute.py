@@ -1,31 +1,63 @@
-import util
+#!/usr/bin/env python3
+"""
+Precompute sentence and section segmentation for the documents in Solr.
+
+The corpus is split into shards of consecutive ids, planned once by walking
+the ids in order. The shards run in a pool of forked worker processes; the
+parent loads spaCy and the section tagger before forking, so the workers
+share them. Each worker streams the documents of its shard that still need
+segmentation (with cursorMark paging) and writes only the new fields back
+with Solr atomic updates, so the stored document isn't re-posted.
+
+The shard plan and the finished shards are written to a checkpoint file
+after every shard. Run the command again with the same checkpoint to resume
+after a crash: finished shards are skipped, and since only documents without
+segmentation are queried, a half-done shard picks up where it stopped.
+
+Atomic updates need every other field of the Solr schema to be stored (or
+docValues), which the ClarityNLP schema is. Run it from the nlp directory:
+
+        python3 ./data_access/solr_precompute.py --processes 8
+        python3 ./data_access/solr_precompute.py --solr-url http://localhost:8983/solr/mimic \\
+                --shard-size 20000 --checkpoint /data/tmp/precompute.json
+
+"""
+
+import gc
+import os
 import json
-import requests
-from algorithms import segmentation, segmentation_init
+import time
+import argparse
+import multiprocessing
+from xml.sax import saxutils as su
+
+import util
+from algorithms import segmentation
 from algorithms.sec_tag import *
+from algorithms.segmentation.segmentation_spans import locate_spans
 from claritynlp_logging import log, ERROR, DEBUG
 
 try:
-    from .solr_data import query, query_doc_size
+    from .solr_data import query_page, query_doc_size, stream_documents, START_CURSOR
 except Exception:
-    from solr_data import query, query_doc_size
+    from solr_data import query_page, query_doc_size, stream_documents, START_CURSOR
 
-segment = segmentation.Segmentation()
-batch_size = 10
-solr_url = "http://18.220.133.76:8983/solr/sample"
 sentences_key = "sentence_attrs"
 section_names_key = "section_name_attrs"
 section_text_key = "section_text_attrs"
-url = solr_url + '/update?commit=true'
+sentence_offsets_key = "sentence_offset_ids"
+section_offsets_key = "section_offset_ids"
+# documents without sentences, or without sections
+PENDING_QUERY = "(*:* -sentence_offset_ids:* -sentence_attrs:*) OR (*:* -section_name_attrs:*)"
+DONE_QUERY = "sentence_offset_ids:* OR sentence_attrs:*"
 headers = {
     'Content-type': 'application/json',
 }
-doc_size = 0
-spacy = segmentation_init(tries=2)
+segment = segmentation.Segmentation()
 
 
 def document_sentences(txt):
-    sentence_list = segment.parse_sentences(txt, spacy=spacy)
+    sentence_list = segment.parse_sentences(txt)
     return sentence_list
 
 
@@ -47,90 +79,251 @@ def document_text(doc, clean=True):
         return ''
 
 
-def retry(docs):
-    updated_docs = list()
+def span_text(doc):
+    # the offsets index into the text the tasks read, task_utilities.document_text(doc), so it is built the same way
+    return su.unescape(document_text(doc, clean=False))
 
-    for d in docs:
-        d[section_names_key] = []
-        d[section_text_key] = []
-        updated_docs.append(d)
-    data = json.dumps(updated_docs)
-    response2 = requests.post(url, headers=headers, data=data)
 
-    if response2.status_code == 200:
-        log('successful retry!!!')
-    else:
-        log('failed retry: ', response2.reason)
-        log(response2.content)
+def quote_term(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
 
 
-def pre_compute(n):
-    try:
-        docs = query("-sentence_attrs:*", solr_url=solr_url, mapper_inst=util.report_mapper_inst,
-                     mapper_key=util.report_mapper_key, sort="source DESC",
-                     mapper_url=util.report_mapper_url, start=n, rows=batch_size)
-        updated_docs = list()
-        ids = list()
-        for doc in docs:
-            txt = document_text(doc, clean=True)
-            updates = False
-            if sentences_key not in doc:
-                sentences = document_sentences(txt)
-                doc[sentences_key] = sentences
-                updates = True
-
-            if section_names_key not in doc:
-                section_headers, section_texts = [UNKNOWN], [txt]
-                try:
-                    section_headers, section_texts = sec_tag_process(txt)
-                except Exception as e:
-                    log(e)
-                names = [x.concept for x in section_headers]
-                doc[section_names_key] = names
-                doc[section_text_key] = section_texts
-                updates = True
-
-            if updates:
-                ids.append(doc[util.solr_report_id_field])
-                updated_docs.append(doc)
-
-        log('updating the following docs: ', ids)
-        if n % 10 == 0:
-            log("******************************")
-            done_doc_size = query_doc_size("sentence_attrs:*", solr_url=solr_url, mapper_inst=util.report_mapper_inst,
-                                      mapper_key=util.report_mapper_key, mapper_url=util.report_mapper_url)
-
-            pct = (float(done_doc_size) / float(doc_size)) * 100.0
-            log("updated overall: %d/%d (%f pct)" % (done_doc_size, doc_size, pct))
-            log("******************************")
-        data = json.dumps(updated_docs)
-        response2 = requests.post(url, headers=headers, data=data)
-
-        if response2.status_code == 200:
-            log('success!!!')
+def shard_filter(shard):
+    return '%s:[%s TO %s]' % (util.solr_id_field, quote_term(shard['first_id']), quote_term(shard['last_id']))
+
+
+def plan_shards(solr_url, shard_size):
+    """
+    Split the ids of the documents still to be segmented into ranges of 'shard_size' documents, reading one
+    page of ids per shard.
+    """
+    shards = list()
+    cursor_mark = START_CURSOR
+    while True:
+        docs, next_cursor_mark = query_page(PENDING_QUERY, None, shard_size, cursor_mark=cursor_mark,
+                                            fields=util.solr_id_field, solr_url=solr_url)
+        if len(docs) == 0:
+            break
+        shards.append({
+            'shard': len(shards),
+            'first_id': docs[0][util.solr_id_field],
+            'last_id': docs[-1][util.solr_id_field],
+            'docs': len(docs)
+        })
+        if next_cursor_mark == cursor_mark:
+            break
+        cursor_mark = next_cursor_mark
+
+    return shards
+
+
+def segment_document(doc):
+    """
+    Return the atomic update for the segmentation fields the document is missing, or None if it has them all.
+    Offsets replace the text arrays when the pieces can be sliced back from the text, and the other form is
+    removed, so a document never keeps both.
+    """
+    txt = span_text(doc)
+    update = dict()
+
+    if sentence_offsets_key not in doc and sentences_key not in doc:
+        # offsets if every sentence can be sliced back from the text, else the sentences themselves
+        sentences = document_sentences(txt)
+        offsets = locate_spans(txt, sentences, exact=True)
+        if offsets is None:
+            update[sentences_key] = {'set': sentences}
         else:
-            log('fail: ', response2.reason)
-            log(response2.content)
-            retry(updated_docs)
-    except Exception as ex:
-        log('exception updating docs')
-        return False
-    return True
+            update[sentence_offsets_key] = {'set': offsets}
+
+    if section_names_key not in doc:
+        section_headers, section_texts = [UNKNOWN], [txt]
+        try:
+            section_headers, section_texts = sec_tag_process(txt)
+        except Exception as e:
+            log(e)
+        update[section_names_key] = {'set': [x.concept for x in section_headers]}
+        offsets = locate_spans(txt, section_texts)
+        if offsets is None:
+            update[section_text_key] = {'set': section_texts}
+            update[section_offsets_key] = {'set': None}
+        else:
+            update[section_offsets_key] = {'set': offsets}
+            update[section_text_key] = {'set': None}
+
+    if len(update) == 0:
+        return None
+    update[util.solr_id_field] = doc[util.solr_id_field]
+    return update
 
 
-def get_documents():
-    global doc_size
-    doc_size = query_doc_size("*:*", solr_url=solr_url, mapper_inst=util.report_mapper_inst,
-                              mapper_key=util.report_mapper_key, mapper_url=util.report_mapper_url)
+def post_updates(solr_url, updates, commit_within):
+    """
+    Send the atomic updates, one document at a time if the batch is rejected. Returns the number of documents
+    that failed.
+    """
+    url = '%s/update?commitWithin=%d' % (solr_url, commit_within)
+    response = util.http_post('solr', url, headers=headers, data=json.dumps(updates))
+    if response.status_code == 200:
+        return 0
 
-    i = 0
-    while i < doc_size:
-        log("on batch %d" % i)
-        pre_compute(i)
+    log('batch update failed: {} {}'.format(response.status_code, response.text), ERROR)
+    failed = 0
+    for update in updates:
+        response = util.http_post('solr', url, headers=headers, data=json.dumps([update]))
+        if response.status_code != 200:
+            log('failed to update {}: {}'.format(update[util.solr_id_field], response.text), ERROR)
+            failed += 1
+    return failed
 
-        i += batch_size
+
+def run_shard(args):
+    solr_url, shard, batch_size, commit_within = args
+    start = time.time()
+    result = {'shard': shard['shard'], 'docs': 0, 'updated': 0, 'failed': 0}
+
+    fields = ','.join([util.solr_id_field, util.solr_text_field, sentences_key, sentence_offsets_key,
+                       section_names_key])
+    updates = list()
+    for doc in stream_documents(PENDING_QUERY, rows=batch_size, fields=fields, filters=[shard_filter(shard)],
+                                solr_url=solr_url):
+        result['docs'] += 1
+        update = segment_document(doc)
+        if update is not None:
+            updates.append(update)
+        if len(updates) >= batch_size:
+            result['failed'] += post_updates(solr_url, updates, commit_within)
+            result['updated'] += len(updates)
+            updates = list()
+
+    if len(updates) > 0:
+        result['failed'] += post_updates(solr_url, updates, commit_within)
+        result['updated'] += len(updates)
+
+    result['seconds'] = time.time() - start
+    return result
+
+
+def preload_models():
+    from algorithms import segmentation_init, section_tagger_init
+
+    segmentation_init()
+    section_tagger_init()
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+
+
+def read_checkpoint(path, solr_url):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('solr_url') != solr_url:
+        log('ignoring checkpoint {} for another Solr core ({})'.format(path, checkpoint.get('solr_url')), ERROR)
+        return None
+    return checkpoint
+
+
+def write_checkpoint(path, checkpoint):
+    if not path:
+        return
+    # write and rename, so that a crash never leaves a truncated checkpoint
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def default_checkpoint_path(solr_url):
+    core = solr_url.rstrip('/').split('/')[-1]
+    return os.path.join(util.tmp_dir or '.', 'solr_precompute_%s.json' % core)
+
+
+def pre_compute(solr_url, processes=1, shard_size=10000, batch_size=100, commit_within=60000, checkpoint_path=None):
+    """
+    Segment every document that doesn't have precomputed segmentation yet, resuming from the checkpoint if
+    there is one. Returns the checkpoint.
+    """
+    checkpoint = read_checkpoint(checkpoint_path, solr_url)
+    if checkpoint is None:
+        start = time.time()
+        checkpoint = {
+            'solr_url': solr_url,
+            'shards': plan_shards(solr_url, shard_size),
+            'done': list(),
+            'docs': 0,
+            'updated': 0,
+            'failed': 0
+        }
+        write_checkpoint(checkpoint_path, checkpoint)
+        log('planned {} shards in {:.1f}s'.format(len(checkpoint['shards']), time.time() - start))
+    else:
+        log('resuming from {}, {} of {} shards done'.format(checkpoint_path, len(checkpoint['done']),
+                                                          len(checkpoint['shards'])))
+
+    done = set(checkpoint['done'])
+    todo = [s for s in checkpoint['shards'] if s['shard'] not in done]
+    if len(todo) == 0:
+        return checkpoint
+
+    preload_models()
+    context = multiprocessing.get_context('fork')
+    pool = context.Pool(processes=processes)
+    start = time.time()
+    docs = 0
+    try:
+        for result in pool.imap_unordered(run_shard, [(solr_url, s, batch_size, commit_within) for s in todo]):
+            docs += result['docs']
+            checkpoint['done'].append(result['shard'])
+            checkpoint['docs'] += result['docs']
+            checkpoint['updated'] += result['updated']
+            checkpoint['failed'] += result['failed']
+            write_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.time() - start
+            rate = docs / elapsed if elapsed > 0 else 0.0
+            done.add(result['shard'])
+            remaining = sum([s['docs'] for s in checkpoint['shards'] if s['shard'] not in done])
+            log('shard {} done: {} docs in {:.1f}s; {}/{} shards, {:.1f} docs/sec, about {:.0f}s left'.format(
+                result['shard'], result['docs'], result['seconds'], len(checkpoint['done']),
+                len(checkpoint['shards']), rate, remaining / rate if rate > 0 else 0.0))
+        pool.close()
+    except Exception as ex:
+        log('precompute failed, rerun to resume from the checkpoint', ERROR)
+        log(ex, ERROR)
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    util.http_post('solr', solr_url + '/update?commit=true', headers=headers, data=json.dumps({'commit': {}}))
+    done_doc_size = query_doc_size(DONE_QUERY, '', '', '', filters=[], solr_url=solr_url)
+    total_doc_size = query_doc_size("*:*", '', '', '', filters=[], solr_url=solr_url)
+    log('segmented {} docs ({} failed) in {:.1f}s; {}/{} docs in the index have segmentation'.format(
+        checkpoint['updated'], checkpoint['failed'], time.time() - start, done_doc_size, total_doc_size))
+    return checkpoint
 
 
 if __name__ == "__main__":
-    log('update values')
-    get_documents()
+    parser = argparse.ArgumentParser(description='Precompute sentence and section segmentation in Solr')
+    parser.add_argument('--solr-url', default=util.solr_url,
+                        help='Solr core to update, [solr] url by default')
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(),
+                        help='number of worker processes')
+    parser.add_argument('--shard-size', type=int, default=10000,
+                        help='documents per shard, the unit of work and of checkpointing')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='documents per Solr page and per update request')
+    parser.add_argument('--commit-within', type=int, default=60000,
+                        help='commitWithin of the updates, in milliseconds')
+    parser.add_argument('--checkpoint', default='',
+                        help='checkpoint file, solr_precompute_<core>.json in the [tmp] dir by default')
+    parser.add_argument('--restart', action='store_true',
+                        help='ignore the checkpoint and plan the shards again')
+    args = parser.parse_args()
+
+    checkpoint_file = args.checkpoint or default_checkpoint_path(args.solr_url)
+    if args.restart and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    pre_compute(args.solr_url, processes=args.processes, shard_size=args.shard_size, batch_size=args.batch_size,
+                commit_within=args.commit_within, checkpoint_path=checkpoint_file)
@@ -8,8 +8,9 @@ import data_access
 from data_access import pipeline_config as config
 from data_access import solr_data, phenotype_stats
 from data_access import update_phenotype_model
-from luigi_tools import phenotype_helper
+from luigi_tools import phenotype_helper, worker_pool
 from tasks import *
+from tasks.task_utilities import remove_pipeline_artifacts
 from claritynlp_logging import log, ERROR, DEBUG
 
 # TODO eventually move this to luigi_tools, but need to make sure successfully can be found in sys.path
@@ -74,12 +75,12 @@ class PhenotypeTask(luigi.Task):
                                           str(stats["subjects"]))
             log("writing job stats....")
             log(json.dumps(stats, indent=4))
-            # data_access.update_job_status(str(self.job), util.conn_string, data_access.STATS + "_CACHE_QUERY_COUNTS",
-            #                               str(util.get_cache_query_count()))
-            # data_access.update_job_status(str(self.job), util.conn_string,data_access.STATS + "_CACHE_COMPUTE_COUNTS",
-            #                               str(util.get_cache_compute_count()))
-            # data_access.update_job_status(str(self.job), util.conn_string, data_access.STATS + "_CACHE_HIT_RATIO",
-            #                               str(util.get_cache_hit_ratio()))
+            data_access.update_job_status(str(self.job), util.conn_string, data_access.STATS + "_CACHE_QUERY_COUNTS",
+                                          str(util.get_cache_query_count()))
+            data_access.update_job_status(str(self.job), util.conn_string, data_access.STATS + "_CACHE_COMPUTE_COUNTS",
+                                          str(util.get_cache_compute_count()))
+            data_access.update_job_status(str(self.job), util.conn_string, data_access.STATS + "_CACHE_HIT_RATIO",
+                                          str(util.get_cache_hit_ratio()))
 
             for k in util.properties.keys():
                 data_access.update_job_status(str(self.job), util.conn_string, data_access.PROPERTIES + "_" + k,
@@ -120,15 +121,12 @@ def initialize_task_and_get_documents(pipeline_id, job_id, owner):
             added.extend(related_terms)
 
     solr_query = config.get_query(custom_query=pipeline_config.custom_query, terms=added)
-    total_docs = solr_data.query_doc_size(solr_query, mapper_inst=util.report_mapper_inst,
-                                          mapper_url=util.report_mapper_url,
-                                          mapper_key=util.report_mapper_key, solr_url=util.solr_url,
-                                          types=pipeline_config.report_types, filter_query=pipeline_config.filter_query,
-                                          tags=pipeline_config.report_tags,
-                                          report_type_query=pipeline_config.report_type_query,
-                                          sources=pipeline_config.sources,
-                                          cohort_ids=pipeline_config.cohort,
-                                          job_results_filters=pipeline_config.job_results)
+    # resolved once here, and shared with the batch tasks of this pipeline through the filter cache
+    filters = solr_data.get_pipeline_filters(pipeline_id, job_id, pipeline_config,
+                                             mapper_url=util.report_mapper_url, mapper_inst=util.report_mapper_inst,
+                                             mapper_key=util.report_mapper_key)
+    total_docs = solr_data.query_doc_size(solr_query, util.report_mapper_url, util.report_mapper_inst,
+                                          util.report_mapper_key, solr_url=util.solr_url, filters=filters)
     jobs.update_job_status(str(job_id), util.conn_string, jobs.STATS + "_PIPELINE_" + str(pipeline_id) + "_SOLR_DOCS",
                            str(total_docs))
     doc_limit = config.get_limit(total_docs, pipeline_config)
@@ -138,11 +136,32 @@ def initialize_task_and_get_documents(pipeline_id, job_id, owner):
     jobs.update_job_status(str(job_id), util.conn_string, jobs.STATS + "_PIPELINE_" + str(pipeline_id) +
                            "_EVALUATED_DOCS",
                            str(min(doc_limit, total_docs)))
-    ranges = range(0, (doc_limit + int(util.row_count)), int(util.row_count))
+    ranges = plan_batches(solr_query, filters, doc_limit)
+    jobs.flush_job_status()
 
     return solr_query, total_docs, doc_limit, ranges
 
 
+def plan_batches(solr_query, filters, doc_limit):
+    """
+    Return the (start, first id) of each batch task. With use_solr_cursor, each task reads its documents from
+    its first id in id order instead of paging 'start' documents deep; the offset only numbers the batch. Falls
+    back to plain offsets (empty first ids) if it is disabled or the planning query fails.
+    """
+    row_count = int(util.row_count)
+    if util.use_solr_cursor == "true":
+        try:
+            first_ids = solr_data.plan_batch_ids(solr_query, doc_limit, row_count, solr_url=util.solr_url,
+                                                 filters=filters)
+            if len(first_ids) > 0:
+                return [(i * row_count, first_id) for i, first_id in enumerate(first_ids)]
+        except Exception as ex:
+            log('unable to plan id range batches, using offsets', ERROR)
+            log(ex, ERROR)
+
+    return [(n, '') for n in range(0, (doc_limit + row_count), row_count)]
+
+
 def run_pipeline(pipeline, pipelinetype, job, owner):
     pipeline_config = data_access.get_pipeline_config(pipeline, util.conn_string)
 
@@ -165,6 +184,7 @@ class PipelineTask(luigi.Task):
     owner = luigi.Parameter()
     pipelinetype = luigi.Parameter()
     solr_query = '*:*'
+    pooled_tasks = None
 
     def requires(self):
         try:
@@ -174,11 +194,16 @@ class PipelineTask(luigi.Task):
 
             task = registered_pipelines[str(self.pipelinetype)]
             if task.parallel_task:
-                matches = [task(pipeline=self.pipeline, job=self.job, start=n, solr_query=self.solr_query, batch=n)
-                           for n in ranges]
+                matches = [task(pipeline=self.pipeline, job=self.job, start=n, solr_query=self.solr_query, batch=n,
+                                first_id=first_id)
+                           for n, first_id in ranges]
             else:
                 matches = [task(pipeline=self.pipeline, job=self.job, start=0, solr_query=self.solr_query, batch=0)]
 
+            if util.use_worker_pool == "true":
+                # run in 'run' by the worker pool, rather than by luigi as dependencies
+                self.pooled_tasks = matches
+                return list()
             return matches
         except Exception as ex:
             traceback.print_exc(file=sys.stderr)
@@ -187,7 +212,20 @@ class PipelineTask(luigi.Task):
         return list()
 
     def run(self):
-        run_pipeline(self.pipeline, self.pipelinetype, self.job, self.owner)
+        try:
+            if self.pooled_tasks:
+                self.run_pooled_tasks()
+            run_pipeline(self.pipeline, self.pipelinetype, self.job, self.owner)
+        finally:
+            # e.g. the compiled term finder the batches shared
+            remove_pipeline_artifacts(self.job, self.pipeline)
+
+    def run_pooled_tasks(self):
+        processes, max_batches, preload = worker_pool.get_pool_settings()
+        stats = worker_pool.run_batches(self.pooled_tasks, processes, max_batches=max_batches, preload=preload)
+        stats['pipeline'] = self.pipeline
+        stats['pipeline_type'] = str(self.pipelinetype)
+        jobs.update_job_status(str(self.job), util.conn_string, jobs.WORKER_POOL_STATS, json.dumps(stats))
 
     def complete(self):
         status = jobs.get_job_status(str(self.job), util.conn_string)
@@ -0,0 +1,167 @@
+"""
+Runs the batch tasks of a pipeline in a pool of forked worker processes.
+
+In the default mode luigi starts a process for every batch task, and each one
+loads spaCy, the section tagger, the context triggers and the ngram lists on
+its own. With the worker pool (optimizations.use_worker_pool), PipelineTask
+runs its batches here instead: the parent loads every model and lookup table
+first ('preload_models'), then forks the workers, which share those pages
+copy-on-write. gc.freeze() keeps the collector from touching, and so copying,
+the preloaded objects in the workers.
+
+Batches whose luigi output already exists ('complete') are skipped, as luigi
+would skip them, so a rerun doesn't write their results again. Workers are
+replaced after worker_max_batches batches, to bound the memory a worker can
+accumulate. Each batch reports its worker's memory; 'run_batches'
+returns the time to the first finished batch and the memory of each worker,
+which PipelineTask writes to the job stats.
+"""
+
+import gc
+import os
+import time
+import resource
+import multiprocessing
+
+import util
+from claritynlp_logging import log, ERROR, DEBUG
+
+_preload_seconds = None
+
+
+###############################################################################
+def memory_usage():
+    """
+    Return this process's memory in MB. 'private_mb' excludes the pages still
+    shared with the parent; it is only available on Linux 4.14 or later.
+    """
+
+    usage = dict()
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            fields = dict()
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+        usage['rss_mb'] = fields['Rss'] / 1024.0
+        usage['pss_mb'] = fields['Pss'] / 1024.0
+        usage['private_mb'] = (fields['Private_Clean'] + fields['Private_Dirty']) / 1024.0
+    except Exception:
+        # peak RSS, in kilobytes on Linux
+        usage['rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return usage
+
+
+###############################################################################
+def preload_models():
+    """
+    Load the models and read-only tables that the batch tasks use, once per
+    process. Returns the time it took, in seconds.
+    """
+
+    global _preload_seconds
+    if _preload_seconds is not None:
+        return _preload_seconds
+
+    from algorithms import segmentation_init, section_tagger_init, context_init, measurement_finder_init
+    from algorithms.finder import terms, subject_finder
+
+    log('Preloading models for worker pool...')
+    start = time.time()
+    segmentation_init()
+    section_tagger_init()
+    context_init()
+    terms.get_context()
+    measurement_finder_init()
+    subject_finder.get_nlp()
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+    _preload_seconds = time.time() - start
+    log('Preloaded models in {0:.2f}s, {1}'.format(_preload_seconds, memory_usage()))
+
+    return _preload_seconds
+
+
+###############################################################################
+def _run_batch(task_args):
+    task_class, params = task_args
+    start = time.time()
+    task = task_class(**params)
+    task.run()
+    return {
+        'pid': os.getpid(),
+        'batch': params.get('batch'),
+        'seconds': time.time() - start,
+        'memory': memory_usage()
+    }
+
+
+###############################################################################
+def run_batches(tasks: list, processes: int, max_batches: int = 0, preload: bool = True):
+    """
+    Run the luigi batch tasks that aren't complete yet in a forked pool of
+    'processes' workers, each replaced after 'max_batches' batches (0 for
+    never). Returns the pool stats.
+    """
+
+    pending = [task for task in tasks if not task.complete()]
+    if len(pending) < len(tasks):
+        log('Worker pool skipping {0} completed batches'.format(len(tasks) - len(pending)))
+
+    stats = {
+        'processes': processes,
+        'max_batches': max_batches,
+        'preload': preload,
+        'preload_seconds': preload_models() if preload and len(pending) > 0 else 0.0,
+        'batches': 0,
+        'skipped': len(tasks) - len(pending),
+        'first_batch_seconds': None,
+        'parent': memory_usage(),
+        'workers': dict()
+    }
+
+    start = time.time()
+    if len(pending) == 0:
+        stats['seconds'] = 0.0
+        return stats
+
+    context = multiprocessing.get_context('fork')
+    pool = context.Pool(processes=processes, maxtasksperchild=max_batches if max_batches > 0 else None)
+    try:
+        for result in pool.imap_unordered(_run_batch, [(type(task), task.param_kwargs) for task in pending]):
+            if stats['first_batch_seconds'] is None:
+                stats['first_batch_seconds'] = time.time() - start
+            stats['batches'] += 1
+
+            # the memory after each worker's last batch is the most it has grown
+            worker = stats['workers'].setdefault(str(result['pid']), {'batches': 0, 'seconds': 0.0})
+            worker['batches'] += 1
+            worker['seconds'] += result['seconds']
+            worker['memory'] = result['memory']
+        pool.close()
+    except Exception as ex:
+        log('worker pool failed', ERROR)
+        log(ex, ERROR)
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    stats['seconds'] = time.time() - start
+    log('Worker pool ran {0} batches in {1:.2f}s, first batch after {2}s'.format(
+        stats['batches'], stats['seconds'], stats['first_batch_seconds']))
+    return stats
+
+
+###############################################################################
+def get_pool_settings():
+    """
+    Return (processes, max_batches, preload) from the config.
+    """
+
+    processes = int(util.worker_pool_size)
+    if processes <= 0:
+        processes = int(util.luigi_workers)
+    return processes, int(util.worker_max_batches), util.worker_pool_preload == "true"
@@ -0,0 +1,136 @@
+"""
+Registry of the spaCy pipelines used by ClarityNLP.
+
+Modules get their pipeline from 'get_model' instead of calling spacy.load,
+so each pipeline configuration is loaded at most once per process, the first
+time it is used, and is shared by every caller. Callers that don't need all
+of the components skip the others when they run the pipeline, which spaCy
+supports per call:
+
+        nlp = spacy_models.get_model()
+        doc = nlp(text, disable=spacy_models.DISABLE_FOR_POS)
+
+A caller that changes its pipeline (for instance by adding tokenizer special
+cases) passes a 'key' to get a private copy.
+
+'pipe_documents' streams the sentences of many documents through nlp.pipe
+in batches, and maps each parsed sentence back to its document.
+
+"""
+
+import time
+import threading
+
+from claritynlp_logging import log, ERROR, DEBUG
+
+DEFAULT_MODEL = 'en_core_web_sm'
+
+# components each kind of caller can skip; sentence boundaries come from the parser
+DISABLE_FOR_PARSE = ['ner']
+DISABLE_FOR_POS = ['parser', 'ner']
+DISABLE_FOR_ENTITIES = ['parser']
+
+DEFAULT_BATCH_SIZE = 256
+
+_lock = threading.Lock()
+_models = dict()
+_load_seconds = dict()
+
+
+###############################################################################
+def _config(name, disable, key):
+    if disable is None:
+        disable = []
+    return name, tuple(sorted(disable)), key
+
+
+###############################################################################
+def get_model(name=DEFAULT_MODEL, disable=None, key=None):
+    """
+    Return the spaCy pipeline for the model 'name', loading it on first use.
+    Components in 'disable' are not loaded at all; use this only for
+    components that no user of the pipeline needs.
+    """
+
+    config = _config(name, disable, key)
+    nlp = _models.get(config)
+    if nlp is not None:
+        return nlp
+
+    # concurrent first callers wait for the one load instead of starting their own
+    with _lock:
+        nlp = _models.get(config)
+        if nlp is None:
+            import spacy
+
+            log('Loading spaCy model {0}, disable={1}, key={2}...'.format(*config))
+            start = time.time()
+            nlp = spacy.load(name, disable=list(config[1]))
+            _load_seconds[config] = time.time() - start
+            _models[config] = nlp
+            log('Loaded spaCy model {0} in {1:.2f}s'.format(name, _load_seconds[config]))
+
+    return nlp
+
+
+###############################################################################
+def pipe(nlp, texts, disable=None, batch_size=DEFAULT_BATCH_SIZE, n_process=1):
+    """
+    Run the texts through nlp.pipe and return an iterator over the Docs, in
+    order. spaCy versions before 2.2 have no 'n_process' and run in this
+    process.
+    """
+
+    if disable is None:
+        disable = []
+    if n_process > 1:
+        try:
+            return nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disable)
+        except TypeError as ex:
+            log('spaCy pipe does not support n_process, using one process', ERROR)
+            log(ex, ERROR)
+    return nlp.pipe(texts, batch_size=batch_size, disable=disable)
+
+
+###############################################################################
+def pipe_documents(nlp, sentence_lists, disable=None, batch_size=DEFAULT_BATCH_SIZE, n_process=1):
+    """
+    Run the sentences of all documents through the pipeline in one stream.
+    'sentence_lists' has one list of sentences per document; yields a
+    (document index, sentence, Doc) tuple for every non-blank sentence.
+    """
+
+    indices = list()
+    sentences = list()
+    for index, sentence_list in enumerate(sentence_lists):
+        for sentence in sentence_list:
+            sentence = sentence.strip()
+            if len(sentence) > 0:
+                indices.append(index)
+                sentences.append(sentence)
+
+    docs = pipe(nlp, sentences, disable=disable, batch_size=batch_size, n_process=n_process)
+    return zip(indices, sentences, docs)
+
+
+###############################################################################
+def is_loaded(name=DEFAULT_MODEL, disable=None, key=None):
+    return _config(name, disable, key) in _models
+
+
+###############################################################################
+def get_stats():
+    """
+    Return the pipelines loaded in this process and their load times.
+    """
+
+    return [
+        {
+            'name': name,
+            'disable': list(disable),
+            'key': key,
+            'pipeline': list(_models[(name, disable, key)].pipe_names),
+            'load_seconds': _load_seconds[(name, disable, key)]
+        }
+        for name, disable, key in sorted(_models.keys(), key=str)
+    ]
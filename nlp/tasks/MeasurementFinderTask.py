@@ -8,14 +8,17 @@ SECTIONS_FILTER = "sections"
 
 class MeasurementFinderTask(BaseTask):
     task_name = "MeasurementFinder"
+    parallel_docs_safe = True
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
         filters = dict()
         if self.pipeline_config.sections and len(self.pipeline_config.sections) > 0:
             filters[SECTIONS_FILTER] = self.pipeline_config.sections
 
+        prefilter = self.get_sentence_prefilter()
         for doc in self.docs:
-            meas_results = run_measurement_finder_full(self.get_document_text(doc), self.pipeline_config.terms)
+            meas_results = run_measurement_finder_full(self.get_document_text(doc), self.pipeline_config.terms,
+                                                       prefilter=prefilter)
             for meas in meas_results:
                 value = meas['X']
                 obj = {
@@ -1,6 +1,6 @@
 from pymongo import MongoClient
 
-from algorithms import get_standard_entities
+from algorithms import get_standard_entities_batch
 from .task_utilities import BaseTask
 
 SECTIONS_FILTER = "sections"
@@ -8,6 +8,7 @@ SECTIONS_FILTER = "sections"
 
 class NERTask(BaseTask):
     task_name = "NamedEntityRecognition"
+    parallel_docs_safe = True
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
         pipeline_config = self.pipeline_config
@@ -17,8 +18,9 @@ class NERTask(BaseTask):
             filters[SECTIONS_FILTER] = pipeline_config.sections
 
         # TODO incorporate sections and filters
-        for doc in self.docs:
-            res = get_standard_entities(self.get_document_text(doc))
+        texts = [self.get_document_text(doc) for doc in self.docs]
+        batch_results = get_standard_entities_batch(texts, **self.get_spacy_pipe_args())
+        for doc, res in zip(self.docs, batch_results):
             for val in res:
                 obj = {
                     "term": val.text,
@@ -70,6 +70,7 @@ class NGramCollector(BaseCollector):
 
 class NGramTask(BaseTask):
     task_name = "ngram"
+    parallel_docs_safe = True
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
         log('run custom task')
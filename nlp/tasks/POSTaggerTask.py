@@ -1,6 +1,6 @@
 from pymongo import MongoClient
 
-from algorithms import get_tags
+from algorithms import get_tags_batch
 from .task_utilities import BaseTask
 
 SECTIONS_FILTER = "sections"
@@ -9,12 +9,14 @@ SECTIONS_FILTER = "sections"
 class POSTaggerTask(BaseTask):
 
     task_name = "POSTagger"
+    parallel_docs_safe = True
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
 
             # TODO incorporate sections and filters
-            for doc in self.docs:
-                res = get_tags(self.get_document_text(doc))
+            texts = [self.get_document_text(doc) for doc in self.docs]
+            batch_results = get_tags_batch(texts, **self.get_spacy_pipe_args())
+            for doc, res in zip(self.docs, batch_results):
                 for val in res:
                     obj = {
                         "sentence": val.sentence,
@@ -1,8 +1,19 @@
+import fcntl
+import hashlib
+import os
+import pickle
+import sys
+
 from cachetools import cached
 
 from algorithms import *
+from algorithms.context import context as context_module
+from algorithms.finder import terms as terms_module
+from algorithms.finder import term_trie as term_trie_module
 from data_access import jobs
-from .task_utilities import BaseTask, pipeline_cache, init_cache, get_document_by_id, document_text, document_sections
+from claritynlp_logging import log, ERROR, DEBUG
+from .task_utilities import BaseTask, pipeline_cache, init_cache, get_document_by_id, document_text, \
+    document_sections, pipeline_artifact_dir
 
 provider_assertion_filters = {
     'negex': ["Affirmed"],
@@ -12,30 +23,141 @@ provider_assertion_filters = {
 SECTIONS_FILTER = "sections"
 
 
-@cached(init_cache)
-def get_finder(key):
-    _, _, term_list, synonyms, descendants, ancestors, vocab, _, filters = get_values_from_key(key)
-    finder_obj = TermFinder(term_list, synonyms, descendants, ancestors, vocab,
-                            filters=filters)
+def source_digest(*modules):
+    digest = hashlib.sha1()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
 
-    return finder_obj
 
+# cached results and finder artifacts are read back only by the same term-finder code, including the term trie and
+# ConText they depend on; the termset digest is part of each key
+TERM_FINDER_SOURCE = source_digest(terms_module, term_trie_module, context_module, sys.modules[__name__])
+TERM_FINDER_NAMESPACE = 'termfinder:' + TERM_FINDER_SOURCE
 
-def get_term_matches(key):
-    _, doc_id, term_list, synonyms, descendants, ancestors, vocab, _, filters = get_values_from_key(key)
 
-    objs = list()
-    doc = get_document_by_id(doc_id)
+class TermFinderConfig(object):
+    """
+    The settings a TermFinder is built from. The finder, LRU and Redis caches are keyed by 'digest', a hash of
+    the normalized termset and settings, rather than by the settings themselves. With a job and pipeline id,
+    the compiled finder is also saved as a pipeline artifact (see get_finder).
+    """
+
+    def __init__(self, name, term_list, synonyms, descendants, ancestors, vocab, filters, has_special_filters,
+                 excluded_terms=None, pipeline_id=None, job_id=None):
+        if not has_special_filters:
+            if name == "ProviderAssertion":
+                filters = provider_assertion_filters
+            else:
+                filters = dict()
+        if term_list is None:
+            term_list = list()
+        if excluded_terms is None:
+            excluded_terms = list()
+
+        self.name = name
+        self.term_list = term_list
+        self.synonyms = synonyms
+        self.descendants = descendants
+        self.ancestors = ancestors
+        self.vocab = vocab
+        self.filters = filters
+        self.excluded_terms = excluded_terms
+        self.pipeline_id = pipeline_id
+        self.job_id = job_id
+        self.digest = config_digest(term_list, synonyms, descendants, ancestors, vocab, filters, excluded_terms)
+
+
+def config_digest(term_list, synonyms, descendants, ancestors, vocab, filters, excluded_terms):
+    # the term order and surrounding whitespace don't change what the finder matches
+    normalized = {
+        'terms': sorted(set([t.strip() for t in term_list])),
+        'synonyms': bool(synonyms),
+        'descendants': bool(descendants),
+        'ancestors': bool(ancestors),
+        'vocab': vocab,
+        'filters': filters,
+        'excluded_terms': sorted(set([t.strip() for t in excluded_terms]))
+    }
+    text = json.dumps(normalized, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def build_finder(config: TermFinderConfig):
+    return TermFinder(config.term_list, config.synonyms, config.descendants, config.ancestors, config.vocab,
+                      filters=config.filters, excluded_terms=config.excluded_terms)
+
+
+def finder_artifact_path(config: TermFinderConfig):
+    return os.path.join(pipeline_artifact_dir(config.job_id, config.pipeline_id),
+                        'termfinder_{}_{}.pickle'.format(TERM_FINDER_SOURCE, config.digest[:16]))
+
+
+def read_finder_artifact(path):
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception as ex:
+        log('unable to read term finder artifact {}'.format(path), ERROR)
+        log(ex, ERROR)
+        return None
+
+
+def load_pipeline_finder(config: TermFinderConfig):
+    """
+    The finder of the pipeline from its artifact in the pipeline's private artifact dir. The first batch to get
+    here expands the termset and compiles the matchers, holding a lock so that the other batches and workers of
+    the pipeline wait for it and load the artifact instead of building their own. The artifact and its lock are
+    removed when the pipeline finishes.
+    """
+    path = finder_artifact_path(config)
+    if os.path.exists(path):
+        finder_obj = read_finder_artifact(path)
+        if finder_obj is not None:
+            return finder_obj
+
+    with open(path + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(path):
+                finder_obj = read_finder_artifact(path)
+                if finder_obj is not None:
+                    return finder_obj
+
+            finder_obj = build_finder(config)
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(finder_obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            log('saved term finder for pipeline {} ({} terms) to {}'.format(config.pipeline_id,
+                                                                           len(finder_obj.terms), path))
+            return finder_obj
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@cached(init_cache, key=lambda config: ('term_finder', config.digest))
+def get_finder(config: TermFinderConfig):
+    if config.pipeline_id is None or config.job_id is None:
+        return build_finder(config)
+    try:
+        return load_pipeline_finder(config)
+    except Exception as ex:
+        log(ex, ERROR)
+        return build_finder(config)
+
+
+def term_match_objects(finder_obj, doc):
     section_headers, section_texts = document_sections(doc)
     # all sentences in this document
     doc_text = document_text(doc)
 
-    keys = key.split('|')
-    keys[1] = ''
-    finder_obj = get_finder('|'.join(keys))
-
+    objs = list()
     terms_found = finder_obj.get_term_full_text_matches(doc_text, section_headers, section_texts)
     for term in terms_found:
+        if not isinstance(term.section, str):
+            term.section = term.section.concept
         obj = {
             "sentence": term.sentence,
             "section": term.section,
@@ -51,120 +173,90 @@ def get_term_matches(key):
     return objs
 
 
-def setup_key(name, doc_id, term_list, synonyms, descendants,
-              ancestors, vocab, filters, has_special_filters):
-    if isinstance(term_list, list):
-        term_list = json.dumps(term_list)
-    if isinstance(filters, dict):
-        filters = json.dumps(filters)
-    thing = '%s|%s|%s|%r|%r|%r|%s|%r' % (name, doc_id, term_list, synonyms, descendants,
-                                         ancestors, vocab, has_special_filters)
-    if has_special_filters:
-        thing += ("|%s" + filters)
-    else:
-        thing += '|'
-    return thing
-
-
-def get_values_from_key(key):
-    keys = key.split('|')
-    type_name = keys[0]
-    doc_id = keys[1]
-    term_list = json.loads(keys[2])
-    synonyms = keys[3] == "True"
-    descendants = keys[4] == "True"
-    ancestors = keys[5] == "True"
-    vocab = keys[6]
-    has_special_filters = keys[7] == "True"
-    if len(keys[8]) > 0:
-        filters = json.loads(keys[8])
-    else:
-        if type_name == "ProviderAssertion":
-            filters = provider_assertion_filters
-        else:
-            filters = dict()
-    return type_name, doc_id, term_list, synonyms, descendants, ancestors, vocab, has_special_filters, filters
+def get_term_matches(config: TermFinderConfig, doc_id):
+    doc = get_document_by_id(doc_id)
+    return term_match_objects(get_finder(config), doc)
 
 
-@cached(pipeline_cache)
-def _get_cached_terms(key):
+def doc_key(config: TermFinderConfig, doc_id):
+    return '{}:{}'.format(config.digest, doc_id)
+
+
+@cached(pipeline_cache, key=lambda config, doc_id: ('term_finder', config.digest, doc_id))
+def _get_cached_terms(config: TermFinderConfig, doc_id):
     util.add_cache_compute_count()
-    return get_term_matches(key)
+    return get_term_matches(config, doc_id)
 
 
-def get_cached_terms(name, doc_id, term_list, synonyms, descendants, ancestors, vocab,
-                     filters, has_special_filters):
-    thing = setup_key(name, doc_id, term_list, synonyms, descendants, ancestors, vocab,
-                      filters, has_special_filters)
+def get_cached_terms(config: TermFinderConfig, doc_id):
     if util.use_redis_caching == "true":
-        # TODO use better key method, some recoverable hash
-        hashed_str = name + ':' + thing
-        res = util.get_from_redis_cache(hashed_str)
+        key = doc_key(config, doc_id)
+        res = util.cache_get(TERM_FINDER_NAMESPACE, key)
         util.add_cache_query_count()
         if res:
             objs = json.loads(res)
         else:
             util.add_cache_compute_count()
-            objs = get_term_matches(thing)
-            util.write_to_redis_cache(hashed_str, json.dumps(objs))
+            objs = get_term_matches(config, doc_id)
+            util.cache_set(TERM_FINDER_NAMESPACE, key, json.dumps(objs))
     else:
         util.add_cache_query_count()
-        objs = _get_cached_terms(thing)
-        if not objs or len(objs) == 0:
-            objs = get_term_matches(thing)
+        objs = _get_cached_terms(config, doc_id)
     return objs
 
 
+def get_cached_terms_for_docs(config: TermFinderConfig, docs):
+    """
+    The term matches of each document, reading the Redis cache for the whole batch in one round trip and
+    writing the matches of the documents that weren't cached in another.
+    """
+    doc_keys = [doc_key(config, doc[util.solr_report_id_field]) for doc in docs]
+    cached_values = util.cache_get_many(TERM_FINDER_NAMESPACE, doc_keys)
+    util.add_cache_query_count(len(docs))
+
+    results = list()
+    computed = dict()
+    for doc, key, value in zip(docs, doc_keys, cached_values):
+        if value:
+            objs = json.loads(value)
+        else:
+            objs = term_match_objects(get_finder(config), doc)
+            computed[key] = json.dumps(objs)
+        results.append(objs)
+
+    util.add_cache_compute_count(len(computed))
+    util.cache_set_many(TERM_FINDER_NAMESPACE, computed)
+    return results
+
+
 def run_term_finder(name, filters, pipeline_config, temp_file, mongo_client, docs, write_log_data, write_result_data,
-                    has_special_filters):
+                    has_special_filters, pipeline_id=None, job_id=None):
     pipeline_config = pipeline_config
-    term_matcher = None
     write_log_data(jobs.IN_PROGRESS, "Finding Terms with " + name)
 
-    for doc in docs:
-        objs = get_cached_terms(name, doc[util.solr_report_id_field], pipeline_config.terms, pipeline_config.
-                                include_synonyms, pipeline_config
-                                .include_descendants, pipeline_config.include_ancestors, pipeline_config
-                                .vocabulary, filters, has_special_filters)
-        if objs and len(objs) > 0:
-            for obj in objs:
-                write_result_data(temp_file, mongo_client, doc, obj)
+    finder_config = TermFinderConfig(name, pipeline_config.terms, pipeline_config.include_synonyms,
+                                     pipeline_config.include_descendants, pipeline_config.include_ancestors,
+                                     pipeline_config.vocabulary, filters, has_special_filters,
+                                     excluded_terms=pipeline_config.excluded_terms, pipeline_id=pipeline_id,
+                                     job_id=job_id)
+    batch_objs = None
+    if util.use_redis_caching == "true":
+        batch_objs = get_cached_terms_for_docs(finder_config, docs)
+
+    for i, doc in enumerate(docs):
+        if batch_objs is not None:
+            objs = batch_objs[i]
         else:
-            if not term_matcher:
-                term_matcher = TermFinder(pipeline_config.terms, pipeline_config.include_synonyms, pipeline_config
-                                          .include_descendants, pipeline_config.include_ancestors, pipeline_config
-                                          .vocabulary, filters=filters, excluded_terms=pipeline_config.excluded_terms)
-            section_headers, section_texts = document_sections(doc)
-            terms_found = term_matcher.get_term_full_text_matches(document_text(doc), section_headers, section_texts)
-            for term in terms_found:
-                if not isinstance(term.section, str):
-                    term.section = term.section.concept
-                obj = {
-                    "sentence": term.sentence,
-                    "section": term.section,
-                    "term": term.term,
-                    "text": term.term,
-                    "start": term.start,
-                    "end": term.end,
-                    "negation": term.negex,
-                    "temporality": term.temporality,
-                    "experiencer": term.experiencer,
-                    "value": (term.negex == "Affirmed"),
-                    "result_display": {
-                        "date": doc[util.solr_report_date_field],
-                        "result_content": term.sentence,
-                        "sentence": term.sentence,
-                        "highlights": [term.term],
-                        "start": [term.start],
-                        "end": [term.end],
-                    }
-                }
-
-                write_result_data(temp_file, mongo_client, doc, obj)
+            objs = get_cached_terms(finder_config, doc[util.solr_report_id_field])
+        # the cached and the computed matches come from the same pipeline finder, so an empty list means the
+        # document has no matches
+        for obj in objs:
+            write_result_data(temp_file, mongo_client, doc, obj)
 
 
 class TermFinderBatchTask(BaseTask):
     task_name = "TermFinder"
+    parallel_docs_safe = True
 
     def run_custom_task(self, temp_file, mongo_client):
         filters = dict()
@@ -173,20 +265,24 @@ class TermFinderBatchTask(BaseTask):
             filters[SECTIONS_FILTER] = self.pipeline_config.sections
             special_filters = True
         run_term_finder(self.task_name, filters, self.pipeline_config, temp_file, mongo_client, self.docs,
-                        self.write_log_data, self.write_result_data, special_filters)
+                        self.write_log_data, self.write_result_data, special_filters, pipeline_id=self.pipeline,
+                        job_id=self.job)
 
 
 class ProviderAssertionBatchTask(BaseTask):
     task_name = "ProviderAssertion"
+    parallel_docs_safe = True
 
     def run_custom_task(self, temp_file, mongo_client):
         pipeline_config = self.pipeline_config
 
         special_filters = False
-        pa_filters = provider_assertion_filters
+        # a copy, so that one pipeline's sections don't end up in the next one's filters
+        pa_filters = dict(provider_assertion_filters)
         if pipeline_config.sections and len(pipeline_config.sections) > 0:
             pa_filters[SECTIONS_FILTER] = pipeline_config.sections
             special_filters = True
 
         run_term_finder(self.task_name, pa_filters, self.pipeline_config, temp_file, mongo_client, self.docs,
-                        self.write_log_data, self.write_result_data, special_filters)
+                        self.write_log_data, self.write_result_data, special_filters, pipeline_id=self.pipeline,
+                        job_id=self.job)
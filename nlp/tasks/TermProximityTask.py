@@ -152,6 +152,7 @@ class TermProximityTask(BaseTask):
     
     # use this name in NLPQL
     task_name = "TermProximityTask"
+    parallel_docs_safe = True
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
 
@@ -1,12 +1,15 @@
+import multiprocessing
+
 from pymongo import MongoClient
 
 from algorithms import *
-from .task_utilities import BaseTask
+from .task_utilities import BaseTask, get_docs_pool
 
 SECTIONS_FILTER = "sections"
 
 class ValueExtractorTask(BaseTask):
     task_name = "ValueExtractor"
+    parallel_docs_safe = True
 
     def run_custom_task(self, temp_file, mongo_client: MongoClient):
         filters = dict()
@@ -37,16 +40,27 @@ class ValueExtractorTask(BaseTask):
             elif isinstance(value, bool):
                 values_before_terms = value
             
+        # the plan is built once per pipeline config in this process, and shared by its batches
+        plan = make_value_extractor_plan(term_list = self.pipeline_config.terms,
+                                         minimum_value = self.pipeline_config.minimum_value,
+                                         maximum_value = self.pipeline_config.maximum_value,
+                                         enumlist = self.pipeline_config.enum_list,
+                                         is_case_sensitive_text = self.pipeline_config.case_sensitive,
+                                         denom_only = denom_only,
+                                         values_before_terms = values_before_terms)
+
         # TODO incorporate sections and filters
-        for doc in self.docs:
-            result = run_value_extractor_full(term_list = self.pipeline_config.terms,
-                                              text = self.get_document_text(doc),
-                                              minimum_value = self.pipeline_config.minimum_value,
-                                              maximum_value = self.pipeline_config.maximum_value,
-                                              enumlist = self.pipeline_config.enum_list,
-                                              is_case_sensitive_text = self.pipeline_config.case_sensitive,
-                                              denom_only = denom_only,
-                                              values_before_terms = values_before_terms)
+        texts = [self.get_document_text(doc) for doc in self.docs]
+        workers = int(util.value_extractor_workers)
+        prefilter = self.get_sentence_prefilter()
+        # worker pool processes are daemonic, and can't start processes of their own; the pool is kept for the
+        # life of this process, and its workers build each plan once
+        if workers > 1 and len(texts) > 1 and not multiprocessing.current_process().daemon:
+            doc_results = run_value_extractor_many(texts, plan, get_docs_pool(workers), prefilter=prefilter)
+        else:
+            doc_results = run_value_extractor_many(texts, plan, prefilter=prefilter)
+
+        for doc, result in zip(self.docs, doc_results):
             if result:
                 for meas in result:
                     value = meas['X']
@@ -1,15 +1,26 @@
+import atexit
 import datetime
+import io
 import json
+import multiprocessing
+import os
+import shutil
+import stat
 import sys
+import time
 import traceback
 
 import luigi
 from cachetools import LRUCache, cached, keys
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
 
 import util
 from algorithms import segmentation
 from algorithms.sec_tag import *
+from algorithms.segmentation import segmentation_cache
+from algorithms.segmentation.segmentation_spans import SpanList
+from algorithms.finder.sentence_prefilter import SentencePrefilter
 from data_access import base_model
 from data_access import jobs
 from data_access import pipeline_config
@@ -21,11 +32,21 @@ from xml.sax import saxutils as su
 sentences_key = "sentence_attrs"
 section_names_key = "section_name_attrs"
 section_text_key = "section_text_attrs"
+# precomputed offsets into document_text(doc), in Solr's multi-valued long '*_ids' fields
+sentence_offsets_key = "sentence_offset_ids"
+section_offsets_key = "section_offset_ids"
 doc_fields = ['report_id', 'subject', 'report_date', 'report_type', 'source', 'solr_id']
+# Redis namespace of the cached Solr documents
+DOCUMENT_NAMESPACE = 'doc'
 pipeline_cache = LRUCache(maxsize=5000)
 document_cache = LRUCache(maxsize=5000)
 init_cache = LRUCache(maxsize=1000)
 segment = segmentation.Segmentation()
+# chunks per worker process when a batch's documents run in parallel, to even out slow documents
+PARALLEL_DOCS_CHUNKS_PER_WORKER = 4
+_docs_pool = None
+_docs_pool_pid = None
+_docs_pool_size = 0
 
 
 @cached(document_cache)
@@ -39,11 +60,11 @@ def get_document_by_id(document_id):
 
     if util.use_redis_caching == "true":
         util.add_cache_query_count()
-        txt = util.get_from_redis_cache("doc:" + document_id)
+        txt = util.cache_get(DOCUMENT_NAMESPACE, document_id)
         if not txt:
             util.add_cache_compute_count()
             doc = solr_data.query_doc_by_id(document_id, solr_url=util.solr_url)
-            util.write_to_redis_cache("doc:" + document_id, json.dumps(doc))
+            util.cache_set(DOCUMENT_NAMESPACE, document_id, json.dumps(doc))
         else:
             doc = json.loads(txt)
     elif util.use_memory_caching == "true":
@@ -58,24 +79,33 @@ def get_document_by_id(document_id):
 
 def document_sections(doc):
     if util.use_precomputed_segmentation == "true" and section_names_key in doc and len(doc[section_names_key]) > 0:
+        if section_offsets_key in doc:
+            return doc[section_names_key], SpanList(document_text(doc), doc[section_offsets_key])
         return doc[section_names_key], doc[section_text_key]
     else:
         txt = document_text(doc)
-        section_headers, section_texts = [UNKNOWN], [txt]
-        try:
-            section_headers, section_texts = sec_tag_process(txt)
-        except Exception as e:
-            log(e)
-        names = [x.concept for x in section_headers]
-        return names, section_texts
+        return segmentation_cache.get_sections(txt, tag_sections)
+
+
+def tag_sections(txt):
+    section_headers, section_texts = [UNKNOWN], [txt]
+    try:
+        section_headers, section_texts = sec_tag_process(txt)
+    except Exception as e:
+        log(e)
+    names = [x.concept for x in section_headers]
+    return names, section_texts
 
 
 def document_sentences(doc):
-    if util.use_precomputed_segmentation == "true" and sentences_key in doc and len(doc[sentences_key]) > 0:
+    if util.use_precomputed_segmentation == "true" and sentence_offsets_key in doc and \
+            len(doc[sentence_offsets_key]) > 0:
+        return SpanList(document_text(doc), doc[sentence_offsets_key])
+    elif util.use_precomputed_segmentation == "true" and sentences_key in doc and len(doc[sentences_key]) > 0:
         return doc[sentences_key]
     else:
         txt = document_text(doc)
-        sentence_list = segment.parse_sentences(txt)
+        sentence_list = segmentation_cache.get_sentences(txt)
         return sentence_list
 
 
@@ -127,10 +157,8 @@ def get_config_string(pipeline_config, key, default=''):
     return default
 
 
-def pipeline_mongo_writer(client, pipeline_id, pipeline_type, job, batch, p_config: pipeline_config.PipelineConfig,
-                          doc, data_fields: dict, prefix: str = '', phenotype_final: bool = False):
-    db = client[util.mongo_db]
-
+def pipeline_result_document(pipeline_id, pipeline_type, job, batch, p_config: pipeline_config.PipelineConfig,
+                             doc, data_fields: dict, prefix: str = '', phenotype_final: bool = False):
     if not data_fields:
         log('must have additional data fields', ERROR)
         return None
@@ -206,12 +234,198 @@ def pipeline_mongo_writer(client, pipeline_id, pipeline_type, job, batch, p_conf
                     break
             data_fields['result_display']['highlights'] = highlights
 
+    return data_fields
+
+
+def pipeline_mongo_writer(client, pipeline_id, pipeline_type, job, batch, p_config: pipeline_config.PipelineConfig,
+                          doc, data_fields: dict, prefix: str = '', phenotype_final: bool = False):
+    db = client[util.mongo_db]
+
+    data_fields = pipeline_result_document(pipeline_id, pipeline_type, job, batch, p_config, doc, data_fields,
+                                           prefix=prefix, phenotype_final=phenotype_final)
+    if not data_fields:
+        return None
+
     inserted = config.insert_pipeline_results(p_config, db, data_fields)
     log('(job={}; pipeline={}) inserted into mongodb {}'.format(job, pipeline_id, repr(inserted.inserted_id)), DEBUG)
 
     return inserted
 
 
+class PipelineResultWriter(object):
+    """
+    Buffers the result documents of a task batch and writes them with an
+    unordered insert_many once 'batch_size' documents are waiting, or once
+    'flush_seconds' have passed since the last write. Rows the bulk write
+    rejects are reported individually and counted in 'error_count'; the rest
+    of the batch is still written. Any other error is raised.
+    """
+
+    def __init__(self, client, pipeline_id, job, p_config: pipeline_config.PipelineConfig, temp_file=None,
+                 batch_size=None, flush_seconds=None):
+        self.db = client[util.mongo_db]
+        self.pipeline_id = pipeline_id
+        self.job = job
+        self.p_config = p_config
+        self.temp_file = temp_file
+        if batch_size is None:
+            batch_size = util.mongo_write_batch_size
+        if flush_seconds is None:
+            flush_seconds = util.mongo_write_flush_seconds
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = float(flush_seconds)
+        self.buffer = list()
+        self.last_flush = time.time()
+        self.inserted_count = 0
+        self.error_count = 0
+
+    def add(self, data_fields: dict):
+        self.buffer.append(data_fields)
+        if len(self.buffer) >= self.batch_size or (time.time() - self.last_flush) >= self.flush_seconds:
+            self.flush()
+        return data_fields
+
+    def flush(self):
+        pending = self.buffer
+        self.buffer = list()
+        self.last_flush = time.time()
+        if len(pending) == 0:
+            return 0
+
+        errors = dict()
+        try:
+            config.insert_many_pipeline_results(self.p_config, self.db, pending)
+        except BulkWriteError as bwe:
+            for write_error in bwe.details.get('writeErrors', list()):
+                errors[write_error.get('index')] = write_error.get('errmsg', '')
+            for concern_error in bwe.details.get('writeConcernErrors', list()):
+                log('(job={}; pipeline={}) write concern error {}'.format(self.job, self.pipeline_id,
+                                                                          concern_error), ERROR)
+        except Exception as ex:
+            # nothing was written (Mongo unreachable, auth, timeout); let the task fail with the batch
+            log('(job={}; pipeline={}) failed to insert {} results into mongodb'.format(self.job, self.pipeline_id,
+                                                                                        len(pending)), ERROR)
+            log(ex, ERROR)
+            raise
+
+        for i, d in enumerate(pending):
+            if i in errors:
+                message = 'failed to insert {} into mongodb: {}'.format(repr(d.get('_id')), errors[i])
+                log('(job={}; pipeline={}) {}'.format(self.job, self.pipeline_id, message), ERROR)
+            else:
+                message = repr(d.get('_id'))
+            if self.temp_file is not None:
+                self.temp_file.write(message)
+                self.temp_file.write('\n')
+
+        inserted = len(pending) - len(errors)
+        self.inserted_count += inserted
+        self.error_count += len(errors)
+        log('(job={}; pipeline={}) inserted {} of {} results into mongodb'.format(self.job, self.pipeline_id,
+                                                                                   inserted, len(pending)), DEBUG)
+        return inserted
+
+
+class ResultCollector(object):
+    """
+    Stands in for the PipelineResultWriter in a parallel_docs worker process;
+    it keeps the result documents, which go back to the parent for writing.
+    """
+
+    def __init__(self):
+        self.results = list()
+
+    def add(self, data_fields: dict):
+        self.results.append(data_fields)
+        return data_fields
+
+    def flush(self):
+        return 0
+
+
+def _job_artifact_dir(job):
+    return os.path.join(util.tmp_dir, 'claritynlp_job{}'.format(job))
+
+
+def _make_private_dir(path):
+    # the artifacts are unpickled, so only read them from a directory of this user that nobody else can write
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise Exception('%s is not a private directory of this user' % path)
+    return path
+
+
+def pipeline_artifact_dir(job, pipeline):
+    """
+    A private directory for the artifacts that the batches of a pipeline share, e.g. a compiled term finder.
+    It lives in a directory of the job under the tmp dir, and is removed with remove_pipeline_artifacts when the
+    pipeline finishes.
+    """
+    _make_private_dir(_job_artifact_dir(job))
+    return _make_private_dir(os.path.join(_job_artifact_dir(job), 'pipeline{}'.format(pipeline)))
+
+
+def remove_pipeline_artifacts(job, pipeline):
+    job_dir = _job_artifact_dir(job)
+    shutil.rmtree(os.path.join(job_dir, 'pipeline{}'.format(pipeline)), ignore_errors=True)
+    try:
+        # the last pipeline of the job to finish removes the job directory
+        os.rmdir(job_dir)
+    except OSError:
+        pass
+
+
+def _close_docs_pool():
+    global _docs_pool
+    if _docs_pool is not None and _docs_pool_pid == os.getpid():
+        _docs_pool.terminate()
+        _docs_pool.join()
+    _docs_pool = None
+
+
+def get_docs_pool(processes):
+    """
+    The process pool that runs the documents of a batch (parallel_docs), kept for the life of this process.
+    The models are loaded before the workers are forked, so they share them.
+    """
+    global _docs_pool, _docs_pool_pid, _docs_pool_size
+
+    if _docs_pool is not None and _docs_pool_pid == os.getpid() and _docs_pool_size == processes:
+        return _docs_pool
+
+    from luigi_tools.worker_pool import preload_models
+
+    _close_docs_pool()
+    preload_models()
+    _docs_pool = multiprocessing.get_context('fork').Pool(processes=processes)
+    _docs_pool_pid = os.getpid()
+    _docs_pool_size = processes
+    return _docs_pool
+
+
+def _run_docs_chunk(args):
+    task_class, params, p_config, docs = args
+    task = task_class(**params)
+    task.pipeline_config = p_config
+    task.docs = docs
+    task.result_writer = ResultCollector()
+    task.sentence_prefilter = None
+    temp_file = io.StringIO()
+    try:
+        task.run_custom_task(temp_file, None)
+    finally:
+        jobs.flush_job_status()
+
+    prefilter_stats = None
+    if task.sentence_prefilter is not None:
+        prefilter_stats = task.sentence_prefilter.get_stats()
+    return task.result_writer.results, temp_file.getvalue(), prefilter_stats
+
+
+atexit.register(_close_docs_pool)
+
+
 class BaseCollector(base_model.BaseModel):
     collector_name = "ClarityNLPLuigiCollector"
 
@@ -254,11 +468,17 @@ class BaseTask(luigi.Task):
     start = luigi.IntParameter()
     solr_query = luigi.Parameter()
     batch = luigi.IntParameter()
+    first_id = luigi.Parameter(default='')
     parallel_task = True
     task_name = "ClarityNLPLuigiTask"
     docs = list()
     pipeline_config = config.PipelineConfig('', '')
     segment = segmentation.Segmentation()
+    result_writer = None
+    sentence_prefilter = None
+    # True for tasks checked to run each document on its own: their run_custom_task doesn't need the Mongo
+    # client, and doesn't look at more than one document at a time
+    parallel_docs_safe = False
 
     def run(self):
         task_family_name = str(self.task_family)
@@ -274,26 +494,36 @@ class BaseTask(luigi.Task):
 
                 self.pipeline_config = config.get_pipeline_config(self.pipeline, util.conn_string)
                 jobs.update_job_status(str(self.job), util.conn_string, jobs.IN_PROGRESS, "Running Solr query")
+                filters = solr_data.get_pipeline_filters(self.pipeline, self.job, self.pipeline_config,
+                                                         mapper_url=util.report_mapper_url,
+                                                         mapper_inst=util.report_mapper_inst,
+                                                         mapper_key=util.report_mapper_key)
                 self.docs = solr_data.query(self.solr_query, rows=util.row_count, start=self.start,
-                                            solr_url=util.solr_url,
-                                            tags=self.pipeline_config.report_tags, mapper_inst=util.report_mapper_inst,
-                                            mapper_url=util.report_mapper_url, mapper_key=util.report_mapper_key,
-                                            types=self.pipeline_config.report_types,
-                                            sources=self.pipeline_config.sources,
-                                            filter_query=self.pipeline_config.filter_query,
-                                            cohort_ids=self.pipeline_config.cohort,
-                                            job_results_filters=self.pipeline_config.job_results)
+                                            solr_url=util.solr_url, first_id=self.first_id, filters=filters)
 
+                cached_docs = dict()
                 for d in self.docs:
                     doc_id = d[util.solr_report_id_field]
                     if util.use_memory_caching == "true":
                         k = keys.hashkey(doc_id)
                         document_cache[k] = d
                     if util.use_redis_caching == "true":
-                        util.write_to_redis_cache("doc:" + doc_id, json.dumps(d))
+                        cached_docs[doc_id] = json.dumps(d)
+                if len(cached_docs) > 0:
+                    util.cache_set_many(DOCUMENT_NAMESPACE, cached_docs)
                 jobs.update_job_status(str(self.job), util.conn_string, jobs.IN_PROGRESS,
                                        "Running %s main task" % self.task_name)
-                self.run_custom_task(temp_file, client)
+                self.result_writer = PipelineResultWriter(client, self.pipeline, self.job, self.pipeline_config,
+                                                          temp_file=temp_file)
+                self.sentence_prefilter = None
+                try:
+                    self.run_documents(temp_file, client)
+                finally:
+                    self.result_writer.flush()
+                if self.result_writer.error_count > 0:
+                    raise Exception('%d results of batch %s failed to insert into mongodb' %
+                                    (self.result_writer.error_count, self.batch))
+                self.write_prefilter_stats()
                 temp_file.write("Done writing custom task!")
 
             self.docs = list()
@@ -301,8 +531,54 @@ class BaseTask(luigi.Task):
             jobs.update_job_status(str(self.job), util.conn_string, jobs.WARNING, ''.join(traceback.format_stack()))
             log(ex, ERROR)
         finally:
+            # task processes can exit without running atexit handlers, so write queued statuses now
+            jobs.flush_job_status()
             client.close()
 
+    def get_parallel_docs_workers(self):
+        """
+        The number of processes to split this batch's documents across, or 0 to run them here. A pipeline's
+        'parallel_docs' custom argument overrides the config.
+        """
+        if not self.parallel_docs_safe or len(self.docs) < 2:
+            return 0
+        if not self.get_boolean('parallel_docs', default=util.parallel_docs == "true"):
+            return 0
+        if multiprocessing.current_process().daemon:
+            # pool workers (luigi_tools/worker_pool.py) can't have children
+            return 0
+        workers = self.get_integer('parallel_docs_workers', default=int(util.parallel_docs_workers))
+        if workers <= 0:
+            workers = multiprocessing.cpu_count()
+        return workers if workers > 1 else 0
+
+    def run_documents(self, temp_file, mongo_client):
+        workers = self.get_parallel_docs_workers()
+        if workers == 0:
+            self.run_custom_task(temp_file, mongo_client)
+        else:
+            self.run_custom_task_parallel(temp_file, workers)
+
+    def run_custom_task_parallel(self, temp_file, workers):
+        """
+        Run run_custom_task on chunks of self.docs in the local process pool, and write the result documents
+        the workers send back, in document order, with this batch's result writer.
+        """
+        chunk_count = min(len(self.docs), workers * PARALLEL_DOCS_CHUNKS_PER_WORKER)
+        chunk_size = (len(self.docs) + chunk_count - 1) // chunk_count
+        task_args = [(type(self), self.param_kwargs, self.pipeline_config, self.docs[i:i + chunk_size])
+                     for i in range(0, len(self.docs), chunk_size)]
+
+        log('(job={}; pipeline={}) running {} docs in {} chunks on {} processes'.format(
+            self.job, self.pipeline, len(self.docs), len(task_args), workers), DEBUG)
+        for results, temp_text, prefilter_stats in get_docs_pool(workers).imap(_run_docs_chunk, task_args):
+            if len(temp_text) > 0:
+                temp_file.write(temp_text)
+            for data_fields in results:
+                self.result_writer.add(data_fields)
+            if prefilter_stats is not None:
+                self.get_sentence_prefilter().add_stats(prefilter_stats)
+
     def output(self):
         return luigi.LocalTarget("%s/pipeline_job%s_%s_batch%s.txt" % (util.tmp_dir, str(self.job), self.task_name,
                                                                        str(self.start)))
@@ -310,25 +586,48 @@ class BaseTask(luigi.Task):
     def set_name(self, name):
         self.task_name = name
 
+    def get_result_writer(self, temp_file, mongo_client):
+        if self.result_writer is None:
+            self.result_writer = PipelineResultWriter(mongo_client, self.pipeline, self.job, self.pipeline_config,
+                                                      temp_file=temp_file)
+        return self.result_writer
+
     def write_result_data(self, temp_file, mongo_client, doc, data: dict, prefix: str = ''):
-        inserted = pipeline_mongo_writer(mongo_client, self.pipeline, self.task_name, self.job, self.batch,
-                                         self.pipeline_config, doc, data, prefix=prefix)
-        if temp_file is not None:
-            temp_file.write(str(inserted))
-            temp_file.write('\n')
-        return inserted
+        # results are buffered and written in bulk; 'run' flushes whatever is left at the end of the batch
+        data_fields = pipeline_result_document(self.pipeline, self.task_name, self.job, self.batch,
+                                               self.pipeline_config, doc, data, prefix=prefix)
+        if not data_fields:
+            return None
+        return self.get_result_writer(temp_file, mongo_client).add(data_fields)
 
     def write_multiple_result_data(self, temp_file, mongo_client, doc, data: list, prefix: str = ''):
-        ids = list()
+        results = list()
         for d in data:
-            inserted = pipeline_mongo_writer(mongo_client, self.pipeline, self.task_name, self.job, self.batch,
-                                             self.pipeline_config, doc, d, prefix=prefix)
-            ids.append(inserted)
-            if temp_file is not None:
-                temp_file.write(str(inserted))
-                temp_file.write('\n')
-
-        return ids
+            results.append(self.write_result_data(temp_file, mongo_client, doc, d, prefix=prefix))
+
+        return results
+
+    def get_sentence_prefilter(self):
+        # tasks that only report results for sentences containing a query term use this to skip the rest
+        if util.use_sentence_prefilter != "true":
+            return None
+        if self.sentence_prefilter is None:
+            self.sentence_prefilter = SentencePrefilter(self.pipeline_config.terms,
+                                                        window=int(util.sentence_prefilter_window))
+        return self.sentence_prefilter
+
+    def get_spacy_pipe_args(self):
+        # batch_size and n_process for spacy_models.pipe; a pipeline's custom arguments override the config
+        return {
+            'batch_size': self.get_integer('spacy_batch_size', default=int(util.spacy_batch_size)),
+            'n_process': self.get_integer('spacy_n_process', default=int(util.spacy_n_process))
+        }
+
+    def write_prefilter_stats(self):
+        if self.sentence_prefilter is None or self.sentence_prefilter.documents == 0:
+            return
+        jobs.update_job_status(str(self.job), util.conn_string, jobs.PREFILTER_STATS,
+                               jobs.prefilter_stats_description(self.task_name, self.sentence_prefilter.get_stats()))
 
     def write_log_data(self, job_status, status_message):
         jobs.update_job_status(str(self.job), util.conn_string, job_status, status_message)
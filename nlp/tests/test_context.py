@@ -32,3 +32,28 @@ def test_experiencer():
     c = ctxt.run_context("heart attack", "FAMILY HISTORY: grandmother recently suffered heart attack")
     assert c is not None
     assert c.experiencier == Experiencer.Other
+
+
+def test_matches_reference():
+    from algorithms.context import benchmark_context
+    mismatches = benchmark_context.compare()
+    assert len(mismatches) == 0
+
+
+def test_matches_reference_random():
+    from algorithms.context import benchmark_context
+    mismatches = benchmark_context.compare(benchmark_context.random_cases(1000))
+    assert len(mismatches) == 0
+
+
+def test_context_batch():
+    sentence = "The patient has no evidence of dementia, but has a history of diabetes"
+    terms = ["dementia", "diabetes", "dementia"]
+    results = ctxt.run_context_batch(terms, sentence)
+    assert len(results) == len(terms)
+    for term, c in zip(terms, results):
+        expected = ctxt.run_context(term, sentence)
+        assert c.phrase == term
+        assert c.negex == expected.negex
+        assert c.temporality == expected.temporality
+        assert c.experiencier == expected.experiencier
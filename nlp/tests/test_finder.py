@@ -1,5 +1,7 @@
 from algorithms.finder import test_finder as tf
 from algorithms.finder import test_lab_value_matcher
+from algorithms.finder.terms import MultiTermMatcher, get_matcher
+from algorithms.finder.sentence_prefilter import SentencePrefilter
 
 def test_time_finder():
     assert tf.test_time_finder()
@@ -17,4 +19,25 @@ def test_lvm():
     assert test_lab_value_matcher.run()
 
 
+def test_multi_term_matcher():
+    terms = ['heart attack', 'attack', 'pain', 'covid\\-19', 'chest.*pain', 'x-ray']
+    matcher = MultiTermMatcher(terms)
+    for sentence in ['Heart attack, chest pain; covid-19 neg.', 'painful heartattack x-ray', 'PAIN_x no pain']:
+        expected = [(m.group(0), m.start(), m.end()) for m in [get_matcher(t).search(sentence) for t in terms] if m]
+        found = [(m.group(0), m.start(), m.end()) for m in matcher.search_all(sentence)]
+        assert expected == found
 
+
+def test_sentence_prefilter():
+    sentences = ['No acute distress.', 'BP 120/80, HR 88.', 'Lungs clear.', 'CO(LVOT): 3.3 l/min', 'Plan: discharge.']
+    prefilter = SentencePrefilter(['bp', 'CO(LVOT)'])
+    assert prefilter.select(sentences) == [sentences[1], sentences[3]]
+    assert not prefilter.document_has_terms('Lungs clear. Plan: discharge.')
+
+    prefilter = SentencePrefilter(['hr'], window=1)
+    assert prefilter.select(sentences) == sentences[0:3]
+    assert prefilter.get_stats()['sentences_skipped'] == 2
+
+    # terms with optional characters can't be keyed, so nothing is skipped
+    prefilter = SentencePrefilter(['colou?r', 'bp'])
+    assert prefilter.select(sentences) == sentences
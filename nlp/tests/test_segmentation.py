@@ -0,0 +1,18 @@
+from algorithms.segmentation.segmentation_spans import locate_spans, SpanList
+
+
+def test_segmentation_spans():
+    text = 'HISTORY:\n  Pt is a 63 yo\nmale.  BP 120/80,\tHR 88.\n\n1.Aspirin ----- daily.'
+    sentences = ['HISTORY:', 'Pt is a 63 yo male.', 'BP 120/80, HR 88.']
+    spans = locate_spans(text, sentences, exact=True)
+    assert SpanList(text, spans) == sentences
+    assert SpanList(text, spans)[-1] == 'BP 120/80, HR 88.'
+    assert SpanList(text, spans)[1:] == sentences[1:]
+
+    # cleanup changed more than whitespace, so the sentences can't be sliced back exactly
+    assert locate_spans(text, sentences + ['1. Aspirin daily.'], exact=True) is None
+
+    # sections only need the same non-whitespace characters, and may be empty
+    sections = ['Pt is a 63 yo male.BP 120/80, HR 88.', ' ', '1.Aspirin ----- daily.']
+    spans = locate_spans(text, sections)
+    assert list(SpanList(text, spans)) == ['Pt is a 63 yo male. BP 120/80, HR 88.', '', '1.Aspirin ----- daily.']
@@ -3,3 +3,5 @@ from algorithms.value_extraction import test_value_extractor as tve
 def test_value_extractor():
     assert tve.test_value_extractor_full()
 
+def test_value_extractor_run_many():
+    assert tve.test_value_extractor_run_many()
@@ -1,10 +1,18 @@
 import configparser
+import os
+import zlib
+import threading
+import time
 from claritynlp_logging import log, ERROR
-from os import getenv, environ, path
+from os import getenv, environ, path, getpid
 
 import pymongo
 import redis
+import requests
 from pymongo import MongoClient
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlparse
 
 SCRIPT_DIR = path.dirname(__file__)
 config = configparser.RawConfigParser()
@@ -59,6 +67,8 @@ conn_string = "host='%s' dbname='%s' user='%s' password='%s' port=%s" % (
     read_property('NLP_PG_USER', ('pg', 'user')),
     read_property('NLP_PG_PASSWORD', ('pg', 'password')),
     str(read_property('NLP_PG_CONTAINER_PORT', ('pg', 'port'))))
+pg_pool_min_connections = read_property('NLP_PG_POOL_MIN_CONNECTIONS', ('pg', 'pool_min_connections'), default='1')
+pg_pool_max_connections = read_property('NLP_PG_POOL_MAX_CONNECTIONS', ('pg', 'pool_max_connections'), default='10')
 mongo_host = read_property('NLP_MONGO_HOSTNAME', ('mongo', 'host'))
 mongo_port = int(read_property('NLP_MONGO_CONTAINER_PORT', ('mongo', 'port')))
 mongo_db = read_property('NLP_MONGO_DATABASE', ('mongo', 'db'))
@@ -68,6 +78,10 @@ mongo_working_collection = read_property(
     'NLP_MONGO_WORKING_COLLECTION', ('mongo', 'working_collection'))
 mongo_username = read_property('NLP_MONGO_USERNAME', ('mongo', 'username'))
 mongo_password = read_property('NLP_MONGO_PASSWORD', ('mongo', 'password'))
+mongo_write_batch_size = read_property('NLP_MONGO_WRITE_BATCH_SIZE', ('mongo', 'write_batch_size'),
+                                       default='500')
+mongo_write_flush_seconds = read_property('NLP_MONGO_WRITE_FLUSH_SECONDS', ('mongo', 'write_flush_seconds'),
+                                          default='5')
 tmp_dir = read_property('NLP_API_TMP_DIR', ('tmp', 'dir'))
 log_dir = read_property('NLP_API_LOG_DIR', ('log', 'dir'))
 luigi_scheduler = read_property('LUIGI_SCHEDULER_URL', ('luigi', 'scheduler'))
@@ -103,6 +117,8 @@ redis_hostname = read_property('REDIS_HOSTNAME', ('redis', 'hostname'))
 redis_host_port = read_property('REDIS_HOST_PORT', ('redis', 'host_port'))
 redis_container_port = read_property(
     'REDIS_CONTAINER_PORT', ('redis', 'container_port'))
+redis_namespace = read_property('REDIS_NAMESPACE', ('redis', 'namespace'), default='clarity')
+redis_compress_bytes = read_property('REDIS_COMPRESS_BYTES', ('redis', 'compress_bytes'), default='1024')
 use_memory_caching = read_property('USE_MEMORY_CACHING', ('optimizations', 'use_memory_cache'),
                                    default='true')
 use_precomputed_segmentation = read_property('USE_PRECOMPUTED_SEGMENTATION',
@@ -116,6 +132,39 @@ use_reordered_nlpql = read_property('USE_REORDERED_NLPQL',
 use_redis_caching = read_property('USE_REDIS_CACHING',
                                   ('optimizations', 'use_redis_caching'),
                                   default='true')
+use_solr_cursor = read_property('USE_SOLR_CURSOR',
+                                ('optimizations', 'use_solr_cursor'),
+                                default='false')
+use_async_job_status = read_property('USE_ASYNC_JOB_STATUS',
+                                     ('optimizations', 'use_async_job_status'),
+                                     default='false')
+job_status_flush_seconds = read_property('JOB_STATUS_FLUSH_SECONDS',
+                                         ('optimizations', 'job_status_flush_seconds'),
+                                         default='1')
+value_extractor_workers = read_property('VALUE_EXTRACTOR_WORKERS',
+                                        ('optimizations', 'value_extractor_workers'),
+                                        default='1')
+use_sentence_prefilter = read_property('USE_SENTENCE_PREFILTER',
+                                       ('optimizations', 'use_sentence_prefilter'),
+                                       default='false')
+sentence_prefilter_window = read_property('SENTENCE_PREFILTER_WINDOW',
+                                          ('optimizations', 'sentence_prefilter_window'),
+                                          default='0')
+spacy_batch_size = read_property('SPACY_BATCH_SIZE', ('optimizations', 'spacy_batch_size'), default='256')
+spacy_n_process = read_property('SPACY_N_PROCESS', ('optimizations', 'spacy_n_process'), default='1')
+use_worker_pool = read_property('USE_WORKER_POOL', ('optimizations', 'use_worker_pool'), default='false')
+worker_pool_size = read_property('WORKER_POOL_SIZE', ('optimizations', 'worker_pool_size'), default='0')
+worker_max_batches = read_property('WORKER_MAX_BATCHES', ('optimizations', 'worker_max_batches'), default='10')
+worker_pool_preload = read_property('WORKER_POOL_PRELOAD', ('optimizations', 'worker_pool_preload'),
+                                    default='true')
+parallel_docs = read_property('PARALLEL_DOCS', ('optimizations', 'parallel_docs'), default='false')
+parallel_docs_workers = read_property('PARALLEL_DOCS_WORKERS', ('optimizations', 'parallel_docs_workers'), default='0')
+
+http_pool_size = read_property('NLP_HTTP_POOL_SIZE', ('http', 'pool_size'), default='20')
+http_retries = read_property('NLP_HTTP_RETRIES', ('http', 'retries'), default='3')
+http_backoff_factor = read_property('NLP_HTTP_BACKOFF_FACTOR', ('http', 'backoff_factor'), default='0.5')
+http_connect_timeout = read_property('NLP_HTTP_CONNECT_TIMEOUT', ('http', 'connect_timeout'), default='10')
+http_read_timeout = read_property('NLP_HTTP_READ_TIMEOUT', ('http', 'read_timeout'), default='300')
 
 cql_eval_url = read_property('FHIR_CQL_EVAL_URL', ('local', 'cql_eval_url'), key_name='cql_eval_url')
 fhir_data_service_uri = read_property('FHIR_DATA_SERVICE_URI', ('local', 'fhir_data_service_uri'),
@@ -138,19 +187,25 @@ cache_counts = {
     'query': 0
 }
 
+# the values written with cache_set and cache_set_many start with one of these
+CACHE_PLAIN = b'j'
+CACHE_ZLIB = b'z'
+
 try:
     redis_conn = redis.Redis(
         host=redis_hostname, port=redis_host_port, decode_responses=True)
     redis_conn.set('clarity_cache_compute', 0)
     redis_conn.set('clarity_cache_query', 0)
+    # the cache API stores bytes, since large values are compressed
+    redis_cache_conn = redis.Redis(host=redis_hostname, port=redis_host_port, decode_responses=False)
 except Exception as ex:
     redis_conn = None
+    redis_cache_conn = None
 
 
 def write_to_redis_cache(key, value):
     if redis_conn:
-        redis_conn.set(key, value)
-        redis_conn.expire(key, EXPIRE_TIME_SECONDS)
+        redis_conn.set(key, value, ex=EXPIRE_TIME_SECONDS)
 
 
 def get_from_redis_cache(key):
@@ -159,14 +214,65 @@ def get_from_redis_cache(key):
     return None
 
 
-def add_cache_compute_count():
-    if redis_conn:
-        redis_conn.incr('clarity_cache_compute', 1)
+def cache_key(namespace, key):
+    return '{}:{}:{}'.format(redis_namespace, namespace, key)
 
 
-def add_cache_query_count():
-    if redis_conn:
-        redis_conn.incr('clarity_cache_query', 1)
+def encode_cache_value(value: str):
+    data = value.encode('utf-8')
+    if len(data) >= int(redis_compress_bytes):
+        return CACHE_ZLIB + zlib.compress(data, 1)
+    return CACHE_PLAIN + data
+
+
+def decode_cache_value(data):
+    if data is None:
+        return None
+    if data[:1] == CACHE_ZLIB:
+        return zlib.decompress(data[1:]).decode('utf-8')
+    return data[1:].decode('utf-8')
+
+
+def cache_get_many(namespace, keys: list):
+    """
+    The cached strings for the keys in the namespace, in order, None for those that aren't cached, in one
+    round trip.
+    """
+    if not redis_cache_conn or len(keys) == 0:
+        return [None] * len(keys)
+    values = redis_cache_conn.mget([cache_key(namespace, k) for k in keys])
+    return [decode_cache_value(v) for v in values]
+
+
+def cache_set_many(namespace, items: dict, ttl=EXPIRE_TIME_SECONDS):
+    """
+    Cache the strings of the dict by key in the namespace, each expiring after 'ttl' seconds, in one pipelined
+    round trip. Large values are compressed.
+    """
+    if not redis_cache_conn or len(items) == 0:
+        return
+    pipe = redis_cache_conn.pipeline(transaction=False)
+    for k, value in items.items():
+        pipe.set(cache_key(namespace, k), encode_cache_value(value), ex=ttl)
+    pipe.execute()
+
+
+def cache_get(namespace, key):
+    return cache_get_many(namespace, [key])[0]
+
+
+def cache_set(namespace, key, value: str, ttl=EXPIRE_TIME_SECONDS):
+    cache_set_many(namespace, {key: value}, ttl=ttl)
+
+
+def add_cache_compute_count(count=1):
+    if redis_conn and count > 0:
+        redis_conn.incr('clarity_cache_compute', count)
+
+
+def add_cache_query_count(count=1):
+    if redis_conn and count > 0:
+        redis_conn.incr('clarity_cache_query', count)
 
 
 def get_cache_compute_count():
@@ -206,7 +312,14 @@ def cmp_2_key(mycmp):
     return K
 
 
-def mongo_client(host=None, port=None, username=None, password=None):
+_mongo_lock = threading.Lock()
+_mongo_clients = dict()
+_mongo_clients_pid = getpid()
+# clients inherited across a fork; kept referenced and never used or closed in the child
+_inherited_mongo_clients = list()
+
+
+def new_mongo_client(host=None, port=None, username=None, password=None):
     if not host:
         host = mongo_host
 
@@ -229,3 +342,183 @@ def mongo_client(host=None, port=None, username=None, password=None):
         # print('unauthenticated mongo')
         _mongo_client = MongoClient(host, port)
     return _mongo_client
+
+
+def _reset_mongo_clients():
+    global _mongo_clients, _mongo_clients_pid
+    _inherited_mongo_clients.extend(_mongo_clients.values())
+    _mongo_clients = dict()
+    _mongo_clients_pid = getpid()
+
+
+def shared_mongo_client(host=None, port=None, username=None, password=None):
+    """
+    The process-wide MongoClient for these settings, created on first use. A new client is made after a fork,
+    since the parent's connections and monitor threads can't be used in the child.
+    """
+    key = (host, port, username, password)
+    with _mongo_lock:
+        if _mongo_clients_pid != getpid():
+            _reset_mongo_clients()
+        client = _mongo_clients.get(key)
+        if client is None:
+            client = new_mongo_client(host=host, port=port, username=username, password=password)
+            _mongo_clients[key] = client
+        return client
+
+
+class SharedMongoClient(object):
+    """
+    A handle on the shared MongoClient that callers can 'close' (or use in a 'with' block) as they did with
+    their own client; closing the handle leaves the shared client and its connection pool open.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getitem__(self, name):
+        return self.client[name]
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        pass
+
+
+def mongo_client(host=None, port=None, username=None, password=None):
+    return SharedMongoClient(shared_mongo_client(host=host, port=port, username=username, password=password))
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_mongo_clients)
+
+
+# upper bounds (ms) of the request latency histogram buckets; the last bucket is open ended
+HTTP_LATENCY_BUCKETS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+_http_lock = threading.Lock()
+_http_sessions = dict()
+_http_session_pid = None
+_http_stats = dict()
+
+# POSTs are retried only when they are idempotent reads, by service: Solr queries POST their body to /select
+HTTP_RETRY_POST_PATHS = {
+    'solr': ['/select']
+}
+# services whose requests are never retried, e.g. the CQL engine often keeps running a query after a 504
+HTTP_NO_RETRY_SERVICES = {'cql'}
+
+
+def http_retryable(service, method, url):
+    """
+    Whether a request may be sent again after a connection error or a 502/503/504: GETs, and POSTs to the
+    idempotent paths of their service, except to the services in HTTP_NO_RETRY_SERVICES.
+    """
+    if service in HTTP_NO_RETRY_SERVICES:
+        return False
+    if method.upper() == 'GET':
+        return True
+    url_path = urlparse(url).path.rstrip('/')
+    return any(url_path.endswith(p) for p in HTTP_RETRY_POST_PATHS.get(service, list()))
+
+
+def http_session(retry=True):
+    """
+    The process-wide requests.Session with a pooled keep-alive adapter; with 'retry', the adapter has the retry
+    policy from the [http] config, otherwise it never retries. New sessions are made after a fork, since sockets
+    can't be shared with the parent.
+    """
+    global _http_session_pid
+
+    with _http_lock:
+        if _http_session_pid != getpid():
+            _http_sessions.clear()
+            _http_stats.clear()
+            _http_session_pid = getpid()
+        session = _http_sessions.get(retry)
+        if session is None:
+            if retry:
+                retry_args = dict(total=int(http_retries), read=0, backoff_factor=float(http_backoff_factor),
+                                  status_forcelist=[502, 503, 504], raise_on_status=False)
+                try:
+                    max_retries = Retry(allowed_methods=frozenset(['GET', 'POST']), **retry_args)
+                except TypeError:
+                    # urllib3 < 1.26
+                    max_retries = Retry(method_whitelist=frozenset(['GET', 'POST']), **retry_args)
+            else:
+                max_retries = Retry(0, read=False)
+            adapter = HTTPAdapter(pool_connections=int(http_pool_size), pool_maxsize=int(http_pool_size),
+                                  max_retries=max_retries)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_sessions[retry] = session
+        return session
+
+
+def _record_http_request(service, elapsed_ms, failed):
+    with _http_lock:
+        service_stats = _http_stats.get(service)
+        if service_stats is None:
+            service_stats = {
+                'requests': 0,
+                'errors': 0,
+                'total_ms': 0.0,
+                'histogram': [0] * (len(HTTP_LATENCY_BUCKETS) + 1)
+            }
+            _http_stats[service] = service_stats
+        service_stats['requests'] += 1
+        service_stats['total_ms'] += elapsed_ms
+        if failed:
+            service_stats['errors'] += 1
+        bucket = len(HTTP_LATENCY_BUCKETS)
+        for i, upper in enumerate(HTTP_LATENCY_BUCKETS):
+            if elapsed_ms <= upper:
+                bucket = i
+                break
+        service_stats['histogram'][bucket] += 1
+
+
+def http_request(service, method, url, **kwargs):
+    """
+    Send a request through the shared session, with the configured timeouts unless the caller passes its own,
+    and record its latency under 'service' (e.g. 'solr').
+    """
+    if 'timeout' not in kwargs:
+        kwargs['timeout'] = (float(http_connect_timeout), float(http_read_timeout))
+
+    start = time.time()
+    failed = True
+    try:
+        response = http_session(http_retryable(service, method, url)).request(method, url, **kwargs)
+        failed = response.status_code >= 400
+        return response
+    finally:
+        _record_http_request(service, 1000.0 * (time.time() - start), failed)
+
+
+def http_get(service, url, **kwargs):
+    return http_request(service, 'GET', url, **kwargs)
+
+
+def http_post(service, url, **kwargs):
+    return http_request(service, 'POST', url, **kwargs)
+
+
+def get_http_stats():
+    with _http_lock:
+        stats = dict()
+        for service, service_stats in _http_stats.items():
+            s = dict(service_stats)
+            s['avg_ms'] = s['total_ms'] / s['requests'] if s['requests'] > 0 else 0.0
+            s['histogram'] = dict(zip(['<={}ms'.format(b) for b in HTTP_LATENCY_BUCKETS] +
+                                      ['>{}ms'.format(HTTP_LATENCY_BUCKETS[-1])], service_stats['histogram']))
+            stats[service] = s
+        return stats
@@ -7,4 +7,8 @@ db.pipeline_results.createIndex( {  "pipeline_id":1  })
 db.phenotype_results.createIndex( {  "subject":1 })
 db.phenotype_results.createIndex( {  "job_id":1 })
 db.phenotype_results.createIndex( {  "nlpql_feature":1 })
-db.phenotype_results.createIndex( {  "pipeline_id":1  })
\ No newline at end of file
+db.phenotype_results.createIndex( {  "pipeline_id":1  })
+db.phenotype_results.createIndex( {  "job_id":1, "nlpql_feature":1, "subject":1 })
+db.phenotype_results.createIndex( {  "job_id":1, "phenotype_final":1, "subject":1 })
+db.phenotype_results.createIndex( {  "job_id":1, "phenotype_final":1, "_id":1 })
+db.pipeline_results.createIndex( {  "job_id":1, "nlpql_feature":1 })